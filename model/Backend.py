@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import functools
+import importlib
+
+# Modules that implement the array operations of the model, with the same functions as lue.framework
+BACKENDS = {"lue":   "lue.framework",
+            "numpy": "NumpyBackend"}
+
+class ArrayBackend:
+    def __init__(self):
+        """
+        Initialize the class.
+        1) No backend is selected yet, LUE is used if an operation is called before select.
+
+        The model modules use lfr.<operation> from this object instead of importing lue.framework, so the
+        backend can be chosen from the configuration before the runtime is started. The backend module is
+        only imported when it is selected, the NumPy backend does not need LUE to be installed.
+        """
+        self.name   = None
+        self.module = None
+
+    def select(self, name):
+        name = name.strip()
+        if name not in BACKENDS:
+            raise Exception(f"Error: Invalid backend '{name}', choose from: {', '.join(BACKENDS)}")
+        self.name   = name
+        self.module = importlib.import_module(BACKENDS[name])
+        return self.module
+
+    def backend(self):
+        return self.module or self.select("lue")
+
+    def __getattr__(self, operation):
+        return getattr(self.backend(), operation)
+
+    def runtime_scope(self, function):
+        """Decorators are applied at import, before a backend is selected, so the scope is looked up per call."""
+        @functools.wraps(function)
+        def scoped(*args, **kwargs):
+            return self.backend().runtime_scope(function)(*args, **kwargs)
+        return scoped
+
+lfr = ArrayBackend()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import os
+from Backend import lfr
+import numpy as np
+from PrepareInputs import PrepareInputs
+from StandardArraysLUE import StandardArraysLUE
+
+# All neighbours of a cell and the cell itself, a cell with fewer cells in its window lies at an edge
+WINDOW = np.ones((3, 3), dtype=np.uint8)
+
+# Boundary condition of the groundwater at the edges of the domain and the catchment
+GROUNDWATER_BOUNDARIES = ("closed", "fixed")
+
+class Boundary:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Initialize the standard arrays and the input preparation, which holds the cache dir.
+        2) Set the boundary condition of the groundwater and the inflow over the boundary of the domain.
+
+        The domain edge (cells with less than 8 neighbours in the raster) and the catchment edge (cells of the
+        catchment next to a cell outside of it) are derived with focal sums, which are parallel over the partitions,
+        and cached with the static inputs on the hash of the DEM. With groundWaterBoundary = closed there is no
+        flow over the edges, which is how the model always ran. With fixed the groundwater storage of the edge
+        cells is kept at its initial value (a constant head), this is applied within the routing update.
+
+        With boundaryInflow (rasters per report interval with date placeholders, relative to the scenario) the
+        discharge that enters the domain from outside, for example from the upstream part of a catchment in an
+        incremental run, is added to the lateral inflow of the kinematic wave.
+        """
+        self.std_arr_lue      = StandardArraysLUE(configuration)
+        self.prepare_inputs   = PrepareInputs(configuration)
+        self.partition_shape  = 2 * (self.std_arr_lue.partition_extent,)
+        self.dem_file         = self.prepare_inputs.input_dir + configuration.dataSettings['dem']
+
+        self.groundwater      = configuration.modelSettings.get('groundWaterBoundary', 'closed')
+        if self.groundwater not in GROUNDWATER_BOUNDARIES:
+            raise Exception(f"Error: Invalid groundWaterBoundary '{self.groundwater}', choose from: {', '.join(GROUNDWATER_BOUNDARIES)}")
+
+        inflow_maps           = configuration.dataSettings.get('boundaryInflow', '')
+        self.inflow_maps      = self.prepare_inputs.input_dir + inflow_maps if inflow_maps else None
+
+        self.domain_edge      = None
+        self.catchment_edge   = None
+
+    def key(self):
+        """Hash of the DEM and the extents of the arrays, the masks change with either."""
+        return self.prepare_inputs.key([self.dem_file], f"{self.std_arr_lue.array_extent};{self.std_arr_lue.partition_extent}")
+
+    def cache_files(self):
+        key = self.key()
+        return {name: os.path.join(self.prepare_inputs.cache_dir, f"boundary_{name}_{key}.tiff")
+                for name in ("domain_edge", "catchment_edge")}
+
+    def edges(self, catchment):
+        """Domain and catchment edge of the cells of the catchment.
+
+        Args:
+            catchment (lpa*):       cells that belong to the catchment
+
+        Returns:
+            domain_edge (lpa*):     cells with less than 8 neighbours in the raster
+            catchment_edge (lpa*):  cells of the catchment with a neighbour outside of the catchment
+
+        lpa*: lue partitioned array
+        """
+        domain_count   = lfr.focal_sum(self.std_arr_lue.one(np.float32), WINDOW)
+        domain_edge    = domain_count < 9
+        inside         = lfr.focal_sum(lfr.cast(catchment, np.float32), WINDOW)
+        catchment_edge = lfr.where(catchment, inside < domain_count, 0) == 1
+        return domain_edge, catchment_edge
+
+    def initialize(self, catchment, rebuild = False):
+        """Load the edge masks from the cache, or derive and cache them.
+
+        Args:
+            catchment (lpa*):   cells that belong to the catchment (only used if the masks are derived)
+            rebuild (bool):     ignore the cache
+        """
+        files = self.cache_files()
+        if all(os.path.isfile(file_name) for file_name in files.values()) and not rebuild:
+            self.domain_edge    = lfr.from_gdal(files["domain_edge"], self.partition_shape) == 1
+            self.catchment_edge = lfr.from_gdal(files["catchment_edge"], self.partition_shape) == 1
+            return
+
+        print(f"Deriving the domain and catchment edges, cached at: {self.prepare_inputs.cache_dir}")
+        self.domain_edge, self.catchment_edge = self.edges(catchment)
+        self.prepare_inputs.write(lfr.cast(self.domain_edge, np.uint8), files["domain_edge"])
+        self.prepare_inputs.write(lfr.cast(self.catchment_edge, np.uint8), files["catchment_edge"])
+
+    def inflow(self, date, channel_length):
+        """Lateral inflow (m2/s) of the discharge that enters the cells from outside of the domain, or None if there
+        is no inflow raster for the date.
+
+        Args:
+            date (datetime date):   start of the report interval
+            channel_length (lpa*):  channel length, the inflow is spread over the channel of the cell
+
+        Returns:
+            inflow (lpa*):          discharge entering the cell per meter of channel
+
+        lpa*: lue partitioned array
+        """
+        file_name = date.strftime(self.inflow_maps)
+        if not os.path.isfile(file_name):
+            return None
+        discharge = lfr.cast(lfr.from_gdal(file_name, self.partition_shape), self.std_arr_lue.state_dtype)
+        return discharge / channel_length
+
+    def groundwater_condition(self, ini_gw_s):
+        """The cells and storage of the fixed groundwater boundary, or None if the boundary is closed.
+
+        Returns:
+            fixed (lpa*):       edge cells at which the storage is fixed
+            fixed_gw_s (lpa*):  storage of those cells, the initial storage
+
+        lpa*: lue partitioned array
+        """
+        if self.groundwater == "closed":
+            return None
+        fixed = lfr.where(self.domain_edge, 1, lfr.cast(self.catchment_edge, np.uint8)) == 1
+        return fixed, ini_gw_s
@@ -5,8 +5,9 @@ Created on 8 May 2023
 @author: steven.hosper
 """
 
-import lue.framework as lfr
+from Backend import lfr
 from StandardArraysLUE import StandardArraysLUE
+from Scheduler import Scheduler
 
 class CalculateFlux:
     def __init__(self, configuration):
@@ -17,7 +18,8 @@ class CalculateFlux:
         """
         self.std_arr_lue        = StandardArraysLUE(configuration)
         
-        self.iterations = int(configuration.modelSettings['iterationsBeforeReport'])
+        # Routing steps for which a flux applies, fluxes are updated once per flux interval
+        self.iterations = Scheduler(configuration).steps["flux"]
         self.include_precipitation        = configuration.generalSettings['includePrecipitation']
         self.include_evapotranspiration   = configuration.generalSettings['includeEvapotranspiration']
         self.include_infiltration         = configuration.generalSettings['includeInfiltration']
@@ -49,7 +51,7 @@ class CalculateFlux:
         lpa*: lue partitioned array
         """      
         # Determine the interception rate
-        interception    = (self.std_arr_lue.one() - th_f) * pre
+        interception    = (self.std_arr_lue.one(self.std_arr_lue.parameter_dtype) - th_f) * pre
         
         # Determine if there is enough water in the canopy to meet all evaporative potential
         enough_water_int  = (interception + int_stor/self.iterations) > rev  
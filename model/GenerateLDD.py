@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import os
+from Backend import lfr
+import numpy as np
+from PrepareInputs import PrepareInputs, LDD_NO_DATA
+from StandardArraysLUE import StandardArraysLUE
+
+class GenerateLDD:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Initialize the standard arrays and the input preparation, which holds the cache dir.
+        2) Set the method and the settings of the pit filling.
+        """
+        self.std_arr_lue     = StandardArraysLUE(configuration)
+        self.prepare_inputs  = PrepareInputs(configuration)
+
+        self.partition_shape = 2 * (int(configuration.modelSettings['partitionExtent']),)
+        self.resolution      = float(configuration.modelSettings['resolution'])
+        self.method          = configuration.generalSettings.get('lddMethod', 'lue')
+        self.epsilon         = float(configuration.generalSettings.get('lddFillEpsilon', '0.0001'))
+        self.max_iterations  = int(configuration.generalSettings.get('lddFillIterations', '10000'))
+        self.check_interval  = 25
+
+        if self.method not in ("lue", "pcraster"):
+            raise Exception(f"Error: Invalid lddMethod '{self.method}', choose from: lue, pcraster")
+
+    def key(self, dem_file):
+        """Hash of the DEM file and the settings that change the LDD, the DEM is read in chunks."""
+        return self.prepare_inputs.key([dem_file], f"{self.method};{self.epsilon};{self.max_iterations}")
+
+    def cache_file(self, dem_file):
+        return os.path.join(self.prepare_inputs.cache_dir, f"ldd_{self.method}_{self.key(dem_file)}.tiff")
+
+    def ldd(self, dem_file, dem, rebuild = False):
+        """Return the LDD of the DEM, it is only computed if the DEM (or the method) changed since the last run.
+
+        Args:
+            dem_file (path):    the DEM relative to the input directory of the scenario, used as the cache key
+            dem (lpa*):         the DEM as loaded by the model
+            rebuild (bool):     ignore the cache
+
+        Returns:
+            ldd (lpa*):         uint8 local drainage direction
+
+        lpa*: lue partitioned array
+        """
+        source = self.prepare_inputs.input_dir + dem_file
+        cache  = self.cache_file(source)
+        if os.path.isfile(cache) and not rebuild:
+            return lfr.from_gdal(cache, self.partition_shape)
+
+        print(f"Creating the LDD with {self.method}, cached at: {cache}")
+        if self.method == "pcraster":
+            self.pcraster_ldd(source, cache)
+            return lfr.from_gdal(cache, self.partition_shape)
+
+        ldd = lfr.d8_flow_direction(self.fill_pits(dem))
+        self.prepare_inputs.write(ldd, cache)
+        return ldd
+
+    def edge(self):
+        """Cells at the edge of the domain, which have less than 8 neighbours."""
+        return self.std_arr_lue.boundary_cell() == 0
+
+    def fill_pits(self, dem):
+        """Fill the pits of the DEM with the method of Planchon and Darboux (2001).
+
+        The surface starts high everywhere except at the edges and is lowered towards the DEM with a focal minimum,
+        which keeps a small gradient (epsilon) over filled areas so D8 finds a direction everywhere. Every iteration
+        is a parallel focal operation, the convergence is checked every check_interval iterations.
+
+        Args:
+            dem (lpa*):     elevation
+
+        Returns:
+            surface (lpa*): elevation without pits
+
+        lpa*: lue partitioned array
+        """
+        neighbours = np.ones((3, 3), dtype=np.uint8)
+        neighbours[1, 1] = 0
+
+        surface = lfr.where(self.edge(), dem, 1E6)
+        for i in range(self.max_iterations):
+            lowest    = lfr.focal_minimum(surface, neighbours) + self.epsilon
+            lowered   = lfr.where(dem >= lowest, dem, lfr.where(surface > lowest, lowest, surface))
+            previous  = surface
+            surface   = lfr.where(surface > dem, lowered, surface)
+
+            if (i + 1) % self.check_interval == 0 and lfr.maximum(previous - surface).get() <= 0:
+                print(f"Filled pits in {i + 1} iterations")
+                break
+        else:
+            print(f"Pit filling did not converge in {self.max_iterations} iterations")
+        return surface
+
+    def pcraster_ldd(self, dem_file, cache):
+        """The single-threaded PCRaster reference, as previously done by tools/pcrLDD.py."""
+        import pcraster as pcr
+        from osgeo import gdal
+
+        dataset = gdal.Open(dem_file)
+        dem     = dataset.GetRasterBand(1).ReadAsArray()
+        dem     = np.where(dem < 0.1, 35, dem)
+
+        pcr.setclone(dem.shape[0], dem.shape[1], self.resolution, 0, 0)
+        ldd = pcr.lddcreate(pcr.numpy2pcr(pcr.Scalar, dem, -3.40282e+38), 9999999, 500000, 9999999, 9999999)
+
+        temporary = self.prepare_inputs.temporary(cache)
+        output    = self.prepare_inputs.create(temporary, dataset, gdal.GDT_Byte, LDD_NO_DATA)
+        output.GetRasterBand(1).WriteArray(pcr.pcr2numpy(ldd, LDD_NO_DATA).astype(np.uint8))
+        self.prepare_inputs.finish(output, "NEAREST")
+        output = None
+        self.prepare_inputs.replace(temporary, cache)
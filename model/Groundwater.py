@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+from Backend import lfr
+import numpy as np
+from Scheduler import Scheduler
+from StandardArraysLUE import StandardArraysLUE
+
+# Direct neighbours (von Neumann) of a cell, used for the flow between cells in the implicit solver
+NEIGHBOURS = np.array([[0, 1, 0],
+                       [1, 0, 1],
+                       [0, 1, 0]], dtype=np.uint8)
+# A kernel per direct neighbour, a focal sum with it is the value of that neighbour (0 outside of the domain)
+NEIGHBOUR_KERNELS = [(np.arange(9).reshape(3, 3) == 3 * row + col).astype(np.uint8)
+                     for row, col in zip(*np.nonzero(NEIGHBOURS))]
+
+class Groundwater:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Initialize the standard arrays and the interval of the groundwater update.
+        2) Set the solver and its settings.
+        """
+        self.std_arr_lue    = StandardArraysLUE(configuration)
+        self.interval       = Scheduler(configuration).intervals["groundwater"]
+        self.resolution     = float(configuration.modelSettings['resolution'])
+        self.cell_area      = self.resolution * self.resolution
+
+        self.solver         = configuration.modelSettings.get('groundWaterSolver', 'explicit')
+        self.max_iterations = int(configuration.modelSettings.get('groundWaterIterations', '100'))
+        self.tolerance      = float(configuration.modelSettings.get('groundWaterTolerance', '0.0001'))
+        self.relaxation     = float(configuration.modelSettings.get('groundWaterRelaxation', '1.5'))
+        self.check_interval = 10
+        self.explicit       = self.solver == "explicit"
+
+        if self.solver not in ("explicit", "implicit"):
+            raise Exception(f"Error: Invalid groundWaterSolver '{self.solver}', choose from: explicit, implicit")
+
+        # Created on the first implicit step, when the runtime is available
+        self.nr_neighbours    = None
+        self.neighbour_exists = None
+        self.colours          = None
+
+    def explicit_flux(self, gw_s, gw_height, Ks, min_gw_s, steps, timestep):
+        """Lateral groundwater flux along the steepest gradient (D8), applied every routing step of the flux interval.
+
+        Args:
+            gw_s (lpa*):        Groundwater storage
+            gw_height (lpa*):   Groundwater table
+            Ks (lpa*):          Hydraulic conductivity
+            min_gw_s (lpa*):    Minimum groundwater storage
+            steps (int):        Routing steps in the flux interval
+            timestep (float):   Routing timestep
+
+        Returns:
+            gw_lateral (lpa*):  Net lateral inflow of groundwater per routing step
+
+        lpa*: lue partitioned array
+        """
+        # Groundwater LDD, gradient and flow flux
+        gw_ldd          = lfr.d8_flow_direction(gw_height)
+        del_h_gw        = gw_height - lfr.downstream(gw_ldd, gw_height)
+        gw_grad         = (del_h_gw) / self.resolution
+        gw_flow         = Ks * gw_grad * timestep * (gw_s / self.cell_area) * self.resolution                       # Groundwater velocity in m2/s
+
+        # If the groundwater flow because of the impermeable layer is larger than the amount of water available, than it should be set so only the stored water will move.
+        gw_flow         = lfr.where(gw_flow * steps > gw_s - min_gw_s, (gw_s - min_gw_s)/steps, gw_flow)
+        gw_flow         = lfr.where(gw_s < min_gw_s, 1E-20, gw_flow)
+        return lfr.upstream(gw_ldd, gw_flow) - gw_flow
+
+    def implicit(self, gw_s, imperm_lay_height, Ks, min_gw_s, interval = None):
+        """Advance the lateral groundwater flow over one groundwater interval with a backward Euler step.
+
+        Flow between direct neighbours uses the mean transmissivity of both cells, taken at the start of the
+        interval (semi-implicit). The linear system is solved with red-black successive over-relaxation, every
+        half sweep is a parallel focal operation, so the solver scales over partitions like the rest of the model.
+        The step is stable for any interval, the accuracy decreases with the length of the interval.
+
+        The storage is updated with the flows between the cells at the solved heads, so the water is conserved
+        independent of the convergence of the solver. As in the explicit solver, the outflow of a cell is limited
+        to its storage above the minimum storage (wilting point), see limited_flows.
+
+        Args:
+            gw_s (lpa*):                Groundwater storage
+            imperm_lay_height (lpa*):   Height of the impermeable layer
+            Ks (lpa*):                  Hydraulic conductivity, at the precision of gw_s
+            min_gw_s (lpa*):            Minimum groundwater storage
+            interval (float):           Length of the step in seconds, defaults to the groundwater interval
+
+        Returns:
+            gw_s (lpa*):                Groundwater storage at the end of the interval
+
+        lpa*: lue partitioned array
+        """
+        if self.colours is None:
+            self.initialize_solver()
+
+        interval     = interval or self.interval
+        storage      = self.cell_area / interval
+        thickness    = gw_s / self.cell_area
+        transmissivity = Ks * lfr.where(thickness > 0, thickness, 0)            # m2/s
+        head_old     = imperm_lay_height + thickness
+
+        # Diagonal of the system: storage term plus the conductance to all neighbours
+        diagonal     = storage + (self.nr_neighbours * transmissivity + lfr.focal_sum(transmissivity, NEIGHBOURS)) / 2
+        known        = storage * head_old
+
+        head = head_old
+        for i in range(self.max_iterations):
+            previous = head
+            for colour in self.colours:
+                off_diagonal = (transmissivity * lfr.focal_sum(head, NEIGHBOURS) +
+                                lfr.focal_sum(transmissivity * head, NEIGHBOURS)) / 2
+                relaxed      = head + self.relaxation * ((known + off_diagonal) / diagonal - head)
+                head         = lfr.where(colour, relaxed, head)
+
+            if (i + 1) % self.check_interval == 0:
+                change = head - previous
+                if lfr.maximum(lfr.where(change < 0, -change, change)).get() < self.tolerance:
+                    break
+
+        net_outflow = None
+        for flow in self.limited_flows(gw_s, min_gw_s, transmissivity, head, interval):
+            net_outflow = flow if net_outflow is None else net_outflow + flow
+        return gw_s - net_outflow * interval
+
+    def limited_flows(self, gw_s, min_gw_s, transmissivity, head, interval):
+        """The flow (m3/s) from every cell to each of its direct neighbours at the solved heads, negative for inflow.
+
+        The flows out of a cell are scaled down together when they would take more than its storage above the
+        minimum storage in the interval. The flow between two cells is scaled with the factor of the cell it leaves,
+        so the flow out of one cell is always the flow into its neighbour and no water is created or destroyed.
+
+        lpa*: lue partitioned array
+        """
+        flows = []
+        for kernel, exists in zip(NEIGHBOUR_KERNELS, self.neighbour_exists):
+            conductance = (transmissivity + lfr.focal_sum(transmissivity, kernel)) / 2
+            flows.append(lfr.where(exists, conductance * (head - lfr.focal_sum(head, kernel)), 0))
+
+        outflow   = None
+        for flow in flows:
+            flow    = lfr.where(flow > 0, flow, 0)
+            outflow = flow if outflow is None else outflow + flow
+        available = lfr.where(gw_s > min_gw_s, gw_s - min_gw_s, 0)
+        demand    = outflow * interval
+        factor    = lfr.where(demand > available, available / lfr.where(demand > 0, demand, 1), 1)
+        return [lfr.where(flow > 0, flow * factor, flow * lfr.focal_sum(factor, kernel))
+                for kernel, flow in zip(NEIGHBOUR_KERNELS, flows)]
+
+    def initialize_solver(self):
+        """Count the neighbours of every cell (fewer at the edges, which have no flow), mark which direct neighbours
+        exist and create the red-black masks."""
+        one = self.std_arr_lue.one(self.std_arr_lue.state_dtype)
+        self.nr_neighbours    = lfr.focal_sum(one, NEIGHBOURS)
+        self.neighbour_exists = [lfr.focal_sum(one, kernel) > 0 for kernel in NEIGHBOUR_KERNELS]
+
+        rows, cols = np.indices(2 * (self.std_arr_lue.array_extent,))
+        red = ((rows + cols) % 2 == 0).astype(np.uint8)
+        partition_shape = 2 * (self.std_arr_lue.partition_extent,)
+        self.colours = (lfr.from_numpy(red, partition_shape) == 1,
+                        lfr.from_numpy(1 - red, partition_shape) == 1)
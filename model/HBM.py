@@ -5,27 +5,41 @@ Created on Wed Feb 15 2023
 @author: steven.hosper
 """
 # The HydrologicBaseModel
-import lue.framework as lfr
+import sys
+import time
+
+# Timer to add some measure of functionality to the program
+start_time = time.time()
+
+# The imports and initialization are timed with --profile-startup. Visualization tools are only imported when used.
+from StartupProfile import StartupProfile
+startup_profile = StartupProfile("--profile-startup" in sys.argv)
+
 import math as math
 import os
 import datetime
-import sys
-import time
-import csv
 
-# Submodules
+# Submodules, the array operations (lfr) are those of the backend selected in the configuration
+from Backend import lfr
 from configuration_v2 import Configuration
 from reporting import Report
 from StandardArraysLUE import StandardArraysLUE
 from RetrieveData import RetrieveData
 from CalculateFlux import CalculateFlux
 from utilityFunctionsHBM import utilityFunctions
-
-# Other tools
-import tools.MakeGIF
-
-# Timer to add some measure of functionality to the program
-start_time = time.time()
+from PrepareInputs import PrepareInputs
+from GenerateLDD import GenerateLDD
+from Scheduler import Scheduler
+from Groundwater import Groundwater
+from SpinUp import SpinUp
+from Routing import Routing
+from OutflowLog import OutflowLog
+from Boundary import Boundary
+from InputLoader import InputLoader
+from StaticStore import StaticStore
+from Metrics import Metrics
+from StateStore import StateStore
+startup_profile.mark("import submodules")
 
 usage = """\
 Run the main model of the hydrologic base model.
@@ -36,212 +50,319 @@ Usage:
 Options:
     {command} : --hpx:thread = integer;
                 The integer is the amount of cores used during the model run.
+                --config = path;
+                The configuration file of the run, defaults to the config.ini of the project.
+                --hpx:localities = integer;
+                The amount of localities (processes) the partitions are distributed over,
+                tools/launchLocalities.py starts them on a single machine.
+                --profile-startup;
+                Print the time spent on imports, starting HPX and initializing the model.
+                --backend = lue | numpy;
+                The array backend, overrides the backend of the configuration.
 """.format(
     command=os.path.basename(sys.argv[0])
 )
 
+def command_line_option(argv, name, default):
+    """Return the value of a --name=value command line option, or the default."""
+    for argument in argv[1:]:
+        if argument.startswith(f"{name}="):
+            return argument.split("=", 1)[1]
+    return default
+
+def check_localities(configuration, localities):
+    """The partitions are distributed over the localities, a locality without partitions does no work.
+
+    With more than one locality only the LUE operations of the model run distributed: the reductions (the outflow)
+    and the rasters that are written (reports and saved states) are collected by LUE on the root locality. Options
+    that copy whole arrays into the Python process of the root locality, or that have no localities at all, are
+    refused instead of silently running on part of the data.
+    """
+    if localities <= 1:
+        return
+    refused = {"the numpy backend runs the whole model in every process":
+                   lfr.name == "numpy",
+               "sharedStatics copies the static arrays between NumPy and the partitions in the root process":
+                   bool(configuration.generalSettings.get('sharedStatics', '')),
+               "the implicit groundwater solver (also used by spinUp) creates its colour masks from NumPy arrays "
+               "in the root process":
+                   configuration.modelSettings.get('groundWaterSolver', 'explicit') == 'implicit' or
+                   configuration.modelSettings.get('spinUp', 'False') == 'True',
+               }
+    reasons = [reason for reason, applies in refused.items() if applies]
+    if reasons:
+        raise Exception(f"Error: Not supported on {localities} localities: {'; '.join(reasons)}")
+
+    nr_partitions = math.ceil(int(configuration.modelSettings['arrayExtent']) /
+                              int(configuration.modelSettings['partitionExtent'])) ** 2
+    print(f"Distributing {nr_partitions} partitions over {localities} localities")
+    if nr_partitions < localities:
+        print(f"Not every locality has a partition, use a partitionExtent of at most "
+              f"{math.ceil(int(configuration.modelSettings['arrayExtent']) / math.ceil(math.sqrt(localities)))}")
+
+def configuration_path(argv):
+    """Return the configuration file given with --config=path, or the default config.ini."""
+    return command_line_option(argv, "--config", "F:/Projecten intern (2023)/Stage Steven Hosper/Model/v1/config/config.ini")
+
 class mainModel:
-    def __init__(self, configuration):
+    def __init__(self, configuration, startup_profile = StartupProfile(False)):
         print("Initializing the program...")
         # Initialize submodules
         self.standard_LUE   = StandardArraysLUE(configuration)
         self.retrieve_data  = RetrieveData(configuration)
         self.calculate_flux = CalculateFlux(configuration)
+        self.prepare_inputs = PrepareInputs(configuration)
+        self.scheduler      = Scheduler(configuration)
+        self.groundwater    = Groundwater(configuration)
+        self.routing        = Routing(configuration)
+        self.boundary       = Boundary(configuration)
+        self.state_store    = StateStore(configuration)
+        startup_profile.mark("initialize submodules")
         
         # Set directories
         self.input_dir   = configuration.generalSettings['inputDir'] + configuration.generalSettings['scenario'] 
         self.output_dir  = configuration.generalSettings['outputDir'] + configuration.generalSettings['scenario']
         
-        partition_shape  = 2 * (configuration.modelSettings['partitionExtent'],)
+        state_dtype      = self.standard_LUE.state_dtype
+        parameter_dtype  = self.standard_LUE.parameter_dtype
         
-        # Initialize data required from memory files
-        # Get all constants        
-        self.dem        = lfr.from_gdal(self.input_dir + configuration.dataSettings['dem'], partition_shape)              # DEM map of the study area
-        self.dem        = lfr.where(self.dem < 0.1, 35, self.dem)
-        land_use         = lfr.from_gdal(self.input_dir + configuration.dataSettings['landUseMap'], partition_shape)       # Land-use, example: road
-        soil_type        = lfr.from_gdal(self.input_dir + configuration.dataSettings['soilMap'], partition_shape)          # example: sand or clay
-        
-        # Retrieve the soil properties
-        self.Ks, self.porosity, self.wilting_point = self.retrieve_data.soil_csv(
-            configuration.generalSettings['inputDir'] + configuration.dataSettings['soilData'], soil_type)               # soil characteristic
-        
-        # Retrieve the land-use properties
-        self.mannings, self.permeability, self.max_int_s, self.throughfall_frac = \
-            self.retrieve_data.land_characteristics_csv(
-                configuration.generalSettings['inputDir'] + configuration.dataSettings['landUseData'], land_use)         # land-use characteristics
-        
-        self.gw_base = float(configuration.modelSettings['groundWaterBase']) * self.standard_LUE.one()
-        # self.ldd = lfr.d8_flow_direction(self.dem)
-        self.ldd        = lfr.from_gdal(self.input_dir + configuration.dataSettings['ldd'], partition_shape)
         # Set constants
         self.resolution                 = float(configuration.modelSettings['resolution'])
         self.cell_area                  = self.resolution * self.resolution
-        self.slope          	        = lfr.slope(self.dem, self.resolution)
         self.imperm_below_dem           = float(configuration.modelSettings['impermeableLayerBelowDEM'])
-        self.imperm_lay_height          = self.dem - self.imperm_below_dem
         self.water_below_dem            = float(configuration.modelSettings['waterBelowDEM'])
         self.max_gw_s                   = self.imperm_below_dem * self.cell_area            # Full storage of porosity
-        self.min_gw_s                   = self.max_gw_s * (self.wilting_point / self.porosity)        # Minimum storage because of wilting point
-        # self.notBoundaryCells       = generate.boundaryCell() # Currently not working
+        
+        # Initialize data required from memory files, the inputs are converted to partition-aligned tiles so
+        # every partition is read lazily from its own blocks. All inputs and tables are submitted at once, the
+        # conversions and the parsing run concurrently and are collected when they are used.
+        loader             = InputLoader(configuration)
+        # Initial states that are not configured or do not exist are derived below
+        ini_gw_s_future    = loader.optional('iniGroundWaterStorage')
+        ini_water_h_future = loader.optional('iniWaterHeight')
+        ini_int_s_future   = loader.optional('iniInterceptionStorage')
+        
+        # Members of an ensemble attach to the static arrays published by the first member (sharedStatics)
+        self.static_store  = StaticStore(configuration)
+        statics            = self.static_store.attach()
+        if statics is None:
+            self.load_statics(configuration, loader, startup_profile)
+            self.static_store.publish(self)
+        else:
+            for name, array in statics.items():
+                setattr(self, name, array)
+            startup_profile.mark("attach shared statics")
+        
+        # The domain and catchment edge masks are only needed (and cached) for a fixed groundwater boundary
+        if self.boundary.groundwater != "closed":
+            self.boundary.initialize(self.catchment)
         
         # Load initial groundWaterStorage, if no raster is supplied, use the waterBelowDEM in combination with DEM to create a initialGroundWaterStorage layer.
-        try:
-            self.ini_gw_s   = lfr.from_gdal(self.input_dir + configuration.dataSettings['iniGroundWaterStorage'], partition_shape)
-        except:
-            print("Did not find a initial groundwater height file, looked at: {}".format(configuration.dataSettings['iniGroundWaterStorage']))
+        if ini_gw_s_future is not None:
+            self.ini_gw_s   = loader.array(ini_gw_s_future, state_dtype)
+        else:
             self.ini_gw_s   = lfr.where(self.dem > (self.gw_base + self.water_below_dem),
                                         ((self.dem - self.water_below_dem)-self.imperm_lay_height) * self.cell_area,
                                         (self.gw_base - self.imperm_below_dem) * self.cell_area)
             self.ini_gw_s   = lfr.where(self.ini_gw_s > self.max_gw_s, self.max_gw_s, self.ini_gw_s)
+            
+            # Start from the (cached) steady state of the groundwater instead, which skips the warm-up of the run
+            if configuration.modelSettings.get('spinUp', 'False') == 'True':
+                self.ini_gw_s = SpinUp(configuration).initial_groundwater(self.ini_gw_s, self.imperm_lay_height,
+                                                                          self.standard_LUE.to_state(self.Ks),
+                                                                          self.standard_LUE.to_state(self.min_gw_s), self.max_gw_s,
+                                                                          self.standard_LUE.to_state(self.porosity))
         
         # Load initial discharge, if no raster is supplied, set to zero.
-        try:
-            self.ini_water_h           = lfr.from_gdal(self.input_dir + configuration.dataSettings['iniWaterHeight'], partition_shape)
-        except:
-            print("Did not find a initial discharge file, looked at: {}".format(configuration.dataSettings['iniWaterHeight']))
-            self.ini_water_h           = self.standard_LUE.zero()
+        if ini_water_h_future is not None:
+            self.ini_water_h = loader.array(ini_water_h_future, state_dtype)
+        else:
+            self.ini_water_h = self.standard_LUE.zero(state_dtype)
         
         # Initial InterceptionStorage and groundWaterStorage
-        try:
-            self.ini_int_s = lfr.from_gdal(self.input_dir + configuration.dataSettings['iniInterceptionStorage'], partition_shape)
-        except:
-            print("Did not find a initial interception storage file, looked at: {}".format(configuration.dataSettings['iniInterceptionStorage']))
-            self.ini_int_s = self.standard_LUE.zero()
+        if ini_int_s_future is not None:
+            self.ini_int_s = loader.array(ini_int_s_future, parameter_dtype)
+        else:
+            self.ini_int_s = self.standard_LUE.zero(parameter_dtype)
+        loader.close()
 
+        # LUE operations are asynchronous, the phases measure the time to issue them, not to complete them
+        startup_profile.mark("initial conditions")
         print("\n")
+    
+    def load_statics(self, configuration, loader, startup_profile):
+        """Prepare and load the static inputs and derive the static parameters (StaticStore.STATICS) of the model."""
+        state_dtype        = self.standard_LUE.state_dtype
+        generate_ldd       = configuration.generalSettings.get('generateLDD', 'False') == 'True'
+        dem_future         = loader.raster('dem')
+        land_use_future    = loader.raster('landUseMap', 'classes')
+        soil_future        = loader.raster('soilMap', 'classes')
+        ldd_future         = None if generate_ldd else loader.raster('ldd', 'ldd')
+        soil_table         = loader.table('soilData')
+        land_use_table     = loader.table('landUseData')
         
+        # Get all constants        
+        self.dem        = loader.array(dem_future, state_dtype)                                   # DEM map of the study area
+        self.catchment  = self.dem >= 0.1
+        self.dem        = lfr.where(self.dem < 0.1, 35, self.dem)
+        
+        # Class rasters are validated and cached in the smallest integer type once, only the classes present are assigned
+        land_use, land_use_ids   = loader.class_array(land_use_future)  # Land-use, example: road
+        soil_type, soil_type_ids = loader.class_array(soil_future)      # example: sand or clay
+        
+        startup_profile.mark("prepare and load static inputs")
+        
+        # Retrieve the soil properties
+        self.Ks, self.porosity, self.wilting_point = self.retrieve_data.soil_csv(
+            soil_table.result(), soil_type, soil_type_ids)  # soil characteristic
+        
+        # Retrieve the land-use properties
+        self.mannings, self.permeability, self.max_int_s, self.throughfall_frac = \
+            self.retrieve_data.land_characteristics_csv(land_use_table.result(), land_use, land_use_ids)  # land-use characteristics
+        
+        self.gw_base = float(configuration.modelSettings['groundWaterBase']) * self.standard_LUE.one(state_dtype)
+        # The LDD is either generated from the DEM (cached on the hash of the DEM) or loaded from file
+        if generate_ldd:
+            self.ldd    = GenerateLDD(configuration).ldd(configuration.dataSettings['dem'], self.dem)
+        else:
+            self.ldd    = loader.array(ldd_future)  # uint8
+        self.outlet     = self.ldd == 5
+        startup_profile.mark("parameters and LDD")
+        
+        # Derived parameters
+        self.slope          	        = self.standard_LUE.to_parameter(lfr.slope(self.dem, self.resolution))
+        self.imperm_lay_height          = self.dem - self.imperm_below_dem
+        self.min_gw_s                   = self.max_gw_s * (self.wilting_point / self.porosity)        # Minimum storage because of wilting point
+
     def update_and_route(self):
         pass
 
     @lfr.runtime_scope
-    def dynamic_model(self, configuration, report):
-        dt = int(configuration.modelSettings['iterationsBeforeReport'])
+    def dynamic_model(self, configuration, report, metrics = None):
+        # Routing, flux/forcing updates and reporting each run at their own interval
+        scheduler    = self.scheduler
+        dt           = scheduler.steps["flux"]
         start_date   = utilityFunctions.string_to_datetime(configuration.modelSettings['startDate'], ", ")
         end_date     = utilityFunctions.string_to_datetime(configuration.modelSettings['endDate'], ", ")
-        dT = int((end_date - start_date).seconds / dt)
+        nr_steps     = scheduler.nr_steps(start_date, end_date)
+        std_arr      = self.standard_LUE
         
         # Loading initial conditions
         height      = self.ini_water_h
         gw_s        = self.ini_gw_s
         int_s       = self.ini_int_s
-        gw_height   = self.imperm_lay_height + gw_s/self.cell_area
         
-        # Values for discharge to height calculation
+        # Values for discharge to height calculation, routing runs at state precision
         slope_sqrd  = utilityFunctions.calculate_sqrd_slope(self.slope, 0.05, 0.00001)
         width       = 1
-        coefficient = self.mannings / (slope_sqrd * width)
+        coefficient = std_arr.to_state(self.mannings / (slope_sqrd * width))
+        porosity    = std_arr.to_state(self.porosity)
+        Ks          = std_arr.to_state(self.Ks)                 # Used by the implicit groundwater solver
+        min_gw_s    = std_arr.to_state(self.min_gw_s)
         
         # Channel length and area
-        channel_length      = self.resolution * self.standard_LUE.one()
+        channel_length      = self.resolution * std_arr.one(std_arr.state_dtype)
         channel_area        = width * channel_length
-        channel_rat         = channel_area / self.cell_area
-        infil_to_gw_s       = channel_area / self.porosity
+        channel_rat         = (width * self.resolution * std_arr.one(std_arr.parameter_dtype)) / self.cell_area
+        infil_to_gw_s       = channel_area / porosity
         
         # Refactorings value from mm/hour to m/h times the cell area.
         refactor            = (self.cell_area / 1000) / 3600         
         
-        # Kinematic Surface Water Routing Constants
-        alpha       = 1.5
-        beta        = 0.6
-        timestep    = 1.0 * float(configuration.modelSettings['timestep'])
-        c           = 5/3
+        timestep    = scheduler.timestep
 
         # Static, really small value because inflow = 0 is not accepted
-        inflow = self.standard_LUE.one()*1E-20
+        inflow = std_arr.one(std_arr.state_dtype)*1E-20
+        self.routing.prepare(self.ldd, inflow, coefficient, channel_length, channel_area, porosity, self.max_gw_s,
+                             self.boundary.groundwater_condition(gw_s))
         
-        # Open file to write maximum discharge values to for post simulation validation.
-        with open(self.output_dir + "/maximumDischarge.csv", "w", newline="") as f:
-            writer = csv.writer(f, delimiter=';')
+        # Open the binary log of the outflow of every routing step, for post simulation validation.
+        with OutflowLog(configuration) as outflow_log:
             
-            # Start model for dT large periods
-            for i in range(dT):
-                # Time in minutes is the small iteration multiplied with the timestep (both in seconds) divided by 60 seconds.
-                date = start_date + datetime.timedelta(seconds = i * (dt*timestep)) 
-                
-                # Load flux and storage values
-                precipitation = self.retrieve_data.csv_timeseries_to_flux(configuration.generalSettings['inputDir'] +
-                                                                          configuration.dataSettings['precipitationData'],
-                                                                          refactor, date) # m/s
-                
-                ref_evaporation = self.retrieve_data.csv_timeseries_to_flux(configuration.generalSettings['inputDir'] +
-                                                                            configuration.dataSettings['evapotranspirationData'],
-                                                                            refactor, date) # m/s
-                
-                int_s, precipitation, evapotranspiration_surface = self.calculate_flux.interception(int_s,
-                                                                                                    self.max_int_s,
-                                                                                                    precipitation,
-                                                                                                    ref_evaporation,
-                                                                                                    self.throughfall_frac)
-                
-                evapotranspiration_surface, evapotranspiration_soil = self.calculate_flux.evapotranspiration(precipitation,
-                                                                                                             evapotranspiration_surface)
-                
-                direct_infiltration, pot_channel_infiltation = self.calculate_flux.infiltration(gw_s,
-                                                                                                self.max_gw_s,
-                                                                                                self.Ks,
-                                                                                                self.permeability,
-                                                                                                self.porosity,
-                                                                                                precipitation,
-                                                                                                evapotranspiration_surface)
-                
-                # The infiltration happens only in the region that is used by the channel and therefore this factor should be accounted for
-                pot_channel_infiltation = pot_channel_infiltation * channel_rat  # is in m/s
-
-                # Groundwater LDD, gradient and flow flux
-                gw_ldd          = lfr.d8_flow_direction(gw_height)
-                del_h_gw        = gw_height - lfr.downstream(gw_ldd, gw_height)
-                gw_grad         = (del_h_gw) / self.resolution
-                gw_flow         = self.Ks * gw_grad * timestep * (gw_height - self.imperm_lay_height) * self.resolution                       # Groundwater velocity in m2/s
+            # Start model for nr_steps routing steps
+            for step in range(nr_steps):
+                step_start = time.perf_counter()
+                date = start_date + datetime.timedelta(seconds = step * timestep)
                 
-                # If the groundwater flow because of the impermeable layer is larger than the amount of water available, than it should be set so only the stored water will move.
-                gw_flow         = lfr.where(gw_flow * dt > gw_s - self.min_gw_s, (gw_s - self.min_gw_s)/dt, gw_flow)
-                gw_flow         = lfr.where(gw_s < self.min_gw_s, 1E-20, gw_flow)
-                
-                # Add all vertical processes for the surfacewater and all processes groundwater
-                gw_flux      = ((direct_infiltration - evapotranspiration_soil)/self.porosity) + lfr.upstream(gw_ldd, gw_flow) - gw_flow          # Is now in cubic meters
-                sw_flux      =  precipitation - evapotranspiration_surface - direct_infiltration                                         # Is now in cubic meters
-                
-                for j in range(dt):
-                    # The groundwater is adjusted by the fluxes
-                    # channel_infiltation = lfr.where(height > pot_channel_infiltation, pot_channel_infiltation, height)
-                    gw_s         = gw_s + gw_flux                                #+ channel_infiltation*infil_to_gw_s                                                                 
+                # Forcing, vertical fluxes and groundwater flow are updated at the start of every flux interval
+                if scheduler.starts("flux", step):
+                    # Load flux and storage values
+                    precipitation = self.retrieve_data.csv_timeseries_to_flux(configuration.generalSettings['inputDir'] +
+                                                                              configuration.dataSettings['precipitationData'],
+                                                                              refactor, date) # m/s
                     
-                    # If the groundwater table surpases the digital elevation map, groundwater is turned into runoff.
-                    seepage     = lfr.where(gw_s > self.max_gw_s, (gw_s - self.max_gw_s)*self.porosity, 0)
+                    ref_evaporation = self.retrieve_data.evapotranspiration_flux(configuration.generalSettings['inputDir'] +
+                                                                                 configuration.dataSettings['evapotranspirationData'],
+                                                                                 refactor, date) # m/s
                     
-                    # Discharge is affected by the surfacewater fluxes, and seepage is added
-                    height   = height + ((sw_flux + seepage)/channel_area)            #- channel_infiltation
+                    # Vertical fluxes and groundwater flow are determined at parameter precision
+                    gw_s_parameter = std_arr.to_parameter(gw_s)
+                    gw_height      = std_arr.to_parameter(self.imperm_lay_height + gw_s/self.cell_area)
                     
-                    discharge = lfr.pow(height, c) / coefficient
+                    int_s, precipitation, evapotranspiration_surface = self.calculate_flux.interception(int_s,
+                                                                                                        self.max_int_s,
+                                                                                                        precipitation,
+                                                                                                        ref_evaporation,
+                                                                                                        self.throughfall_frac)
                     
-                    # Because the kinematic wave has difficulties working with zero's, we have opted for a very small value. This will impact model results.
-                    discharge   = lfr.where(discharge < 1E-20, 1E-20, discharge)
-
-                    # Water routing based on the kinematic wave function, currently alpha is a float. Hopefully mannings raster can be used in the future.
-                    discharge           = lfr.kinematic_wave(self.ldd, discharge, inflow,\
-                                                alpha, beta, timestep,\
-                                                channel_length,)
+                    evapotranspiration_surface, evapotranspiration_soil = self.calculate_flux.evapotranspiration(precipitation,
+                                                                                                                 evapotranspiration_surface)
                     
-                    height = lfr.pow(coefficient*discharge, 0.6)
+                    direct_infiltration, pot_channel_infiltation = self.calculate_flux.infiltration(gw_s_parameter,
+                                                                                                    self.max_gw_s,
+                                                                                                    self.Ks,
+                                                                                                    self.permeability,
+                                                                                                    self.porosity,
+                                                                                                    precipitation,
+                                                                                                    evapotranspiration_surface)
                     
-                    # Any water that is moved from groundwater to discharge has to be removed from the groundwaterStorage
-                    gw_s         = gw_s - (seepage / self.porosity)
+                    # The infiltration happens only in the region that is used by the channel and therefore this factor should be accounted for
+                    pot_channel_infiltation = pot_channel_infiltation * channel_rat  # is in m/s
                     
-                    # Get the maximum value of the discharge raster (to limit the amount of tasks created by HPX)
-                    outflow = lfr.minimum(lfr.zonal_sum(discharge, self.ldd == 5)).get()
-                    print("outflow: ", outflow)
+                    # Add all vertical processes for the surfacewater and all processes groundwater. With the implicit
+                    # solver the lateral groundwater flow is applied once per groundwater interval instead.
+                    gw_flux      = ((direct_infiltration - evapotranspiration_soil)/self.porosity)                                        # Is now in cubic meters
+                    if self.groundwater.explicit:
+                        gw_flux  = gw_flux + self.groundwater.explicit_flux(gw_s_parameter, gw_height, self.Ks, self.min_gw_s, dt, timestep)
+                    sw_flux      =  precipitation - evapotranspiration_surface - direct_infiltration                                         # Is now in cubic meters
+                    gw_flux      = std_arr.to_state(gw_flux)
+                    sw_flux      = std_arr.to_state(sw_flux)
                     
-                    # Write value to csv for later validation
-                    writer.writerow([i*60 + j, outflow])
+                # Discharge entering the domain over its boundary (an incremental run), updated every report interval
+                if self.boundary.inflow_maps and scheduler.starts("report", step):
+                    boundary_inflow = self.boundary.inflow(date, channel_length)
+                    if boundary_inflow is not None:
+                        self.routing.set_inflow(inflow + boundary_inflow)
                 
-                # Adjust the GW Table for the LDD creation of the next timestep.
-                gw_height = self.imperm_lay_height + gw_s/self.cell_area
+                # Lateral groundwater flow with the implicit solver, stable at groundwater intervals of minutes to hours
+                if not self.groundwater.explicit and scheduler.starts("groundwater", step):
+                    gw_s = self.groundwater.implicit(gw_s, self.imperm_lay_height, Ks, min_gw_s)
                 
-                # Save / Report data
-                print(f"Done: {i+1}/{dT}")
-                variables = {"discharge": discharge, "int_s": int_s, "height": height, "gw_s": gw_s,
-                             }
-                report.dynamic(date, variables)   
+                # The fluxes are added to the state, seepage is turned into runoff and the surface water is routed
+                # channel_infiltation = lfr.where(height > pot_channel_infiltation, pot_channel_infiltation, height)
+                gw_s, height, discharge = self.routing.update(gw_s, height, gw_flux, sw_flux)
+                
+                # Get the maximum value of the discharge raster (to limit the amount of tasks created by HPX), summed in float64
+                outflow = lfr.minimum(lfr.zonal_sum(std_arr.to_accumulation(discharge), self.outlet)).get()
+                print("outflow: ", outflow)
+                
+                # Append the value to the log for later validation, the statistics of the outflow are updated in-run
+                outflow_log.append(outflow)
+                if metrics is not None:
+                    metrics.step(step + 1, nr_steps, (step + 1) * timestep, outflow, time.perf_counter() - step_start)
+                
+                # Save the state at the valid times of saveStates, a later run (forecast cycle) starts from it
+                state_date = date + datetime.timedelta(seconds = timestep)
+                if self.state_store.due(state_date):
+                    self.state_store.save(state_date, {"gw_s": gw_s, "height": height, "int_s": int_s})
+                
+                # Save / Report data at the end of every report interval, labelled with the start of the interval
+                if scheduler.ends("report", step):
+                    print(f"Done: {step+1}/{nr_steps}")
+                    report_date = start_date + datetime.timedelta(seconds = scheduler.interval_start("report", step))
+                    variables = {"discharge": discharge, "int_s": int_s, "height": height, "gw_s": gw_s,
+                                 }
+                    report.dynamic(report_date, variables)   
         return 0
 
 
@@ -262,22 +383,51 @@ cfg = [
     "hpx.agas.max_pending_refcnt_requests!=50",
 ]
 
+# The backend is selected before the runtime is started, the numpy backend has no runtime
+configuration = Configuration(configuration_path(sys.argv))
+startup_profile.mark("read configuration")
+lfr.select(command_line_option(sys.argv, "--backend", configuration.generalSettings.get('backend', 'lue')))
+if lfr.name == "numpy":
+    lfr.use_jit(configuration.generalSettings.get('jitKernels', 'False') == 'True')
+startup_profile.mark(f"import {lfr.name} backend")
+
+# With partitionExtent = auto the tiling is chosen from the drainage network, before any partitioned array is created
+localities = int(command_line_option(sys.argv, "--hpx:localities", 1))
+if configuration.modelSettings['partitionExtent'].strip() == 'auto':
+    from Subcatchments import resolve_partition_extent
+    threads = command_line_option(sys.argv, "--hpx:threads", "")
+    resolve_partition_extent(configuration, (int(threads) if threads.isdigit() else os.cpu_count() or 1) * localities, localities)
+    startup_profile.mark("choose the partition extent")
+
+# Every locality checks the options before the runtime is started, so they all stop on an unsupported option
+check_localities(configuration, localities)
+
+# Sampling of the HPX performance counters is requested on the command line of the runtime
+metrics = Metrics(configuration)
+if lfr.name == "lue":
+    sys.argv += metrics.hpx_arguments()
+
 lfr.start_hpx_runtime(cfg)
+startup_profile.mark("start HPX runtime")
 
 # The root locality will distribute the work over all other
 # localities. Never perform Python code on the other localities than the
 # root locality unless you know what you are doing.
 if lfr.on_root_locality():
     # Run the main model
-    configuration = Configuration("F:/Projecten intern (2023)/Stage Steven Hosper/Model/v1/config/config.ini")
     report        = Report(configuration)
-    main = mainModel(configuration)
-    main.dynamic_model(configuration, report)
+    main = mainModel(configuration, startup_profile)
+    startup_profile.report()
+    metrics.start_sampling()
+    main.dynamic_model(configuration, report, metrics)
+    metrics.stop()
+    report.wait()
     report.balance_report(configuration)  
     
     # Process the results into a gif
     if configuration.generalSettings['makeGIF'] == 'True':
         print(f"Creating a GIF for: {configuration.gifSettings['variables']}.")
+        import tools.MakeGIF
         tools.MakeGIF.run(configuration)
 
 print("--- %s seconds ---" % (time.time() - start_time))
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from Backend import lfr
+from PrepareInputs import PrepareInputs
+
+class InputLoader:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Set the input preparation, the partition shape and the input directory of the scenario.
+        2) Start the thread pool that prepares the rasters and reads the tables.
+
+        The static inputs used to be prepared and read one after the other, while each of them mostly waits on
+        the disk (GDAL and the pandas parser release the GIL). All of them are now submitted at once and collected
+        when they are used, so the conversion of the class rasters, the LDD and the initial states and the parsing
+        of the soil and land-use tables overlap. LUE reads the tiles of a raster asynchronously itself, the arrays
+        are created on the main thread once the raster is prepared; the NumPy backend reads synchronously, there
+        the raster is read in the same task. With concurrentInputs = False a single thread is used, which loads
+        the inputs in the order they are submitted (for comparison in tools/benchmark.py).
+        """
+        self.prepare_inputs  = PrepareInputs(configuration)
+        self.partition_shape = 2 * (int(configuration.modelSettings['partitionExtent']),)
+        self.input_dir       = configuration.generalSettings['inputDir'] + configuration.generalSettings['scenario']
+        self.table_dir       = configuration.generalSettings['inputDir']
+        self.data_settings   = configuration.dataSettings
+        concurrent           = configuration.generalSettings.get('concurrentInputs', 'True') == 'True'
+        threads              = int(configuration.generalSettings.get('inputThreads', '8'))
+        self.executor        = ThreadPoolExecutor(max_workers = threads if concurrent else 1)
+        self.read_in_task    = lfr.name == "numpy"
+
+    def load(self, prepare, file_name):
+        """Prepare (and with the NumPy backend read) a raster, returns the array or the prepared file and the
+        result of the preparation (the class IDs of a class raster)."""
+        prepared = prepare(file_name)
+        cache, extra = prepared if isinstance(prepared, tuple) else (prepared, None)
+        return (lfr.from_gdal(cache, self.partition_shape) if self.read_in_task else cache), extra
+
+    def raster(self, option, prepare = "tiled"):
+        """Submit the raster of a dataSettings option, prepared as a continuous raster by default.
+
+        Args:
+            option (str):       key of the raster in dataSettings
+            prepare (str):      preparation of PrepareInputs: tiled, classes or ldd
+
+        Returns:
+            future (Future):    collect it with array or class_array
+        """
+        return self.executor.submit(self.load, getattr(self.prepare_inputs, prepare), self.data_settings[option])
+
+    def optional(self, option):
+        """Submit an optional raster (an initial state), or return None if it is not configured or does not exist.
+        The file is checked here, instead of letting GDAL fail on it."""
+        file_name = self.data_settings.get(option, '')
+        if not file_name:
+            return None
+        path = self.prepare_inputs.source(file_name)
+        if not os.path.isfile(path):
+            print(f"Did not find {option}, looked at: {path}")
+            return None
+        return self.raster(option)
+
+    def read_table(self, file_name):
+        # pandas is imported in the task as well, the import takes a noticeable part of the startup
+        import pandas as pd
+        return pd.read_csv(file_name)
+
+    def table(self, option):
+        """Submit the parsing of a csv table of a dataSettings option (relative to the input directory)."""
+        return self.executor.submit(self.read_table, self.table_dir + self.data_settings[option])
+
+    def array(self, future, dtype = None):
+        """The array of a submitted raster, cast to dtype if it is given."""
+        array, _ = self.class_array(future)
+        return lfr.cast(array, dtype) if dtype is not None else array
+
+    def class_array(self, future):
+        """The array of a submitted class raster and the classes present in it."""
+        value, ids = future.result()
+        return (lfr.from_gdal(value, self.partition_shape) if isinstance(value, str) else value), ids
+
+    def close(self):
+        self.executor.shutdown(wait = True)
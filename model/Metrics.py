@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# HPX performance counters that are sampled: metric name, counter object, counter name and the scale of the value
+HPX_COUNTERS = {"idle_rate":    ("threads",     "idle-rate",        0.01),   # %, HPX reports 0.01 %
+                "tasks":        ("threads",     "count/cumulative", 1),
+                "queue_length": ("threadqueue", "length",           1),
+                }
+COUNTER_PATTERN = re.compile(r"^/(\w+)\{locality#(\d+)/[^}]*\}/(.+)$")
+
+METRICS_FILE  = "metrics.jsonl"
+COUNTERS_FILE = "hpx_counters.csv"
+
+class Metrics:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Set the sampling interval (metricsInterval, 0 is off), the port of the endpoint and the rolling file.
+        2) Set the metrics of the model, which are updated every routing step.
+
+        HPX writes the sampled performance counters (idle rate, tasks, queue lengths per locality) to a csv file,
+        requested with the --hpx:print-counter options of hpx_arguments before the runtime is started. A thread
+        samples the latest counters together with the metrics of the model (simulated seconds per wall second,
+        outflow, duration of the routing steps, resident memory) every metricsInterval seconds. Every sample is
+        appended to metrics.jsonl in the output directory, which rolls over at metricsMaxBytes, and is served on
+        http://localhost:metricsPort/metrics (Prometheus text format) and /metrics.json if a port is set.
+        """
+        output_dir         = configuration.generalSettings['outputDir'] + configuration.generalSettings['scenario']
+        self.interval      = float(configuration.reportSettings.get('metricsInterval', '0'))
+        port               = configuration.reportSettings.get('metricsPort', '')
+        self.port          = int(port) if port else None
+        self.max_bytes     = int(configuration.reportSettings.get('metricsMaxBytes', str(10 * 2**20)))
+        self.metrics_file  = os.path.join(output_dir, METRICS_FILE)
+        self.counters_file = os.path.join(output_dir, COUNTERS_FILE)
+
+        self.lock          = threading.Lock()
+        self.model         = {"step": 0, "steps": 0, "simulated_seconds": 0.0, "outflow": float("nan"),
+                              "step_seconds": float("nan")}
+        self.step_time     = 0.0
+        self.step_count    = 0
+        self.start         = None
+        self.latest        = {}
+        self.stopped       = threading.Event()
+        self.thread        = None
+        self.server        = None
+        self.log           = None
+
+    def enabled(self):
+        return self.interval > 0
+
+    def hpx_arguments(self):
+        """Command line options that make HPX sample the performance counters into the counters file."""
+        if not self.enabled():
+            return []
+        os.makedirs(os.path.dirname(self.counters_file), exist_ok=True)
+        counters = [f"--hpx:print-counter=/{counter_object}{{locality#*/total}}/{name}"
+                    for counter_object, name, _ in HPX_COUNTERS.values()]
+        return counters + [f"--hpx:print-counter-interval={int(self.interval * 1000)}",
+                           f"--hpx:print-counter-destination={self.counters_file}"]
+
+    def start_sampling(self):
+        """Start the sampling thread and the endpoint."""
+        if not self.enabled():
+            return
+        os.makedirs(os.path.dirname(self.metrics_file), exist_ok=True)
+        self.log = logging.getLogger(f"hbm.metrics.{id(self)}")
+        self.log.propagate = False
+        self.log.setLevel(logging.INFO)
+        self.log.addHandler(logging.handlers.RotatingFileHandler(self.metrics_file, maxBytes=self.max_bytes, backupCount=3))
+        self.start = time.perf_counter()
+        if self.port is not None:
+            self.server = ThreadingHTTPServer(("127.0.0.1", self.port), self.handler())
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            print(f"Metrics are served at: http://127.0.0.1:{self.server.server_address[1]}/metrics")
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def step(self, step, steps, simulated_seconds, outflow, seconds):
+        """Update the metrics of the model after a routing step that took seconds (wall time)."""
+        with self.lock:
+            self.model.update(step=step, steps=steps, simulated_seconds=simulated_seconds, outflow=outflow)
+            self.step_time  += seconds
+            self.step_count += 1
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """Collect the metrics of the model, the process and the latest HPX counters, and log them."""
+        with self.lock:
+            # Mean duration of the routing steps since the previous sample
+            if self.step_count:
+                self.model["step_seconds"] = self.step_time / self.step_count
+            self.step_time, self.step_count = 0.0, 0
+            model = dict(self.model)
+        wall_seconds = time.perf_counter() - self.start
+        sample = {"time": time.time(), "wall_seconds": wall_seconds, **model,
+                  "simulation_rate": model["simulated_seconds"] / wall_seconds if wall_seconds > 0 else 0.0,
+                  "rss_mb": self.resident_memory(), **self.hpx_counters()}
+        with self.lock:
+            self.latest = sample
+        self.log.info(json.dumps(sample))
+        return sample
+
+    def resident_memory(self):
+        """Current resident memory (MB) of the process, the peak if /proc is not available."""
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+        except (OSError, ValueError, AttributeError):
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def hpx_counters(self):
+        """The latest value of every sampled counter and locality, read from the end of the counters file.
+        HPX writes a line per counter: name,sequence number,time,[s],value[,unit]."""
+        if not os.path.isfile(self.counters_file):
+            return {}
+        with open(self.counters_file, "rb") as f:
+            f.seek(max(0, os.path.getsize(self.counters_file) - 2**16))
+            lines = f.read().decode(errors="replace").splitlines()
+        names   = {(counter_object, name): (metric, scale) for metric, (counter_object, name, scale) in HPX_COUNTERS.items()}
+        latest  = {}
+        for line in lines:
+            fields = line.split(",")
+            match  = COUNTER_PATTERN.match(fields[0])
+            if not match or len(fields) < 5 or (match.group(1), match.group(3)) not in names:
+                continue
+            metric, scale = names[(match.group(1), match.group(3))]
+            try:
+                latest[f"hpx_{metric}_locality_{match.group(2)}"] = float(fields[4]) * scale
+            except ValueError:
+                continue
+        return latest
+
+    def handler(self):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with metrics.lock:
+                    sample = dict(metrics.latest)
+                if self.path == "/metrics.json":
+                    body, content_type = json.dumps(sample), "application/json"
+                elif self.path == "/metrics":
+                    body = "".join(f"hbm_{name} {value}\n" for name, value in sample.items()
+                                   if isinstance(value, (int, float)))
+                    content_type = "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.end_headers()
+                self.wfile.write(body.encode())
+
+            def log_message(self, *arguments):
+                pass
+
+        return Handler
+
+    def stop(self):
+        """Take a last sample and stop the sampling thread and the endpoint."""
+        if not self.enabled() or self.thread is None:
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+        if self.server is not None:
+            self.server.shutdown()
+        for handler in self.log.handlers:
+            handler.close()
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Single-process NumPy implementation of the lue.framework operations used by the model, selected with
+backend = numpy. For small catchments (about 1000 x 1000 cells) the start of the HPX runtime and the
+tasks created per operation cost more than the operations themselves, here every operation is a single
+NumPy call on the whole array. The partition shapes are accepted and ignored.
+
+The kinematic wave is solved per cell in the order of the flow network. If numba is installed and
+jitKernels = True the loop is compiled, otherwise the cells of a level of the network are solved at once.
+
+@author: steven.hosper
+"""
+
+import math
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Row and column offset of the downstream cell for every LDD direction (numeric keypad, 5 is a pit)
+LDD_OFFSETS = {1: (1, -1), 2: (1, 0), 3: (1, 1),
+               4: (0, -1), 5: (0, 0), 6: (0, 1),
+               7: (-1, -1), 8: (-1, 0), 9: (-1, 1)}
+
+# GDAL type of every array type, GDAL is only imported when rasters are read or written
+GDAL_TYPES = {np.dtype(np.bool_):   "GDT_Byte",
+              np.dtype(np.uint8):   "GDT_Byte",
+              np.dtype(np.uint16):  "GDT_UInt16",
+              np.dtype(np.uint32):  "GDT_UInt32",
+              np.dtype(np.int32):   "GDT_Int32",
+              np.dtype(np.float32): "GDT_Float32",
+              np.dtype(np.float64): "GDT_Float64"}
+
+# Newton-Raphson settings of the kinematic wave, as in PCRaster and LUE
+EPSILON        = 1E-12
+MAX_ITERATIONS = 3000
+MIN_DISCHARGE  = 1E-30
+
+use_jit_kernels = False
+
+
+class Scalar:
+    """Result of a reduction, with get() like the scalar futures of LUE."""
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+# Runtime ----------------------------------------------------------------------
+def start_hpx_runtime(configuration):
+    pass
+
+def on_root_locality():
+    return True
+
+def runtime_scope(function):
+    return function
+
+def use_jit(enabled):
+    """Use the compiled kinematic wave, only possible if numba is installed."""
+    global use_jit_kernels
+    if enabled and numba is None:
+        print("numba is not installed, the kinematic wave is solved per level of the flow network")
+    use_jit_kernels = enabled and numba is not None
+
+
+# Creation and input/output ----------------------------------------------------
+def create_array(array_shape, partition_shape, dtype, fill_value):
+    return np.full(array_shape, fill_value, dtype=dtype)
+
+def from_numpy(array, partition_shape):
+    return np.array(array)
+
+def to_numpy(array):
+    return np.asarray(array)
+
+def cast(array, dtype):
+    return np.asarray(array).astype(dtype, copy=False)
+
+def from_gdal(file_name, partition_shape):
+    from osgeo import gdal
+    dataset = gdal.Open(file_name)
+    if dataset is None:
+        raise RuntimeError(f"Cannot open raster: {file_name}")
+    return dataset.GetRasterBand(1).ReadAsArray()
+
+def to_gdal(array, file_name):
+    from osgeo import gdal
+    array  = np.asarray(array)
+    output = gdal.GetDriverByName("GTiff").Create(file_name, array.shape[1], array.shape[0], 1,
+                                                  getattr(gdal, GDAL_TYPES[array.dtype]))
+    output.GetRasterBand(1).WriteArray(array.astype(np.uint8) if array.dtype == np.bool_ else array)
+    output = None
+
+
+# Local operations ---------------------------------------------------------------
+def where(condition, true_value, false_value):
+    """Like numpy.where, but scalars do not change the precision of the arrays (as in LUE)."""
+    arrays = [value for value in (true_value, false_value) if isinstance(value, np.ndarray)]
+    result = np.where(condition, true_value, false_value)
+    if arrays:
+        return result.astype(np.result_type(*arrays), copy=False)
+    return result
+
+def pow(array, exponent):
+    return np.power(array, exponent)
+
+def sqrt(array):
+    return np.sqrt(array)
+
+def exp(array):
+    return np.exp(array)
+
+
+# Reductions and zonal operations ------------------------------------------------
+def maximum(array):
+    return Scalar(np.max(array))
+
+def minimum(array):
+    return Scalar(np.min(array))
+
+def sum(array):
+    return Scalar(np.sum(array))
+
+def zonal_sum(array, zones):
+    zones = np.asarray(zones).ravel().astype(np.intp)
+    sums  = np.bincount(zones, weights=np.asarray(array).ravel())
+    return sums[zones].reshape(np.shape(array)).astype(np.asarray(array).dtype, copy=False)
+
+
+# Focal operations -----------------------------------------------------------------
+def focal(array, kernel, operation, fill_value):
+    """Apply the operation over the cells of the kernel that are not zero, cells outside the array are fill_value.
+    The result is accumulated in place in a single buffer."""
+    kernel  = np.asarray(kernel)
+    radius  = kernel.shape[0] // 2
+    rows, cols = np.shape(array)
+    padded  = np.pad(array, radius, constant_values=fill_value)
+    result  = None
+    for (i, j), weight in np.ndenumerate(kernel):
+        if weight == 0:
+            continue
+        window = padded[i:i + rows, j:j + cols]
+        if weight != 1:
+            window = window * weight
+        if result is None:
+            result = np.array(window)
+        else:
+            operation(result, window, out=result)
+    return result
+
+def focal_sum(array, kernel):
+    return focal(array, kernel, np.add, 0)
+
+def focal_minimum(array, kernel):
+    return focal(array, kernel, np.minimum, np.inf)
+
+def slope(elevation, resolution):
+    """Slope (rise over run) with the method of Horn, at the edges the elevation is extended."""
+    padded = np.pad(np.asarray(elevation), 1, mode="edge")
+    rows, cols = np.shape(elevation)
+    window = lambda i, j: padded[i:i + rows, j:j + cols]
+    dz_dx = ((window(0, 2) + 2 * window(1, 2) + window(2, 2)) - (window(0, 0) + 2 * window(1, 0) + window(2, 0))) / (8 * resolution)
+    dz_dy = ((window(2, 0) + 2 * window(2, 1) + window(2, 2)) - (window(0, 0) + 2 * window(0, 1) + window(0, 2))) / (8 * resolution)
+    return np.sqrt(dz_dx * dz_dx + dz_dy * dz_dy)
+
+
+# Flow direction operations --------------------------------------------------------
+def d8_flow_direction(elevation):
+    """Direction of the steepest descent (drop over distance) to one of the 8 neighbours, 5 if no neighbour is lower.
+    The directions are compared in a single pass over the 8 shifted arrays."""
+    elevation = np.asarray(elevation, dtype=np.float64)
+    rows, cols = elevation.shape
+    padded    = np.pad(elevation, 1, constant_values=np.inf)
+    ldd       = np.full(elevation.shape, 5, dtype=np.uint8)
+    steepest  = np.zeros(elevation.shape)
+    for direction, (row, col) in LDD_OFFSETS.items():
+        if direction == 5:
+            continue
+        drop    = (elevation - padded[1 + row:1 + row + rows, 1 + col:1 + col + cols]) / math.hypot(row, col)
+        steeper = drop > steepest
+        ldd[steeper] = direction
+        np.copyto(steepest, drop, where=steeper)
+    return ldd
+
+
+class FlowNetwork:
+    def __init__(self, ldd):
+        """
+        Initialize the class.
+        1) Determine the downstream cell of every cell (-1 for pits and flow out of the array).
+        2) Order the cells from the sources to the pits, in levels of cells that only depend on earlier levels.
+
+        The network is built once per LDD and reused by every routing step.
+        """
+        ldd  = np.asarray(ldd)
+        rows, cols = ldd.shape
+        row_offset = np.zeros(256, dtype=np.intp)
+        col_offset = np.zeros(256, dtype=np.intp)
+        for direction, (row, col) in LDD_OFFSETS.items():
+            row_offset[direction], col_offset[direction] = row, col
+
+        row_index, col_index = np.indices(ldd.shape)
+        to_row = row_index + row_offset[ldd]
+        to_col = col_index + col_offset[ldd]
+        valid  = (ldd >= 1) & (ldd <= 9) & (ldd != 5) & (to_row >= 0) & (to_row < rows) & (to_col >= 0) & (to_col < cols)
+        self.size       = ldd.size
+        self.downstream = np.where(valid, to_row * cols + to_col, -1).ravel()
+
+        indegree = np.bincount(self.downstream[self.downstream >= 0], minlength=self.size)
+        frontier = np.flatnonzero(indegree == 0)
+        self.levels = []
+        while frontier.size:
+            downstream = self.downstream[frontier]
+            has_downstream = downstream >= 0
+            self.levels.append((frontier, has_downstream, downstream[has_downstream]))
+            np.subtract.at(indegree, downstream[has_downstream], 1)
+            candidates = np.unique(downstream[has_downstream])
+            frontier   = candidates[indegree[candidates] == 0]
+        self.order = np.concatenate([cells for cells, _, _ in self.levels]) if self.levels else np.zeros(0, dtype=np.intp)
+        if self.order.size != self.size:
+            raise Exception("Error: The LDD contains cycles, the flow network can not be ordered")
+
+        # Buffers of the kinematic wave, reused every routing step
+        self.upstream_discharge = np.zeros(self.size)
+        self.new_discharge      = np.zeros(self.size)
+
+networks = {}
+
+def flow_network(ldd):
+    """The flow network of the LDD, cached on the LDD array (the LDD does not change during a run)."""
+    cached = networks.get(id(ldd))
+    if cached is None or cached[0] is not ldd:
+        if len(networks) > 4:
+            networks.clear()
+        cached = networks[id(ldd)] = (ldd, FlowNetwork(ldd))
+    return cached[1]
+
+def downstream(ldd, array):
+    network = flow_network(ldd)
+    values  = np.asarray(array).ravel()
+    return np.where(network.downstream >= 0, values[network.downstream], values).reshape(np.shape(array))
+
+def upstream(ldd, array):
+    network = flow_network(ldd)
+    values  = np.asarray(array).ravel()
+    flows   = network.downstream >= 0
+    result  = np.bincount(network.downstream[flows], weights=values[flows], minlength=network.size)
+    return result.reshape(np.shape(array)).astype(np.asarray(array).dtype, copy=False)
+
+
+# Kinematic wave -------------------------------------------------------------------
+def new_discharge(upstream_discharge, discharge, inflow, alpha, beta, time_step_duration, channel_length):
+    """Discharge at the end of the timestep of a single cell, Newton-Raphson as in PCRaster and LUE."""
+    if upstream_discharge + discharge + inflow <= 0:
+        return 0.0
+    dt_dx = time_step_duration / channel_length
+    ab_pq = alpha * beta * ((discharge + upstream_discharge) / 2) ** (beta - 1)
+    known = dt_dx * upstream_discharge + alpha * discharge ** beta + time_step_duration * inflow
+
+    estimate = max((dt_dx * upstream_discharge + discharge * ab_pq + time_step_duration * inflow) / (dt_dx + ab_pq), MIN_DISCHARGE)
+    for _ in range(MAX_ITERATIONS):
+        residual = dt_dx * estimate + alpha * estimate ** beta - known
+        estimate = max(estimate - residual / (dt_dx + alpha * beta * estimate ** (beta - 1)), MIN_DISCHARGE)
+        if abs(residual) <= EPSILON:
+            break
+    return estimate
+
+def new_discharge_cells(upstream_discharge, discharge, inflow, alpha, beta, time_step_duration, channel_length):
+    """new_discharge for the cells of a level at once."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dt_dx = time_step_duration / channel_length
+        ab_pq = alpha * beta * ((discharge + upstream_discharge) / 2) ** (beta - 1)
+        known = dt_dx * upstream_discharge + alpha * discharge ** beta + time_step_duration * inflow
+
+        estimate = np.maximum((dt_dx * upstream_discharge + discharge * ab_pq + time_step_duration * inflow) / (dt_dx + ab_pq),
+                              MIN_DISCHARGE)
+        for _ in range(MAX_ITERATIONS):
+            residual = dt_dx * estimate + alpha * estimate ** beta - known
+            estimate = np.maximum(estimate - residual / (dt_dx + alpha * beta * estimate ** (beta - 1)), MIN_DISCHARGE)
+            if np.all(np.abs(residual) <= EPSILON):
+                break
+    return np.where(upstream_discharge + discharge + inflow <= 0, 0.0, estimate)
+
+if numba is not None:
+    compiled_new_discharge = numba.njit(cache=True)(new_discharge)
+
+    @numba.njit(cache=True)
+    def compiled_kinematic_wave(order, downstream, discharge, inflow, alpha, beta, time_step_duration, channel_length,
+                                upstream_discharge, result):
+        upstream_discharge[:] = 0
+        for cell in order:
+            result[cell] = compiled_new_discharge(upstream_discharge[cell], discharge[cell], inflow[cell],
+                                                  alpha, beta, time_step_duration, channel_length[cell])
+            if downstream[cell] >= 0:
+                upstream_discharge[downstream[cell]] += result[cell]
+
+def kinematic_wave(ldd, discharge, inflow, alpha, beta, time_step_duration, channel_length, out = None):
+    """Route the discharge through the LDD, the discharge of all upstream cells is solved before a cell.
+    The result is written into out if it is given (not available in LUE)."""
+    network        = flow_network(ldd)
+    dtype          = np.asarray(discharge).dtype
+    discharge      = np.asarray(discharge, dtype=np.float64).ravel()
+    inflow         = np.broadcast_to(np.asarray(inflow, dtype=np.float64), np.shape(ldd)).ravel()
+    channel_length = np.broadcast_to(np.asarray(channel_length, dtype=np.float64), np.shape(ldd)).ravel()
+    upstream_discharge, result = network.upstream_discharge, network.new_discharge
+
+    if use_jit_kernels:
+        compiled_kinematic_wave(network.order, network.downstream, discharge, inflow, float(alpha), float(beta),
+                                float(time_step_duration), channel_length, upstream_discharge, result)
+    else:
+        upstream_discharge[:] = 0
+        for cells, has_downstream, downstream_cells in network.levels:
+            result[cells] = new_discharge_cells(upstream_discharge[cells], discharge[cells], inflow[cells],
+                                                alpha, beta, time_step_duration, channel_length[cells])
+            np.add.at(upstream_discharge, downstream_cells, result[cells][has_downstream])
+    if out is not None:
+        np.copyto(out, result.reshape(np.shape(ldd)))
+        return out
+    return result.reshape(np.shape(ldd)).astype(dtype)
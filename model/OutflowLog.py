@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import datetime
+import json
+import math
+import os
+import struct
+import numpy as np
+
+# Binary outflow log: a header of 64 bytes followed by the outflow (float64) of every routing step
+MAGIC         = b"HBMFLOW1"
+VERSION       = 1
+HEADER        = struct.Struct("<8sIId32s8s")
+LOG_FILE      = "outflow.bin"
+SUMMARY_FILE  = "outflow.json"
+LEGACY_FILE   = "maximumDischarge.csv"
+
+class OutflowLog:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Set the log and summary file in the output directory, the start date and the routing timestep.
+        2) Set the statistics that are updated every step.
+
+        The outflow of every routing step is appended to a buffer that is written to the log once it is full,
+        the time of a value follows from its position. The mean, EWMA (span of outflowSpan steps), extremes and
+        volume are kept up to date during the run and written to a small json summary, so tools do not have to
+        read the series. The series itself is read as a memory map with read_series.
+        """
+        output_dir        = configuration.generalSettings['outputDir'] + configuration.generalSettings['scenario']
+        self.log_file     = os.path.join(output_dir, LOG_FILE)
+        self.summary_file = os.path.join(output_dir, SUMMARY_FILE)
+        self.start_date   = datetime.datetime(*map(int, configuration.modelSettings['startDate'].split(", ")))
+        self.timestep     = float(configuration.modelSettings['timestep'])
+        self.span         = float(configuration.reportSettings.get('outflowSpan', '3600'))
+        self.buffer       = np.empty(int(configuration.reportSettings.get('outflowBuffer', '4096')), dtype=np.float64)
+        self.buffered     = 0
+        self.file         = None
+
+        self.statistics   = {"count": 0, "sum": 0.0, "ewma": math.nan,
+                             "maximum": -math.inf, "maximum_time": math.nan,
+                             "minimum": math.inf, "minimum_time": math.nan}
+        # EWMA as in pandas ewm(span=outflowSpan), with the weights of the first values adjusted
+        self.decay        = 1 - 2 / (self.span + 1)
+        self.ewma_weights = (0.0, 0.0)
+
+    def __enter__(self):
+        self.file = open(self.log_file, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, HEADER.size, self.timestep,
+                                    self.start_date.isoformat().encode(), np.dtype(np.float64).str.encode()))
+        return self
+
+    def __exit__(self, *exception):
+        self.flush()
+        self.file.close()
+        self.file = None
+
+    def append(self, outflow):
+        """Add the outflow of a routing step to the log and the statistics."""
+        statistics = self.statistics
+        time = statistics["count"] * self.timestep
+        statistics["count"] += 1
+        statistics["sum"]   += outflow
+        if outflow > statistics["maximum"]:
+            statistics["maximum"], statistics["maximum_time"] = outflow, time
+        if outflow < statistics["minimum"]:
+            statistics["minimum"], statistics["minimum_time"] = outflow, time
+        numerator, denominator = self.ewma_weights
+        self.ewma_weights = (numerator * self.decay + outflow, denominator * self.decay + 1)
+        statistics["ewma"] = self.ewma_weights[0] / self.ewma_weights[1]
+
+        self.buffer[self.buffered] = outflow
+        self.buffered += 1
+        if self.buffered == len(self.buffer):
+            self.flush()
+
+    def extend(self, values):
+        """Add the outflow of many routing steps at once, the statistics are updated per buffer of values."""
+        self.flush()
+        statistics = self.statistics
+        for start in range(0, len(values), len(self.buffer)):
+            chunk = np.asarray(values[start:start + len(self.buffer)], dtype=np.float64)
+            first = statistics["count"]
+            statistics["count"] += len(chunk)
+            statistics["sum"]   += float(chunk.sum())
+            if chunk.max() > statistics["maximum"]:
+                statistics["maximum"], statistics["maximum_time"] = float(chunk.max()), (first + int(chunk.argmax())) * self.timestep
+            if chunk.min() < statistics["minimum"]:
+                statistics["minimum"], statistics["minimum_time"] = float(chunk.min()), (first + int(chunk.argmin())) * self.timestep
+            weights = self.decay ** np.arange(len(chunk) - 1, -1, -1)
+            numerator, denominator = self.ewma_weights
+            decay = self.decay ** len(chunk)
+            self.ewma_weights = (numerator * decay + float(weights @ chunk), denominator * decay + float(weights.sum()))
+            statistics["ewma"] = self.ewma_weights[0] / self.ewma_weights[1]
+            self.file.write(chunk.tobytes())
+        self.flush()
+
+    def flush(self):
+        """Write the buffered values to the log and update the summary."""
+        self.file.write(self.buffer[:self.buffered].tobytes())
+        self.file.flush()
+        self.buffered = 0
+        with open(self.summary_file, "w") as f:
+            json.dump(self.summary(), f, indent=4)
+
+    def summary(self):
+        statistics = self.statistics
+        count = statistics["count"]
+        return {"start_date":   self.start_date.isoformat(),
+                "timestep":     self.timestep,
+                "count":        count,
+                "mean":         statistics["sum"] / count if count else math.nan,
+                "ewma":         statistics["ewma"],
+                "ewma_span":    self.span,
+                "maximum":      statistics["maximum"] if count else math.nan,
+                "maximum_time": statistics["maximum_time"],
+                "minimum":      statistics["minimum"] if count else math.nan,
+                "minimum_time": statistics["minimum_time"],
+                "volume":       statistics["sum"] * self.timestep,
+                }
+
+
+def read_header(file_name):
+    with open(file_name, "rb") as f:
+        magic, version, header_size, timestep, start_date, dtype = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise Exception(f"Error: {file_name} is not an outflow log")
+    return {"version": version, "header_size": header_size, "timestep": timestep,
+            "start_date": datetime.datetime.fromisoformat(start_date.rstrip(b"\0").decode()),
+            "dtype": np.dtype(dtype.rstrip(b"\0").decode())}
+
+
+def read_series(output_dir):
+    """Time (s since the start) and outflow of every routing step of a run, the outflow is a memory map of the log.
+    Runs of older versions of the model are read from maximumDischarge.csv."""
+    log_file = os.path.join(output_dir, LOG_FILE)
+    if not os.path.isfile(log_file):
+        legacy = np.loadtxt(os.path.join(output_dir, LEGACY_FILE), delimiter=";", ndmin=2)
+        return legacy[:, 0], legacy[:, 1]
+
+    header = read_header(log_file)
+    count = (os.path.getsize(log_file) - header["header_size"]) // header["dtype"].itemsize
+    if count == 0:
+        return np.empty(0), np.empty(0, dtype=header["dtype"])
+    outflow = np.memmap(log_file, dtype=header["dtype"], mode="r", offset=header["header_size"], shape=(count,))
+    return np.arange(count) * header["timestep"], outflow
+
+
+def read_summary(output_dir):
+    """Statistics of the outflow of a run, from the summary or (for older runs) computed from the series."""
+    summary_file = os.path.join(output_dir, SUMMARY_FILE)
+    if os.path.isfile(summary_file):
+        with open(summary_file) as f:
+            return json.load(f)
+
+    times, outflow = read_series(output_dir)
+    timestep = float(times[1] - times[0]) if len(times) > 1 else math.nan
+    if len(outflow) == 0:
+        return {"count": 0, "mean": math.nan, "maximum": math.nan, "maximum_time": math.nan,
+                "minimum": math.nan, "minimum_time": math.nan, "volume": math.nan, "timestep": timestep}
+    return {"count":        len(outflow),
+            "mean":         float(np.mean(outflow)),
+            "maximum":      float(np.max(outflow)),
+            "maximum_time": float(times[np.argmax(outflow)]),
+            "minimum":      float(np.min(outflow)),
+            "minimum_time": float(times[np.argmin(outflow)]),
+            "volume":       float(np.sum(outflow)) * timestep,
+            "timestep":     timestep,
+            }
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import datetime
+import math
+import numpy as np
+from Backend import lfr
+from StandardArraysLUE import StandardArraysLUE
+from utilityFunctionsHBM import utilityFunctions
+
+# Potential evapotranspiration is constant over a day or an hour
+PET_INTERVALS = ("daily", "hourly")
+
+class PotentialEvapotranspiration:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Initialize the standard arrays and the simulation period.
+        2) Set the method, the interval and the temperature input of the potential evapotranspiration.
+
+        With evapotranspirationMethod = hamon the reference evapotranspiration is computed with the method of Hamon
+        from a temperature time series (temperatureData) or from temperature rasters (temperatureMaps, a path with
+        date placeholders such as /temperature/%Y%m%d.tiff). For a time series the evapotranspiration of the whole
+        simulation period is computed at once, every day (or hour) is computed only once in both cases.
+        """
+        self.std_arr_lue   = StandardArraysLUE(configuration)
+        self.method        = configuration.modelSettings.get('evapotranspirationMethod', 'csv')
+        self.interval      = configuration.modelSettings.get('petInterval', 'daily')
+        self.latitude      = math.radians(float(configuration.modelSettings.get('latitude', '52.06')))
+        self.coefficient   = float(configuration.modelSettings.get('hamonCoefficient', '1.0'))
+
+        self.start_date    = utilityFunctions.string_to_datetime(configuration.modelSettings['startDate'], ", ")
+        self.end_date      = utilityFunctions.string_to_datetime(configuration.modelSettings['endDate'], ", ")
+        self.partition_shape = 2 * (int(configuration.modelSettings['partitionExtent']),)
+
+        temperature_data   = configuration.dataSettings.get('temperatureData', '')
+        temperature_maps   = configuration.dataSettings.get('temperatureMaps', '')
+        self.temperature_data = configuration.generalSettings['inputDir'] + temperature_data if temperature_data else None
+        self.temperature_maps = (configuration.generalSettings['inputDir'] + configuration.generalSettings['scenario'] +
+                                 temperature_maps) if temperature_maps else None
+
+        if self.method not in ("csv", "hamon"):
+            raise Exception(f"Error: Invalid evapotranspirationMethod '{self.method}', choose from: csv, hamon")
+        if self.interval not in PET_INTERVALS:
+            raise Exception(f"Error: Invalid petInterval '{self.interval}', choose from: {', '.join(PET_INTERVALS)}")
+        if self.method == "hamon" and not (self.temperature_data or self.temperature_maps):
+            raise Exception("Error: evapotranspirationMethod = hamon needs temperatureData or temperatureMaps")
+
+        # Rates (mm/h) of every period of the series, and the array of the current period
+        self.rates   = None
+        self.current = (None, None)
+
+    def period(self, date):
+        """Start of the day or hour of the date."""
+        if self.interval == "hourly":
+            return date.replace(minute=0, second=0, microsecond=0)
+        return date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def daylight_hours(self, day_of_year):
+        """Hours between sunrise and sunset at the latitude, from the solar declination (FAO 56)."""
+        declination  = 0.409 * np.sin(2 * np.pi * day_of_year / 365 - 1.39)
+        sunset_angle = np.arccos(np.clip(-np.tan(self.latitude) * np.tan(declination), -1, 1))
+        return 24 / np.pi * sunset_angle
+
+    def hamon(self, temperature, daylight_hours, array_module):
+        """Potential evapotranspiration (mm/day) of Hamon (1963), zero below 0 degrees Celsius.
+
+        Args:
+            temperature (array):    Mean air temperature in degrees Celsius, a numpy or lue array
+            daylight_hours (float): Hours of daylight, a float or a numpy array like temperature
+            array_module (module):  numpy or lfr, which provides exp and where for the temperature
+
+        Returns:
+            pet (array):            Potential evapotranspiration in mm/day
+        """
+        saturated_vapour_pressure = 6.108 * array_module.exp(17.27 * temperature / (temperature + 237.3))       # hPa
+        vapour_density            = 216.7 * saturated_vapour_pressure / (temperature + 273.3)                    # g/m3
+        pet = self.coefficient * 0.1651 * (daylight_hours / 12) * vapour_density
+        return array_module.where(temperature > 0, pet, 0)
+
+    def series_rates(self):
+        """Evapotranspiration (mm/h) of every day or hour of the simulation period, in one pass over the series.
+        The series has to cover every day (or hour) of the simulation period, a gap is an error."""
+        import pandas as pd
+        data = pd.read_csv(self.temperature_data, sep=",", names=['date_time', 'temperature'])
+        data['date_time'] = pd.to_datetime(data['date_time'], format="%d/%m/%Y %H:%M")
+        # The last period is the one of the last routing step, which ends at the end date
+        first = self.period(self.start_date)
+        last  = self.period(max(self.start_date, self.end_date - datetime.timedelta(seconds=1)))
+        data  = data[(data['date_time'] >= first) & (data['date_time'] < last + datetime.timedelta(days=1))]
+
+        temperature = data.groupby(data['date_time'].dt.floor("h" if self.interval == "hourly" else "D"))['temperature'].mean()
+        temperature = temperature.dropna()
+        pet = self.hamon(temperature.to_numpy(dtype=np.float64),
+                         self.daylight_hours(temperature.index.dayofyear.to_numpy()), np)
+        rates = {period.to_pydatetime(): float(rate) for period, rate in zip(temperature.index, pet / 24)}
+
+        step    = datetime.timedelta(hours=1) if self.interval == "hourly" else datetime.timedelta(days=1)
+        missing = [first + i * step for i in range(int((last - first) / step) + 1) if first + i * step not in rates]
+        if missing:
+            raise Exception(f"Error: No temperature for {missing[0]} in {self.temperature_data}, the series has to "
+                            f"cover the simulation period ({len(missing)} {self.interval} periods are missing)")
+        return rates
+
+    def flux(self, refactor, date):
+        """Reference evapotranspiration of the date, like RetrieveData.csv_timeseries_to_flux.
+
+        Args:
+            refactor (float):       To refactor the rate in mm/h to the flux of the model.
+            date (datetime date):   Gives the concurrent date of the model.
+
+        Returns:
+            evapotranspiration (lpa*):  The reference evapotranspiration, the same array for every call within a day (or hour)
+
+        lpa*: lue partitioned array
+        """
+        period = self.period(date)
+        if self.current[0] == period:
+            return self.current[1]
+
+        dtype = self.std_arr_lue.parameter_dtype
+        if self.temperature_maps:
+            temperature = lfr.cast(lfr.from_gdal(period.strftime(self.temperature_maps), self.partition_shape), dtype)
+            daylight    = float(self.daylight_hours(period.timetuple().tm_yday))
+            evapotranspiration = self.hamon(temperature, daylight, lfr) * (refactor / 24)
+        else:
+            if self.rates is None:
+                self.rates = self.series_rates()
+            if period not in self.rates:
+                raise Exception(f"Error: No temperature for {period}")
+            evapotranspiration = self.rates[period] * refactor * self.std_arr_lue.one(dtype)
+        self.current = (period, evapotranspiration)
+        return evapotranspiration
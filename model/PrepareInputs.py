@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from Backend import lfr
+
+# Smallest unsigned types that class rasters are stored in, the maximum value of a type is its no-data value.
+# GDAL is imported where it is used, the import takes a noticeable part of the startup.
+CLASS_TYPES = [(np.uint8, "GDT_Byte"),
+               (np.uint16, "GDT_UInt16"),
+               (np.uint32, "GDT_UInt32")]
+LDD_NO_DATA = 255
+
+def cache_directory(configuration):
+    """The directory of the prepared inputs, by default the cache folder of the scenario."""
+    input_dir = configuration.generalSettings['inputDir'] + configuration.generalSettings['scenario']
+    return configuration.generalSettings.get('cacheDir', '') or input_dir + "/cache"
+
+def content_key(files, settings):
+    """Hash of the contents of the files and the settings, used to name cached results. Files are read in chunks."""
+    sha = hashlib.sha256()
+    for file_name in files:
+        with open(file_name, "rb") as f:
+            for chunk in iter(lambda: f.read(2**20), b""):
+                sha.update(chunk)
+    sha.update(settings.encode())
+    return sha.hexdigest()[:16]
+
+class PrepareInputs:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Set the input and cache dir, by default the cache is stored with the inputs of the scenario.
+        2) Set the tiling of the prepared rasters, aligned with the partitions of the model.
+
+        Rasters are processed one partition at a time, so inputs larger than memory can be prepared.
+        """
+        self.input_dir = configuration.generalSettings['inputDir'] + configuration.generalSettings['scenario']
+        self.cache_dir = cache_directory(configuration)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.partition_extent = int(configuration.modelSettings['partitionExtent'])
+        self.tile_inputs      = configuration.generalSettings.get('tileInputs', 'False') == 'True'
+        self.overview_levels  = [int(level) for level in
+                                 configuration.generalSettings.get('overviewLevels', '2, 4, 8, 16').split(",") if level.strip()]
+        self.block_size       = self.aligned_block_size(self.partition_extent)
+
+    def aligned_block_size(self, partition_extent):
+        """The largest GeoTIFF block size (a multiple of 16) that divides the partition extent,
+        so every partition is read from its own blocks only."""
+        sizes = [size for size in range(16, min(partition_extent, 1024) + 1, 16) if partition_extent % size == 0]
+        if not sizes:
+            print(f"partitionExtent {partition_extent} is not a multiple of 16, the tiles of the inputs can not be aligned with the partitions.")
+            return 256
+        return sizes[-1]
+
+    def creation_options(self):
+        return ["TILED=YES",
+                f"BLOCKXSIZE={self.block_size}",
+                f"BLOCKYSIZE={self.block_size}",
+                "COMPRESS=DEFLATE",
+                "BIGTIFF=IF_SAFER"]
+
+    def temporary(self, cache):
+        """A unique name next to a cache file to write it under. The file is renamed to the cache once it is
+        complete, so an interrupted write is never used and members of a batch, or the threads of the input
+        loader, that prepare the same input at the same time do not write to the same file."""
+        root, extension = os.path.splitext(cache)
+        return f"{root}.{os.getpid()}.{threading.get_ident()}.tmp{extension}"
+
+    def replace(self, temporary, cache):
+        """Move a completely written file into place as the cache, in a single step."""
+        os.replace(temporary, cache)
+        return cache
+
+    def write(self, array, cache):
+        """Write an array of the model to a cache file under a temporary name and rename it once it is complete.
+
+        lpa*: lue partitioned array
+        """
+        temporary = self.temporary(cache)
+        written   = lfr.to_gdal(array, temporary)
+        # LUE writes asynchronously, the file is only complete once it is written
+        if hasattr(written, "wait"):
+            written.wait()
+        return self.replace(temporary, cache)
+
+    def key(self, files, settings):
+        return content_key(files, settings)
+
+    def source(self, file_name):
+        """The path of a raster of dataSettings. The paths of the configuration start with '/' and are relative to
+        the input directory of the scenario, an existing absolute path (a saved state) is used as it is."""
+        return file_name if os.path.isabs(file_name) and os.path.isfile(file_name) else self.input_dir + file_name
+
+    def open(self, file_name):
+        from osgeo import gdal
+        if not os.path.isfile(file_name):
+            raise Exception(f"Error: Raster does not exist: {file_name}")
+        dataset = gdal.Open(file_name)
+        if dataset is None:
+            raise Exception(f"Error: Could not open raster: {file_name}")
+        return dataset
+
+    def windows(self, dataset):
+        """Yield the windows (x offset, y offset, x size, y size) of the partitions of a raster."""
+        for y in range(0, dataset.RasterYSize, self.partition_extent):
+            for x in range(0, dataset.RasterXSize, self.partition_extent):
+                yield (x, y,
+                       min(self.partition_extent, dataset.RasterXSize - x),
+                       min(self.partition_extent, dataset.RasterYSize - y))
+
+    def create(self, file_name, dataset, data_type, no_data):
+        """Create a tiled GeoTIFF with the same size, geotransform and projection as dataset."""
+        from osgeo import gdal
+        driver = gdal.GetDriverByName("GTiff")
+        output = driver.Create(file_name, dataset.RasterXSize, dataset.RasterYSize, 1, data_type,
+                               options = self.creation_options())
+        output.SetGeoTransform(dataset.GetGeoTransform())
+        output.SetProjection(dataset.GetProjection())
+        output.GetRasterBand(1).SetNoDataValue(no_data)
+        return output
+
+    def finish(self, output, resampling):
+        """Build the overviews and close the dataset."""
+        if self.overview_levels:
+            output.BuildOverviews(resampling, self.overview_levels)
+        output.FlushCache()
+
+    def no_data_mask(self, array, no_data):
+        mask = ~np.isfinite(array) if np.issubdtype(array.dtype, np.floating) else np.zeros(array.shape, dtype=bool)
+        if no_data is not None:
+            mask |= array == no_data
+        return mask
+
+    def tiled_key(self, source, settings = ""):
+        """Hash of a source raster and the settings that change its tiles and overviews."""
+        settings = f"{settings};{self.tile_inputs};{self.partition_extent};{';'.join(self.creation_options())};{self.overview_levels}"
+        return self.key([source], settings)
+
+    def cache_file(self, file_name, source, suffix, settings = ""):
+        """The cache of a source raster, named after its contents and the settings of the preparation. The cache
+        directory can be shared by scenarios and batch runs, so inputs with the same name never reuse each other's cache."""
+        key = self.tiled_key(source, settings)
+        return os.path.join(self.cache_dir, f"{os.path.splitext(os.path.basename(file_name))[0]}_{key}_{suffix}.tiff")
+
+    def tiled(self, file_name):
+        """Convert a continuous raster (DEM, initial states) into partition-aligned tiles with overviews.
+
+        Args:
+            file_name (path):   raster relative to the input directory of the scenario, or an absolute path
+
+        Returns:
+            cache (path):       the tiled raster, or the source itself if tileInputs is off
+        """
+        from osgeo import gdal
+        source = self.source(file_name)
+        if not os.path.isfile(source):
+            raise Exception(f"Error: Raster does not exist: {source}")
+        if not self.tile_inputs:
+            return source
+
+        # Named after the contents of the source and the layout of the tiles, so a change of the tiling or the
+        # overviews, or another input with the same name, never reuses these tiles
+        cache = self.cache_file(file_name, source, "tiled")
+        if os.path.isfile(cache):
+            return cache
+
+        temporary = self.temporary(cache)
+        output = gdal.Translate(temporary, self.open(source),
+                                options = gdal.TranslateOptions(format = "GTiff", creationOptions = self.creation_options()))
+        self.finish(output, "AVERAGE")
+        output = None
+        return self.replace(temporary, cache)
+
+    def ldd(self, file_name):
+        """Validate the LDD and store it as uint8, independent of the type it has on disk.
+
+        Args:
+            file_name (path):   LDD raster relative to the input directory of the scenario
+
+        Returns:
+            cache (path):       uint8 LDD raster with no-data value 255
+        """
+        from osgeo import gdal
+        source = self.input_dir + file_name
+        if not os.path.isfile(source):
+            raise Exception(f"Error: Raster does not exist: {source}")
+        cache  = self.cache_file(file_name, source, "uint8", f"ldd;{np.dtype(np.uint8).name};{LDD_NO_DATA}")
+        if os.path.isfile(cache):
+            return cache
+
+        dataset   = self.open(source)
+        band      = dataset.GetRasterBand(1)
+        no_data   = band.GetNoDataValue()
+        temporary = self.temporary(cache)
+        output    = self.create(temporary, dataset, gdal.GDT_Byte, LDD_NO_DATA)
+        pits      = 0
+        for x, y, x_size, y_size in self.windows(dataset):
+            array   = band.ReadAsArray(x, y, x_size, y_size)
+            missing = self.no_data_mask(array, no_data)
+            valid   = array[~missing]
+            if np.any(valid != np.round(valid)) or np.any((valid < 1) | (valid > 9)):
+                output = None
+                os.remove(temporary)
+                raise Exception(f"Error: The LDD contains values that are not a direction (1 to 9): {source}")
+            pits += int(np.count_nonzero(valid == 5))
+            output.GetRasterBand(1).WriteArray(np.where(missing, LDD_NO_DATA, array).astype(np.uint8), x, y)
+        if pits == 0:
+            print(f"The LDD does not contain a pit, no water will leave the catchment: {source}")
+
+        self.finish(output, "NEAREST")
+        output = None
+        return self.replace(temporary, cache)
+
+    def classes(self, file_name):
+        """Validate a class raster (soil type, land use) and store it in the smallest integer type that fits.
+
+        Args:
+            file_name (path):   class raster relative to the input directory of the scenario
+
+        Returns:
+            cache (path):       compact class raster, the maximum value of its type is no-data
+            ids (list):         the classes present in the raster
+        """
+        from osgeo import gdal
+        source   = self.input_dir + file_name
+        if not os.path.isfile(source):
+            raise Exception(f"Error: Raster does not exist: {source}")
+        cache    = self.cache_file(file_name, source, "classes",
+                                   f"classes;{';'.join(np.dtype(dtype).name for dtype, _ in CLASS_TYPES)}")
+        ids_file = os.path.splitext(cache)[0] + ".json"
+        if os.path.isfile(cache) and os.path.isfile(ids_file):
+            with open(ids_file) as f:
+                return cache, json.load(f)
+
+        dataset = self.open(source)
+        band    = dataset.GetRasterBand(1)
+        no_data = band.GetNoDataValue()
+
+        # First pass: validate and collect the classes, which determine the type
+        ids = set()
+        for x, y, x_size, y_size in self.windows(dataset):
+            array = band.ReadAsArray(x, y, x_size, y_size)
+            valid = array[~self.no_data_mask(array, no_data)]
+            if np.any(valid != np.round(valid)) or np.any(valid < 0):
+                raise Exception(f"Error: A class raster should only contain positive whole numbers: {source}")
+            ids.update(int(ID) for ID in np.unique(valid))
+
+        maximum = max(ids, default=0)
+        for dtype, data_type in CLASS_TYPES:
+            if maximum < np.iinfo(dtype).max:
+                break
+        else:
+            raise Exception(f"Error: Class values are too large to be stored compactly: {source}")
+
+        # Second pass: write the compact classes
+        no_data_value = int(np.iinfo(dtype).max)
+        temporary = self.temporary(cache)
+        output    = self.create(temporary, dataset, getattr(gdal, data_type), no_data_value)
+        for x, y, x_size, y_size in self.windows(dataset):
+            array = band.ReadAsArray(x, y, x_size, y_size)
+            output.GetRasterBand(1).WriteArray(
+                np.where(self.no_data_mask(array, no_data), no_data_value, array).astype(dtype), x, y)
+        self.finish(output, "NEAREST")
+        output = None
+
+        # The classes are written first, the cache is only valid once both files exist
+        ids = sorted(ids)
+        temporary_ids = self.temporary(ids_file)
+        with open(temporary_ids, "w") as f:
+            json.dump(ids, f)
+        self.replace(temporary_ids, ids_file)
+        return self.replace(temporary, cache), ids
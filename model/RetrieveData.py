@@ -5,11 +5,11 @@ Created on 8 May 2023
 @author: steven.hosper
 """
 
-import lue.framework as lfr
+from Backend import lfr
 import numpy as np
 import datetime
-import pandas as pd
 from StandardArraysLUE import StandardArraysLUE
+from PotentialEvapotranspiration import PotentialEvapotranspiration
 
 class RetrieveData():
     def __init__(self, configuration):
@@ -19,18 +19,20 @@ class RetrieveData():
         2) Set extent, input and output dir.
         """
         self.std_arr_lue        = StandardArraysLUE(configuration)
+        self.pet                = PotentialEvapotranspiration(configuration)
         
         self.array_extent       = int(configuration.modelSettings['arrayExtent'])
         self.partition_extent   = int(configuration.modelSettings['partitionExtent'])
         self.output_dir         = configuration.generalSettings['outputDir']
         self.input_dir          = configuration.generalSettings['inputDir']
         
-    def soil_csv(self, data_file, soil_type):
+    def soil_csv(self, data_file, soil_type, ids = None):
         """Reads the soil properties dependent on the soil IDs of the lue array
         
         Args:
-            data_file (path):
+            data_file (path):   the soil table, or the table already read (DataFrame) by the InputLoader
             soil_type (lpa*):
+            ids (list):         IDs present in soil_type, IDs of the table that are not present are skipped
             
         Returns:
             Ks (lpa*):
@@ -40,12 +42,14 @@ class RetrieveData():
         lpa*: lue partitioned array
         """
         # Assign standard values for de Wupsel
-        Ks = self.std_arr_lue.one() * 0.05
-        porosity = self.std_arr_lue.one() * 0.35
-        wilting_point = self.std_arr_lue.one() * 0.15
+        dtype = self.std_arr_lue.parameter_dtype
+        Ks = self.std_arr_lue.one(dtype) * 0.05
+        porosity = self.std_arr_lue.one(dtype) * 0.35
+        wilting_point = self.std_arr_lue.one(dtype) * 0.15
         
-        # Read pandas data table
-        data_table = pd.read_csv(data_file)
+        # Read pandas data table, pandas is only imported when the tables are read
+        import pandas as pd
+        data_table = pd.read_csv(data_file) if isinstance(data_file, str) else data_file
         
         # Split into ID and Ks value
         ID = data_table["ID"]
@@ -53,21 +57,25 @@ class RetrieveData():
         
         # When the ID of the table meets an ID within the partitioned array, assign value
         for count, ID in enumerate(ID):
+            if ids is not None and ID not in ids:
+                continue
             Ks = lfr.where(soil_type == ID, Ks_value[count], Ks)     # To m/s
         
         Ks = Ks / 86400 
         return Ks, porosity, wilting_point
     
-    def land_characteristics_csv(self, data_file, land_use):
+    def land_characteristics_csv(self, data_file, land_use, ids = None):
         """Reads the land characteristics from a csv file
         
         Gives standard values to the entire array using the set array extent.
         Continues to read values from data file to the corresponding map IDs.
         
         Args:
-            data_file (path):    the path to the csv data file containing the land characteristics information
+            data_file (path):    the path to the csv data file containing the land characteristics information, \
+                                or the table already read (DataFrame) by the InputLoader
             land_use (lpa*):     array containing the id that matches every cell to its \
                                 corresponding characteristic values.
+            ids (list):         IDs present in land_use, IDs of the table that are not present are skipped
                 
         Returns:
             mannings (lpa*):                    Mannings Coefficient in a lue array
@@ -79,7 +87,7 @@ class RetrieveData():
         """
         # Use the ID values given to the QGIS raster to determine which land-use types are assigned which values.
         # Standard values
-        dummy                  = self.std_arr_lue.one()
+        dummy                  = self.std_arr_lue.one(self.std_arr_lue.parameter_dtype)
         permeability           = dummy * 0.8
         mannings               = dummy * 0.045
         interception_storage_max = dummy * 0.001
@@ -88,7 +96,8 @@ class RetrieveData():
         crop_factor              = dummy * 1.0
         
         # Open data table and load columns into variables
-        data = pd.read_csv(data_file)
+        import pandas as pd
+        data = pd.read_csv(data_file) if isinstance(data_file, str) else data_file
         ID = data["Code"]
         mannings_friction               = data["Friction"]
         permeability_value              = data["Permeability"]
@@ -97,14 +106,17 @@ class RetrieveData():
         throughfall_fraction_value       = data["f"]
         crop_factor_value                 = data["Crop_type"]
         
-        # When an ID matches the array ID, assign value
+        # When an ID matches the array ID, assign value. The comparison is made once per ID and shared by all characteristics.
         for count, ID in enumerate(ID):
-            mannings                    = lfr.where(land_use == ID, mannings_friction[count], mannings)
-            permeability                = lfr.where(land_use == ID, permeability_value[count], permeability)
-            interception_storage_max    = lfr.where(land_use == ID, interception_storage_max_value[count], interception_storage_max)
-            # LAI                       = lfr.where(land_use == ID, LAI_value[count], LAI)
-            throughfall_fraction        = lfr.where(land_use == ID, throughfall_fraction_value[count], throughfall_fraction)
-            # crop_factor                = lfr.where(land_use == ID, crop_factor_value[count], crop_factor)
+            if ids is not None and ID not in ids:
+                continue
+            is_class                    = land_use == ID
+            mannings                    = lfr.where(is_class, mannings_friction[count], mannings)
+            permeability                = lfr.where(is_class, permeability_value[count], permeability)
+            interception_storage_max    = lfr.where(is_class, interception_storage_max_value[count], interception_storage_max)
+            # LAI                       = lfr.where(is_class, LAI_value[count], LAI)
+            throughfall_fraction        = lfr.where(is_class, throughfall_fraction_value[count], throughfall_fraction)
+            # crop_factor                = lfr.where(is_class, crop_factor_value[count], crop_factor)
                 
         return mannings, permeability, interception_storage_max, throughfall_fraction
     
@@ -123,6 +135,13 @@ class RetrieveData():
                                  dt.hour, dt.minute - delta_min)
         return date
     
+    def evapotranspiration_flux(self, data_file, refactor, date):
+        """Reference evapotranspiration from the csv time series (data_file), or computed from the temperature
+        with evapotranspirationMethod = hamon. Both give the flux of the model for the date."""
+        if self.pet.method == "hamon":
+            return self.pet.flux(refactor, date)
+        return self.csv_timeseries_to_flux(data_file, refactor, date)
+    
     def csv_timeseries_to_flux(self, data_file, refactor, date):
         """
         Args:
@@ -142,12 +161,13 @@ class RetrieveData():
         date_time = rounded_date.strftime("%d/%m/%Y %H:%M")
         
         # Read the csv and set the index
+        import pandas as pd
         try:
             data = pd.read_csv(data_file, sep=",", names=['date_time', 'data_value'])
             data.set_index('date_time', inplace=True)
             data_value = data.loc[f'{date_time}']['data_value']
-            data_value = data_value * refactor * self.std_arr_lue.one() # Convert to m/s rate from mm/h
+            data_value = data_value * refactor * self.std_arr_lue.one(self.std_arr_lue.parameter_dtype) # Convert to m/s rate from mm/h
         except:
-            data_value = self.std_arr_lue.zero()
+            data_value = self.std_arr_lue.zero(self.std_arr_lue.parameter_dtype)
         
         return data_value  
\ No newline at end of file
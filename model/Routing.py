@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import numpy as np
+from Backend import lfr
+
+# Update of the state every routing step: reference (the original expressions) or fused
+ROUTING_UPDATES = ("reference", "fused")
+
+class Routing:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Set the constants of the kinematic wave and the routing timestep.
+        2) Set how the state is updated every routing step.
+
+        With routingUpdate = fused the update uses fewer operations: divisions by static arrays are replaced by
+        multiplications with their inverse (computed once), the surface water flux is converted to a height once
+        per flux interval and the seepage is taken from the excess storage directly. With the numpy backend the
+        fused update also writes into state buffers that are allocated once, so a routing step creates (almost)
+        no new arrays. LUE arrays can not be changed in place, there only the amount of operations is reduced.
+        """
+        self.timestep = float(configuration.modelSettings['timestep'])
+        self.update_type = configuration.modelSettings.get('routingUpdate', 'fused')
+        if self.update_type not in ROUTING_UPDATES:
+            raise Exception(f"Error: Invalid routingUpdate '{self.update_type}', choose from: {', '.join(ROUTING_UPDATES)}")
+
+        # Kinematic Surface Water Routing Constants
+        self.alpha    = 1.5
+        self.beta     = 0.6
+        self.c        = 5/3
+
+        self.buffers  = None
+        self.sw_flux  = None
+
+    def prepare(self, ldd, inflow, coefficient, channel_length, channel_area, porosity, max_gw_s, boundary = None):
+        """Store the static arrays of the routing, at state precision.
+
+        Args:
+            ldd (lpa*):             Local drainage direction
+            inflow (lpa*):          Lateral inflow of the kinematic wave
+            coefficient (lpa*):     Discharge to height coefficient (mannings / sqrt(slope) * width)
+            channel_length (lpa*):  Channel length
+            channel_area (lpa*):    Channel area
+            porosity (lpa*):        Porosity
+            max_gw_s (float):       Maximum groundwater storage
+            boundary (tuple):       Cells and storage of a fixed groundwater boundary (Boundary.groundwater_condition), or None
+
+        lpa*: lue partitioned array
+        """
+        self.ldd            = ldd
+        self.inflow         = inflow
+        self.coefficient    = coefficient
+        self.channel_length = channel_length
+        self.channel_area   = channel_area
+        self.porosity       = porosity
+        self.max_gw_s       = max_gw_s
+        self.boundary       = boundary
+
+        if self.update_type == "fused":
+            self.inverse_coefficient = 1 / coefficient
+            self.seepage_height      = porosity / channel_area               # Height of the seepage of a unit of excess storage
+        self.in_place = self.update_type == "fused" and lfr.name == "numpy"
+
+    def set_inflow(self, inflow):
+        """Replace the lateral inflow of the kinematic wave, for a time varying inflow over the boundary."""
+        self.inflow = inflow
+
+    def update(self, gw_s, height, gw_flux, sw_flux):
+        """Add the fluxes to the state, turn excess groundwater into seepage and route the surface water.
+
+        Args:
+            gw_s (lpa*):        Groundwater storage
+            height (lpa*):      Surface water height
+            gw_flux (lpa*):     Groundwater flux of a routing step
+            sw_flux (lpa*):     Surface water flux of a routing step
+
+        Returns:
+            gw_s (lpa*):        Groundwater storage
+            height (lpa*):      Surface water height
+            discharge (lpa*):   Discharge
+
+        lpa*: lue partitioned array
+        """
+        if self.update_type == "reference":
+            return self.update_reference(gw_s, height, gw_flux, sw_flux)
+        if sw_flux is not self.sw_flux:
+            # The surface water flux changes once per flux interval
+            self.sw_flux   = sw_flux
+            self.sw_height = sw_flux / self.channel_area
+        if self.in_place:
+            return self.update_in_place(gw_s, height, gw_flux)
+        return self.update_fused(gw_s, height, gw_flux)
+
+    def update_reference(self, gw_s, height, gw_flux, sw_flux):
+        # The groundwater is adjusted by the fluxes
+        gw_s         = gw_s + gw_flux
+
+        # If the groundwater table surpases the digital elevation map, groundwater is turned into runoff.
+        seepage      = lfr.where(gw_s > self.max_gw_s, (gw_s - self.max_gw_s)*self.porosity, 0)
+
+        # Discharge is affected by the surfacewater fluxes, and seepage is added
+        height       = height + ((sw_flux + seepage)/self.channel_area)
+
+        discharge    = lfr.pow(height, self.c) / self.coefficient
+
+        # Because the kinematic wave has difficulties working with zero's, we have opted for a very small value. This will impact model results.
+        discharge    = lfr.where(discharge < 1E-20, 1E-20, discharge)
+        discharge    = lfr.kinematic_wave(self.ldd, discharge, self.inflow, self.alpha, self.beta, self.timestep, self.channel_length)
+        height       = lfr.pow(self.coefficient*discharge, 0.6)
+
+        # Any water that is moved from groundwater to discharge has to be removed from the groundwaterStorage
+        gw_s         = gw_s - (seepage / self.porosity)
+        if self.boundary is not None:
+            gw_s     = lfr.where(self.boundary[0], self.boundary[1], gw_s)
+        return gw_s, height, discharge
+
+    def update_fused(self, gw_s, height, gw_flux):
+        gw_s         = gw_s + gw_flux
+        excess       = gw_s - self.max_gw_s
+        seeps        = excess > 0
+
+        # The seepage leaves the groundwater, which is then at its maximum storage
+        height       = height + self.sw_height + lfr.where(seeps, excess*self.seepage_height, 0)
+        gw_s         = lfr.where(seeps, self.max_gw_s, gw_s)
+        if self.boundary is not None:
+            gw_s     = lfr.where(self.boundary[0], self.boundary[1], gw_s)
+
+        discharge    = lfr.pow(height, self.c) * self.inverse_coefficient
+        discharge    = lfr.where(discharge < 1E-20, 1E-20, discharge)
+        discharge    = lfr.kinematic_wave(self.ldd, discharge, self.inflow, self.alpha, self.beta, self.timestep, self.channel_length)
+        height       = lfr.pow(self.coefficient*discharge, 0.6)
+        return gw_s, height, discharge
+
+    def update_in_place(self, gw_s, height, gw_flux):
+        """The fused update of the numpy backend, every operation writes into a buffer that is allocated once.
+        The state is copied into its buffer only when it was replaced (the first step, or the implicit groundwater step)."""
+        if self.buffers is None:
+            self.buffers = {name: np.empty_like(height) for name in ("gw_s", "height", "excess", "discharge")}
+        buffers = self.buffers
+        if gw_s is not buffers["gw_s"]:
+            np.copyto(buffers["gw_s"], gw_s)
+        if height is not buffers["height"]:
+            np.copyto(buffers["height"], height)
+        gw_s, height, excess, discharge = buffers["gw_s"], buffers["height"], buffers["excess"], buffers["discharge"]
+
+        np.add(gw_s, gw_flux, out=gw_s)
+        np.subtract(gw_s, self.max_gw_s, out=excess)
+        np.maximum(excess, 0, out=excess)
+        np.subtract(gw_s, excess, out=gw_s)
+        if self.boundary is not None:
+            np.copyto(gw_s, self.boundary[1], where=self.boundary[0])
+
+        np.multiply(excess, self.seepage_height, out=excess)
+        np.add(height, self.sw_height, out=height)
+        np.add(height, excess, out=height)
+
+        np.power(height, self.c, out=discharge)
+        np.multiply(discharge, self.inverse_coefficient, out=discharge)
+        np.maximum(discharge, 1E-20, out=discharge)
+        lfr.kinematic_wave(self.ldd, discharge, self.inflow, self.alpha, self.beta, self.timestep, self.channel_length,
+                           out=discharge)
+
+        np.multiply(self.coefficient, discharge, out=height)
+        np.power(height, 0.6, out=height)
+        return gw_s, height, discharge
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import math
+
+class Scheduler:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Set the routing timestep and the intervals (in seconds) of the flux/forcing update, the (implicit)
+           groundwater update and the reporting.
+
+        The intervals are set independently in [modelSettings]. By default the flux and report intervals are
+        iterationsBeforeReport routing steps, which is how the model used to run, and the groundwater interval
+        follows the flux interval. Every interval is a whole amount of routing steps.
+        """
+        settings      = configuration.modelSettings
+        self.timestep = float(settings['timestep'])
+        default       = int(settings.get('iterationsBeforeReport', '60')) * self.timestep
+
+        self.intervals = {"routing": self.timestep,
+                          "flux":    float(settings.get('fluxUpdateInterval', '') or default),
+                          "report":  float(settings.get('reportInterval', '') or default),
+                          }
+        self.intervals["groundwater"] = float(settings.get('groundWaterInterval', '') or self.intervals["flux"])
+        self.steps = {}
+        for component, interval in self.intervals.items():
+            steps = interval / self.timestep
+            if steps < 1 or not math.isclose(steps, round(steps)):
+                raise Exception(f"Error: The {component} interval ({interval} s) should be a multiple of the timestep ({self.timestep} s)")
+            self.steps[component] = int(round(steps))
+
+    def nr_steps(self, start_date, end_date):
+        """Amount of routing steps between the start and end date."""
+        return int((end_date - start_date).total_seconds() / self.timestep)
+
+    def starts(self, component, step):
+        """True if an interval of the component starts at this routing step."""
+        return step % self.steps[component] == 0
+
+    def ends(self, component, step):
+        """True if an interval of the component ends after this routing step."""
+        return (step + 1) % self.steps[component] == 0
+
+    def interval_start(self, component, step):
+        """Seconds since the start of the run at which the current interval of the component started."""
+        return (step - step % self.steps[component]) * self.timestep
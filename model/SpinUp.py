@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import os
+from Backend import lfr
+from Groundwater import Groundwater
+from PrepareInputs import PrepareInputs
+
+class SpinUp:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Initialize the groundwater solver and the input preparation, which holds the cache dir.
+        2) Set the step, the maximum amount of steps and the tolerance of the spin-up.
+
+        The spin-up replaces the crude initial groundwater storage (groundWaterBase and waterBelowDEM) by an
+        approximation of the steady state. Only the groundwater is simulated, with implicit steps of a day by
+        default, and the result is cached on the static inputs and parameters so later runs start from it directly.
+        """
+        self.groundwater     = Groundwater(configuration)
+        self.prepare_inputs  = PrepareInputs(configuration)
+        self.configuration   = configuration
+
+        settings             = configuration.modelSettings
+        self.partition_shape = 2 * (int(settings['partitionExtent']),)
+        self.interval        = float(settings.get('spinUpInterval', '86400'))
+        self.max_steps       = int(settings.get('spinUpSteps', '365'))
+        self.tolerance       = float(settings.get('spinUpTolerance', '0.001'))
+        self.recharge        = float(settings.get('spinUpRecharge', '0.0'))            # mm/day
+        self.check_interval  = 5
+
+    def key(self):
+        """Hash of the static inputs and parameters that determine the steady state."""
+        general, data, model = (self.configuration.generalSettings, self.configuration.dataSettings,
+                                self.configuration.modelSettings)
+        files    = [self.prepare_inputs.input_dir + data['dem'],
+                    self.prepare_inputs.input_dir + data['soilMap'],
+                    general['inputDir'] + data['soilData']]
+        settings = ";".join(model.get(name, '') for name in ('groundWaterBase', 'waterBelowDEM', 'impermeableLayerBelowDEM',
+                                                             'resolution', 'statePrecision', 'groundWaterIterations',
+                                                             'groundWaterTolerance', 'groundWaterRelaxation'))
+        return self.prepare_inputs.key(files, f"{settings};{self.interval};{self.max_steps};{self.tolerance};{self.recharge}")
+
+    def cache_file(self):
+        return os.path.join(self.prepare_inputs.cache_dir, f"spin_up_gw_s_{self.key()}.tiff")
+
+    def initial_groundwater(self, gw_s, imperm_lay_height, Ks, min_gw_s, max_gw_s, porosity, rebuild = False):
+        """Return the spun-up groundwater storage, it is only computed if the static inputs changed since the last spin-up.
+
+        Args:
+            gw_s (lpa*):                Crude initial groundwater storage, the start of the spin-up
+            imperm_lay_height (lpa*):   Height of the impermeable layer
+            Ks (lpa*):                  Hydraulic conductivity, at the precision of gw_s
+            min_gw_s (lpa*):            Minimum groundwater storage, at the precision of gw_s
+            max_gw_s (float):           Maximum groundwater storage, water above it seeps out of the domain
+            porosity (lpa*):            Porosity, at the precision of gw_s
+            rebuild (bool):             ignore the cache
+
+        Returns:
+            gw_s (lpa*):                Groundwater storage close to the steady state
+
+        lpa*: lue partitioned array
+        """
+        cache = self.cache_file()
+        if os.path.isfile(cache) and not rebuild:
+            print(f"Using the spun-up groundwater storage: {cache}")
+            return lfr.cast(lfr.from_gdal(cache, self.partition_shape), self.groundwater.std_arr_lue.state_dtype)
+
+        print(f"Spinning up the groundwater storage, cached at: {cache}")
+        gw_s = self.run(gw_s, imperm_lay_height, Ks, min_gw_s, max_gw_s, porosity)
+        self.prepare_inputs.write(gw_s, cache)
+        return gw_s
+
+    def run(self, gw_s, imperm_lay_height, Ks, min_gw_s, max_gw_s, porosity):
+        """Groundwater-only steps of spinUpInterval seconds until the groundwater table changes less than spinUpTolerance
+        meters per step. The constant recharge (spinUpRecharge) is added every step and seepage leaves the domain."""
+        cell_area = self.groundwater.cell_area
+        recharge  = (self.recharge / 1000) * (self.interval / 86400) * cell_area / porosity
+
+        for i in range(self.max_steps):
+            previous = gw_s
+            gw_s     = self.groundwater.implicit(gw_s, imperm_lay_height, Ks, min_gw_s, self.interval) + recharge
+            gw_s     = lfr.where(gw_s > max_gw_s, max_gw_s, gw_s)
+
+            if (i + 1) % self.check_interval == 0:
+                change = (gw_s - previous) / cell_area
+                if lfr.maximum(lfr.where(change < 0, -change, change)).get() < self.tolerance:
+                    print(f"Spin-up reached a steady state in {i + 1} steps")
+                    break
+        else:
+            print(f"Spin-up did not reach a steady state in {self.max_steps} steps")
+        return gw_s
@@ -5,42 +5,74 @@ Created on Wed Feb 15 10:03:54 2023
 @author: steven.hosper
 """
 
-import lue.framework as lfr
+from Backend import lfr
 import numpy as np
 import math as math
 
+# Precisions that can be selected for the parameter and state rasters
+PRECISIONS = {"float32": np.float32,
+              "float64": np.float64}
+
 class StandardArraysLUE: 
     def __init__(self, configuration):
         """
         Initialize the class. 
         1) Set extent, input and output dir.
+        2) Set the storage precision of the parameters, forcing and state.
         """
         
         self.array_extent    = int(configuration.modelSettings['arrayExtent'])
         self.partition_extent= int(configuration.modelSettings['partitionExtent'])
         self.output_dir      = configuration.generalSettings['outputDir']
         
+        # Parameters (Ks, mannings, porosity, etc.) and forcing are stored at parameter precision,
+        # height and gw_s at state precision. Accumulations for the mass balance always use float64.
+        self.parameter_dtype    = self.precision(configuration.modelSettings.get('parameterPrecision', 'float64'))
+        self.state_dtype        = self.precision(configuration.modelSettings.get('statePrecision', 'float64'))
+        self.accumulation_dtype = np.dtype(np.float64)
+    
+    def precision(self, name):
+        if name.strip() not in PRECISIONS:
+            raise Exception(f"Error: Invalid precision '{name}', choose from: {', '.join(PRECISIONS)}")
+        return np.dtype(PRECISIONS[name.strip()])
+        
     
     def boundary_cell(self):
-        array = np.ones((self.partition_extent - 2, self.array_extent - 2), dtype= np.uint8)
-        boundary_cell = np.pad(array, pad_width=1, mode='constant', constant_values=0)
-        boundary_cell = lfr.from_numpy(boundary_cell, 2*(self.partition_extent,))
-        lfr.to_gdal(boundary_cell, self.output_dir + '/boundary_cell.tiff')
-        return boundary_cell
+        """1 for cells with all 8 neighbours in the array, 0 at the edge. A focal sum, so it is created per partition."""
+        window = np.ones((3, 3), dtype=np.uint8)
+        return lfr.cast(lfr.focal_sum(self.one(np.float32), window) == 9, np.uint8)
     
-    def zero(self):
+    def zero(self, dtype = np.float64):
         return lfr.create_array(2*(self.array_extent,),
                                 2*(self.partition_extent,),
-                                dtype = np.dtype(np.float64),
+                                dtype = np.dtype(dtype),
                                 fill_value = 0,
                                 )
     
-    def one(self):
+    def one(self, dtype = np.float64):
         return lfr.create_array(2*(self.array_extent,),
                                 2*(self.partition_extent,),
-                                dtype = np.dtype(np.float64),
+                                dtype = np.dtype(dtype),
                                 fill_value = 1,
                                 )
+    
+    def to_state(self, array):
+        """Cast a parameter precision array to the state precision, only if the precisions differ."""
+        if self.parameter_dtype == self.state_dtype:
+            return array
+        return lfr.cast(array, self.state_dtype)
+    
+    def to_parameter(self, array):
+        """Cast a state precision array to the parameter precision, only if the precisions differ."""
+        if self.parameter_dtype == self.state_dtype:
+            return array
+        return lfr.cast(array, self.parameter_dtype)
+    
+    def to_accumulation(self, array):
+        """Cast a state precision array to float64 before it is summed for the mass balance."""
+        if self.state_dtype == self.accumulation_dtype:
+            return array
+        return lfr.cast(array, self.accumulation_dtype)
 
     def one_int(self):
         return lfr.create_array(2*(self.array_extent,),
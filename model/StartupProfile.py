@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import time
+
+class StartupProfile:
+    def __init__(self, enabled):
+        """
+        Initialize the class.
+        1) Start the clock, the profile is only printed when enabled (--profile-startup).
+
+        Only the standard library is imported here, so it can be imported before the heavy modules it measures.
+        """
+        self.enabled = enabled
+        self.start   = time.perf_counter()
+        self.last    = self.start
+        self.phases  = []
+
+    def mark(self, phase):
+        """Record the time since the previous mark as the duration of phase."""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        if not self.enabled:
+            return
+        print(f"\n{'startup phase':<35}{'seconds':>10}")
+        for phase, seconds in self.phases:
+            print(f"{phase:<35}{seconds:>10.3f}")
+        print(f"{'total':<35}{self.last - self.start:>10.3f}\n")
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+from Backend import lfr
+
+# State variables of the model and the dataSettings option from which a run starts with them
+STATES = {"gw_s":   "iniGroundWaterStorage",
+          "height": "iniWaterHeight",
+          "int_s":  "iniInterceptionStorage",
+          }
+DATE_FORMAT  = "%Y%m%dT%H%M%S"
+CONFIG_DATE  = "%Y, %m, %d, %H, %M, %S"
+STATE_FILE   = "state.json"
+
+class StateStore:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Set the directory of the store (stateDir, empty is off).
+        2) Set the valid times at which the states of the run are saved (saveStates).
+
+        A state is the groundwater storage, water height and interception storage of the whole domain at a valid
+        time, saved as rasters in a directory per valid time. A later run starts from a saved state by pointing the
+        ini* rasters of dataSettings to it (ini_settings), which is how tools/forecast.py chains the cycles of a
+        rolling forecast. saveStates lists the valid times separated by ';', 'end' is the end date of the run.
+        """
+        self.root       = configuration.generalSettings.get('stateDir', '')
+        end_date        = datetime.datetime(*map(int, configuration.modelSettings['endDate'].split(", ")))
+        self.save_dates = set()
+        for date in configuration.modelSettings.get('saveStates', '').split(";"):
+            if date.strip() == "end":
+                self.save_dates.add(end_date)
+            elif date.strip():
+                self.save_dates.add(datetime.datetime(*map(int, date.split(","))))
+
+    def enabled(self):
+        return bool(self.root)
+
+    def due(self, date):
+        """True if the state at this valid time is saved."""
+        return self.enabled() and date in self.save_dates
+
+    def directory(self, date):
+        return os.path.join(self.root, date.strftime(DATE_FORMAT))
+
+    def files(self, date):
+        """The raster of every state variable at a valid time. The names are unique per store and valid time, so
+        the tiled copies of PrepareInputs of different states do not replace each other."""
+        directory = self.directory(date)
+        key       = hashlib.sha1(os.path.abspath(directory).encode()).hexdigest()[:8]
+        return {variable: os.path.join(directory, f"{variable}_{key}.tiff") for variable in STATES}
+
+    def save(self, date, states):
+        """Save the states {variable: lpa*} at a valid time, the directory appears once all rasters are complete.
+
+        lpa*: lue partitioned array
+        """
+        directory = self.directory(date)
+        temporary = directory + ".tmp"
+        os.makedirs(temporary, exist_ok = True)
+        files = self.files(date)
+        for variable, data in states.items():
+            written = lfr.to_gdal(data, os.path.join(temporary, os.path.basename(files[variable])))
+            # LUE writes asynchronously, the state is only complete once every raster is written
+            if hasattr(written, "wait"):
+                written.wait()
+        with open(os.path.join(temporary, STATE_FILE), "w") as f:
+            json.dump({"valid_time": date.isoformat(), "variables": list(states)}, f, indent=4)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.replace(temporary, directory)
+        print(f"Saved the state of {date} at: {directory}")
+
+    def valid_times(self):
+        """The valid times of the complete states in the store, in order."""
+        if not os.path.isdir(self.root):
+            return []
+        times = []
+        for name in os.listdir(self.root):
+            if os.path.isfile(os.path.join(self.root, name, STATE_FILE)):
+                try:
+                    times.append(datetime.datetime.strptime(name, DATE_FORMAT))
+                except ValueError:
+                    continue
+        return sorted(times)
+
+    def nearest(self, date):
+        """The latest valid time at or before date with a saved state, or None."""
+        times = [time for time in self.valid_times() if time <= date]
+        return times[-1] if times else None
+
+    def ini_settings(self, date):
+        """The dataSettings that start a run from the state at a valid time, the rasters are absolute paths."""
+        return {STATES[variable]: os.path.abspath(file_name) for variable, file_name in self.files(date).items()}
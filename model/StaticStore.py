@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import json
+import os
+import shutil
+import time
+import numpy as np
+from Backend import lfr
+from PrepareInputs import PrepareInputs
+
+# Static (read-only) arrays of mainModel that are shared, the state of a run (height, gw_s, int_s) is not
+STATICS = ("dem", "catchment", "ldd", "outlet", "Ks", "porosity", "wilting_point", "mannings", "permeability",
+           "max_int_s", "throughfall_frac", "slope", "imperm_lay_height", "min_gw_s", "gw_base")
+
+# Settings that change the static arrays
+STATIC_SETTINGS = (("modelSettings", "arrayExtent"), ("modelSettings", "resolution"),
+                   ("modelSettings", "parameterPrecision"), ("modelSettings", "statePrecision"),
+                   ("modelSettings", "impermeableLayerBelowDEM"), ("modelSettings", "groundWaterBase"),
+                   ("generalSettings", "generateLDD"), ("generalSettings", "lddMethod"),
+                   ("generalSettings", "lddFillEpsilon"), ("generalSettings", "lddFillIterations"))
+
+MANIFEST = "manifest.json"
+
+class StaticStore:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Set the directory of the shared statics (sharedStatics, empty is off) and the input preparation.
+        2) Set the input files and settings that determine the static arrays.
+
+        Ensemble members that run on the same node with the same inputs all hold the same DEM, LDD, soil and
+        land-use parameters and derived arrays. The first member publishes them as .npy files in a directory named
+        after the hash of the inputs and settings, the other members wait for it and attach to those files with
+        memory maps instead of preparing them again. With the numpy backend the memory maps are used as the arrays
+        themselves (read-only), so the operating system keeps a single copy in its page cache for all members and
+        a member only holds its own state. LUE arrays are owned by their partitions, with the lue backend the
+        arrays are created from the memory maps, which saves the preparation but not the memory.
+        """
+        self.root            = configuration.generalSettings.get('sharedStatics', '')
+        self.timeout         = float(configuration.generalSettings.get('sharedStaticsTimeout', '600'))
+        self.prepare_inputs  = PrepareInputs(configuration)
+        self.partition_shape = 2 * (int(configuration.modelSettings['partitionExtent']),)
+
+        data  = configuration.dataSettings
+        files = [self.prepare_inputs.input_dir + data[option] for option in ("dem", "landUseMap", "soilMap")]
+        if configuration.generalSettings.get('generateLDD', 'False') != 'True':
+            files.append(self.prepare_inputs.input_dir + data['ldd'])
+        files += [configuration.generalSettings['inputDir'] + data[option] for option in ("soilData", "landUseData")]
+        self.files     = files
+        self.settings  = ";".join(getattr(configuration, section).get(option, '') for section, option in STATIC_SETTINGS)
+        self.directory = None
+        self.lock_file = None
+
+    def enabled(self):
+        return bool(self.root)
+
+    def attach(self):
+        """The static arrays of another member, or None if this member has to prepare (and publish) them.
+
+        Returns:
+            statics (dict):     name and array of every static, memory maps with the numpy backend
+        """
+        if not self.enabled():
+            return None
+        os.makedirs(self.root, exist_ok = True)
+        self.directory = os.path.join(self.root, f"statics_{self.prepare_inputs.key(self.files, self.settings)}")
+        self.lock_file = self.directory + ".lock"
+
+        manifest_file = os.path.join(self.directory, MANIFEST)
+        waited = 0.0
+        while not os.path.isfile(manifest_file):
+            if self.acquire():
+                if not os.path.isfile(manifest_file):
+                    return None
+                # Published between the check and the lock
+                os.remove(self.lock_file)
+                break
+            if waited >= self.timeout:
+                print(f"The shared statics were not published within {self.timeout} s, preparing them in this run")
+                self.lock_file = None
+                return None
+            time.sleep(0.5)
+            waited += 0.5
+
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+        print(f"Attaching to the shared statics at: {self.directory}")
+        statics = {}
+        for name in manifest["statics"]:
+            array = np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode = "r")
+            statics[name] = array if lfr.name == "numpy" else lfr.from_numpy(array, self.partition_shape)
+        return statics
+
+    def acquire(self):
+        """Take the lock on publishing the statics, a lock of a process that no longer exists is taken over."""
+        try:
+            descriptor = os.open(self.lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(self.lock_file) as f:
+                    os.kill(int(f.read() or 0), 0)
+                return False
+            except (OSError, ValueError):
+                # The publishing member stopped without publishing
+                try:
+                    os.remove(self.lock_file)
+                except FileNotFoundError:
+                    pass
+                return self.acquire()
+        with os.fdopen(descriptor, "w") as f:
+            f.write(str(os.getpid()))
+        return True
+
+    def publish(self, model):
+        """Write the static arrays of the model for the other members, if this member holds the lock.
+        The files are written to a temporary directory that is renamed at once, so members never attach to a
+        partly written store."""
+        if self.lock_file is None or not os.path.isfile(self.lock_file):
+            return
+        temporary = f"{self.directory}.{os.getpid()}.tmp"
+        os.makedirs(temporary, exist_ok = True)
+        try:
+            for name in STATICS:
+                np.save(os.path.join(temporary, f"{name}.npy"), np.asarray(lfr.to_numpy(getattr(model, name))))
+            with open(os.path.join(temporary, MANIFEST), "w") as f:
+                json.dump({"statics": list(STATICS), "files": self.files, "settings": self.settings}, f, indent=4)
+            os.replace(temporary, self.directory)
+            print(f"Published the shared statics at: {self.directory}")
+        finally:
+            shutil.rmtree(temporary, ignore_errors = True)
+            os.remove(self.lock_file)
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+@author: steven.hosper
+"""
+
+import json
+import math
+import os
+import numpy as np
+from osgeo import gdal
+from NumpyBackend import FlowNetwork
+from PrepareInputs import cache_directory, content_key
+
+# Routing cost of a partition task (scheduling, communication) in cell updates, used to compare partition extents
+PARTITION_OVERHEAD = 5000
+
+class Subcatchments:
+    def __init__(self, configuration):
+        """
+        Initialize the class.
+        1) Set the LDD of the scenario and the target size of a subcatchment.
+
+        The drainage network of the LDD is split into a tree of subcatchments of about subcatchmentCells cells:
+        cells are visited from the sources to the pits and a cell becomes the outlet of a subcatchment once the
+        cells draining to it, that are not yet part of another subcatchment, reach the target size. Subcatchments
+        that do not drain into each other can be routed independently.
+
+        LUE partitions are square tiles of one size, they can not follow the subcatchments. Instead the tiling
+        that cuts the network least is chosen: for every candidate partition extent the flow paths crossing a
+        partition border and the longest chain of partitions along a flow path (which the kinematic wave has to
+        process one after the other) are counted. With partitionExtent = auto the extent with the lowest estimated
+        routing cost is used.
+        """
+        self.array_extent = int(configuration.modelSettings['arrayExtent'])
+        self.target_cells = int(configuration.modelSettings.get('subcatchmentCells', '10000'))
+        ldd_file          = configuration.dataSettings.get('ldd', '')
+        self.ldd_file     = (configuration.generalSettings['inputDir'] + configuration.generalSettings['scenario'] +
+                             ldd_file) if ldd_file else None
+        self.network      = None
+
+    def read_ldd(self):
+        """The LDD as a uint8 array, cells without a direction (no-data) are set to 0."""
+        dataset = gdal.Open(self.ldd_file) if self.ldd_file else None
+        if dataset is None:
+            raise Exception(f"Error: Could not open the LDD: {self.ldd_file}")
+        ldd = dataset.GetRasterBand(1).ReadAsArray()
+        return np.where((ldd >= 1) & (ldd <= 9), ldd, 0).astype(np.uint8)
+
+    def initialize(self, ldd = None):
+        """Build the flow network of the LDD (read from the scenario if it is not given)."""
+        self.ldd     = np.asarray(ldd if ldd is not None else self.read_ldd())
+        self.valid   = ((self.ldd >= 1) & (self.ldd <= 9)).ravel()
+        self.network = FlowNetwork(self.ldd)
+
+    def decompose(self):
+        """Split the drainage network into subcatchments of about target_cells cells.
+
+        Returns:
+            labels (array):     subcatchment of every cell (the index of its outlet cell), -1 for no-data cells
+            downstream (dict):  the subcatchment every subcatchment drains into, -1 for subcatchments that end in a pit
+        """
+        network = self.network
+        open_cells = self.valid.astype(np.int64)
+        outlet = np.zeros(network.size, dtype=bool)
+        for cells, has_downstream, downstream_cells in network.levels:
+            # Cells that flow into a pit, out of the array or into no-data end a subcatchment as well
+            drains = np.zeros(len(cells), dtype=bool)
+            drains[has_downstream] = self.valid[downstream_cells]
+            outlet[cells] = (open_cells[cells] >= self.target_cells) | ~drains
+            # Cells of a finished subcatchment are not passed on downstream
+            passed = np.where(outlet[cells], 0, open_cells[cells])[has_downstream]
+            np.add.at(open_cells, downstream_cells, passed)
+
+        labels = np.full(network.size, -1, dtype=np.int64)
+        for cells, has_downstream, downstream_cells in reversed(network.levels):
+            label = np.array(cells)
+            inner = ~outlet[cells]
+            label[inner] = labels[network.downstream[cells[inner]]]
+            labels[cells] = label
+        labels[~self.valid] = -1
+
+        outlets = np.flatnonzero(outlet & self.valid)
+        downstream = {int(cell): int(labels[network.downstream[cell]]) if network.downstream[cell] >= 0 else -1
+                      for cell in outlets}
+        downstream = {cell: label if label in downstream else -1 for cell, label in downstream.items()}
+        return labels.reshape(self.ldd.shape), downstream
+
+    def tree_depth(self, downstream):
+        """Longest chain of subcatchments that drain into each other, the parallelism of routing them per subcatchment."""
+        depth = {-1: 0}
+        for label in downstream:
+            path = []
+            while label not in depth:
+                path.append(label)
+                label = downstream[label]
+            for previous in reversed(path):
+                depth[previous] = depth[label] + 1
+                label = previous
+        return max(depth.values())
+
+    def partitions(self, partition_extent):
+        """Partition of every cell for square tiles of partition_extent."""
+        rows, cols = np.indices(self.ldd.shape)
+        partitions_per_row = math.ceil(self.ldd.shape[1] / partition_extent)
+        return ((rows // partition_extent) * partitions_per_row + cols // partition_extent).ravel()
+
+    def partition_metrics(self, partition_extent, workers = 1):
+        """Flow paths cut by the tiling and the estimated cost of a routing step in cell updates.
+
+        Returns:
+            metrics (dict): partitions, crossings (flow paths over a partition border), chain (longest sequence
+                            of partitions along a flow path) and cost, the larger of the work per worker and the
+                            chain of partitions, plus the overhead of the partition tasks per worker
+        """
+        network   = self.network
+        partition = self.partitions(partition_extent)
+        chain     = np.ones(network.size, dtype=np.int64)
+        crossings = 0
+        for cells, has_downstream, downstream_cells in network.levels:
+            sources = cells[has_downstream]
+            crosses = partition[sources] != partition[downstream_cells]
+            crossings += int(np.count_nonzero(crosses & self.valid[sources]))
+            np.maximum.at(chain, downstream_cells, chain[sources] + crosses)
+
+        nr_partitions = math.ceil(self.ldd.shape[0] / partition_extent) * math.ceil(self.ldd.shape[1] / partition_extent)
+        cells         = int(np.count_nonzero(self.valid))
+        longest_chain = int(chain[self.valid].max()) if cells else 0
+        cost          = (max(cells / workers, longest_chain * min(partition_extent ** 2, cells)) +
+                         nr_partitions * PARTITION_OVERHEAD / workers)
+        return {"partition_extent": partition_extent, "partitions": nr_partitions, "crossings": crossings,
+                "chain": longest_chain, "cost": cost}
+
+    def candidate_extents(self):
+        """Partition extents that divide the array in 1 to 32 tiles per side, rounded up to a multiple of 16."""
+        extents = {self.array_extent}
+        for tiles in range(2, 33):
+            extent = 16 * math.ceil(self.array_extent / tiles / 16)
+            if extent >= 64:
+                extents.add(min(extent, self.array_extent))
+        return sorted(extents, reverse=True)
+
+    def auto_partition_extent(self, workers):
+        """The candidate partition extent with the lowest estimated routing cost for the amount of workers."""
+        if self.network is None:
+            self.initialize()
+        metrics = [self.partition_metrics(extent, workers) for extent in self.candidate_extents()]
+        best = min(metrics, key=lambda metric: metric["cost"])
+        print(f"partitionExtent = auto: {best['partition_extent']} ({best['partitions']} partitions, "
+              f"{best['crossings']} flow paths over partition borders, chain of {best['chain']} partitions)")
+        return best["partition_extent"]
+
+
+def resolve_partition_extent(configuration, workers, localities = 1):
+    """Replace partitionExtent = auto in the configuration by the extent chosen from the drainage network, and return
+    the partition extent. Every entry point that creates partitioned arrays calls this first.
+
+    The choice reads the whole LDD, so it is made once by a single process and cached in the cache directory on
+    the contents of the LDD and the settings it depends on. With more than one locality every locality would read
+    the LDD at the same time, there the cached choice is used and it is made beforehand with
+    tools/ingestInputs.py --workers=(threads x localities).
+    """
+    value = configuration.modelSettings['partitionExtent'].strip()
+    if value != 'auto':
+        return int(value)
+
+    subcatchments = Subcatchments(configuration)
+    if subcatchments.ldd_file is None or not os.path.isfile(subcatchments.ldd_file):
+        raise Exception(f"Error: partitionExtent = auto needs the LDD as an input raster (dataSettings ldd): {subcatchments.ldd_file}")
+    key   = content_key([subcatchments.ldd_file], f"{workers};{subcatchments.array_extent};{subcatchments.target_cells}")
+    cache = os.path.join(cache_directory(configuration), f"partition_extent_{key}.json")
+    if os.path.isfile(cache):
+        with open(cache) as f:
+            extent = json.load(f)["partition_extent"]
+        print(f"partitionExtent = auto: {extent} (chosen before for {workers} workers)")
+    elif localities > 1:
+        raise Exception(f"Error: partitionExtent = auto on {localities} localities needs the extent chosen beforehand, "
+                        f"run tools/ingestInputs.py --workers={workers} on the configuration first")
+    else:
+        extent = subcatchments.auto_partition_extent(workers)
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        temporary = f"{cache}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump({"partition_extent": extent, "workers": workers}, f)
+        os.replace(temporary, cache)
+
+    configuration.modelSettings['partitionExtent'] = str(extent)
+    return extent
@@ -4,31 +4,74 @@ Created on Mon Mar 7 2023
 
 @author: steven.hosper
 """
-import lue.framework as lfr
+from Backend import lfr
+import concurrent.futures
 import datetime
+import os
 import numpy as np
-from osgeo import gdal
-import pandas as pd
 from StandardArraysLUE import StandardArraysLUE
+from Scheduler import Scheduler
+from PrepareInputs import PrepareInputs
+import OutflowLog
 
 # Reporting for the HydrologicBaseModel
 class Report:
     def __init__(self, configuration):
         self.standard_LUE   = StandardArraysLUE(configuration)
         self.timestep = configuration.modelSettings['timestep']
+        self.report_interval = Scheduler(configuration).intervals["report"]
         self.output_dir = configuration.generalSettings['outputDir'] + configuration.generalSettings["scenario"]
         self.input_dir   = configuration.generalSettings['inputDir'] + configuration.generalSettings['scenario'] 
         
+        # Reported rasters are rewritten as tiled, compressed GeoTIFFs with overviews in a background thread
+        self.optimize_rasters = configuration.reportSettings.get('optimizeRasters', 'False') == 'True'
+        self.prepare_inputs   = PrepareInputs(configuration)
+        self.optimizer        = concurrent.futures.ThreadPoolExecutor(max_workers=1) if self.optimize_rasters else None
+        self.pending          = []
+        
     def dynamic(self, date, variables):
         dateTime = date.strftime("%Y-%m-%d-%H%M")
         for variable, data in variables.items():
-            lfr.to_gdal(data, self.output_dir + "/{}_{}_{}.tiff".format(self.timestep,
-                                                                         variable,
-                                                                         dateTime
-                                                                         ))
+            file_name = self.output_dir + "/{}_{}_{}.tiff".format(self.timestep,
+                                                                   variable,
+                                                                   dateTime
+                                                                   )
+            written = lfr.to_gdal(data, file_name)
+            if self.optimize_rasters:
+                self.pending.append(self.optimizer.submit(self.optimize, file_name, written))
         return 0
+    
+    def optimize(self, file_name, written):
+        """Rewrite a reported raster as a tiled, compressed GeoTIFF with internal overviews, so viewers can read a
+        low resolution level. A cloud optimized GeoTIFF is written if GDAL has the COG driver."""
+        # GDAL is only needed for the reported rasters, so it is not imported at startup
+        from osgeo import gdal
+        # LUE writes asynchronously, wait until the raster is complete
+        if hasattr(written, "wait"):
+            written.wait()
+        
+        optimized = file_name + ".optimized.tiff"
+        if gdal.GetDriverByName("COG") is not None:
+            gdal.Translate(optimized, file_name, format="COG",
+                           creationOptions=["COMPRESS=DEFLATE", f"BLOCKSIZE={self.prepare_inputs.block_size}",
+                                            "RESAMPLING=AVERAGE", "BIGTIFF=IF_SAFER"])
+        else:
+            gdal.Translate(optimized, file_name, format="GTiff", creationOptions=self.prepare_inputs.creation_options())
+            output = gdal.Open(optimized, gdal.GA_Update)
+            self.prepare_inputs.finish(output, "AVERAGE")
+            output = None
+        os.replace(optimized, file_name)
+    
+    def wait(self):
+        """Wait until all reported rasters are optimized, before they are read after the run."""
+        for pending in self.pending:
+            pending.result()
+        self.pending = []
      
     def balance_report(self, configuration):
+        # pandas is only needed after the run, so it is not imported at startup
+        import pandas as pd
+        
         start_date = self.string_to_datetime(configuration.modelSettings['startDate'], seperator= ", ")
         end_date   = self.string_to_datetime(configuration.modelSettings['endDate'], seperator= ", ")
         start_date_txt = start_date.strftime("%d/%m/%Y %H:%M")
@@ -53,23 +96,13 @@ class Report:
         else:
             mean_evapotranspiration = 0
         
-        end_date = end_date - datetime.timedelta(minutes=1)
-        
-        # Load initial files, if they cannot be loaded, assume zero (same as model does)
-        try:
-            ini_sur_stor = self.tiff_to_np_sum(self.input_dir + configuration.dataSettings["iniWaterHeight"])
-        except:
-            self.standard_LUE.zero()
+        # The last report is labelled with the start of the last report interval
+        end_date = end_date - datetime.timedelta(seconds=self.report_interval)
         
-        try:
-            ini_gro_stor = self.input_dir + configuration.dataSettings['iniGroundWaterStorage']
-        except:
-            self.standard_LUE.zero()
-        
-        try:
-            ini_int_stor = self.tiff_to_np_sum(self.input_dir + configuration.dataSettings['iniInterceptionStorage'])
-        except:
-            self.standard_LUE.zero()
+        # Load initial files, if they are not configured or do not exist, assume zero (same as model does)
+        ini_sur_stor = self.tiff_to_np_sum(self.ini_file(configuration, 'iniWaterHeight'))
+        ini_gro_stor = self.ini_file(configuration, 'iniGroundWaterStorage')
+        ini_int_stor = self.tiff_to_np_sum(self.ini_file(configuration, 'iniInterceptionStorage'))
             
         end_sur_stor = self.tiff_to_np_sum(self.output_dir + "/{}_height_{}.tiff".format(int(configuration.modelSettings["timestep"]), end_date.strftime("%Y-%m-%d-%H%M")))
         end_gro_stor = self.output_dir + "/{}_gw_s_{}.tiff".format(int(configuration.modelSettings["timestep"]), end_date.strftime("%Y-%m-%d-%H%M"))
@@ -79,7 +112,10 @@ class Report:
         cell_area   = resolution ** 2
         
         del_sur_stor = (end_sur_stor - ini_sur_stor) * resolution
-        del_gro_stor = self.tiff_to_np_sum_difference(end_gro_stor, ini_gro_stor) * float(configuration.modelSettings["porosity"])
+        if ini_gro_stor is None:
+            del_gro_stor = self.tiff_to_np_sum(end_gro_stor) * float(configuration.modelSettings["porosity"])
+        else:
+            del_gro_stor = self.tiff_to_np_sum_difference(end_gro_stor, ini_gro_stor) * float(configuration.modelSettings["porosity"])
         del_int_stor = (end_int_stor - ini_int_stor)
         net_balance = del_sur_stor + del_int_stor + del_gro_stor
         precipitation       = (((end_idx - start_idx) / 12) * mean_precipitation) / 1000 * cell_area * (int(configuration.modelSettings["arrayExtent"]) ** 2) * (float(configuration.modelSettings["validCellsPercentage"]))/100
@@ -106,18 +142,29 @@ class Report:
         print("time simulated:                    ", (end_idx-start_idx)*5*60, "s")
         print("waterbalance change in the system: ", (net_balance - atmospheric_balance)/((end_idx-start_idx)*5*60), "m3/s")
         
-        ofdf            = pd.read_csv(self.output_dir + "/maximumDischarge.csv", sep=";", names=["timestep", "outflow"])
-        average_outflow = ofdf["outflow"].mean() * -1
+        average_outflow = OutflowLog.read_summary(self.output_dir)["mean"] * -1
         print("measured loss to outflow:   ", average_outflow, "m3/s \n")
         
         return 0
     
+    def ini_file(self, configuration, option):
+        """The raster of an initial state, resolved as InputLoader.optional does (PrepareInputs.source). None if it
+        is not configured or does not exist."""
+        file_name = configuration.dataSettings.get(option, '')
+        if not file_name:
+            return None
+        path = self.prepare_inputs.source(file_name)
+        return path if os.path.isfile(path) else None
+    
     def tiff_to_np_sum(self, file):
+        if file is None:
+            return 0
+        from osgeo import gdal
         try:
             data = gdal.Open(file)
             img = data.GetRasterBand(1)
             raster = img.ReadAsArray()
-            np_array_sum = np.nansum(raster)
+            np_array_sum = np.nansum(raster, dtype=np.float64)
         except:
             np_array_sum = 0
         return np_array_sum
@@ -134,6 +181,7 @@ class Report:
         
     
     def tiff_to_np_sum_difference(self, file1, file2):
+        from osgeo import gdal
         try:
             data1 = gdal.Open(file1)
             img1 = data1.GetRasterBand(1)
@@ -141,7 +189,7 @@ class Report:
             data2 = gdal.Open(file2)
             img2 = data2.GetRasterBand(1)
             raster2 = img2.ReadAsArray()
-            np_array_sum = np.nansum(raster1 - raster2)
+            np_array_sum = np.nansum(raster1.astype(np.float64) - raster2.astype(np.float64))
         except:
             np_array_sum = 0
         return np_array_sum
\ No newline at end of file
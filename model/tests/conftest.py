@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+The modules of the model are imported by name from the model directory, as HBM.py does.
+
+@author: steven.hosper
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Tests of the NumPy backend against values computed by hand on small grids, and parity tests against the
+LUE backend on the same arrays. The parity tests are skipped if LUE is not installed.
+
+@author: steven.hosper
+"""
+
+import numpy as np
+import pytest
+
+import NumpyBackend as nfr
+
+# Direct neighbours, as in Groundwater.py
+NEIGHBOURS = np.array([[0, 1, 0],
+                       [1, 0, 1],
+                       [0, 1, 0]], dtype=np.uint8)
+NORTH      = np.array([[0, 1, 0],
+                       [0, 0, 0],
+                       [0, 0, 0]], dtype=np.uint8)
+
+# 4 x 4 LDD that drains to a single pit in the lower right corner
+LDD = np.array([[3, 2, 2, 1],
+                [6, 3, 2, 1],
+                [6, 6, 3, 2],
+                [6, 6, 6, 5]], dtype=np.uint8)
+# Flat index of the downstream cell of every cell of LDD, -1 for the pit
+LDD_DOWNSTREAM = [5, 5, 6, 6,
+                  5, 10, 10, 10,
+                  9, 10, 15, 15,
+                  13, 14, 15, -1]
+
+
+# Local, zonal and focal operations ------------------------------------------------
+def test_zonal_sum():
+    values = np.array([[1.0, 2.0], [3.0, 4.0]])
+    zones  = np.array([[1, 1], [2, 2]])
+    np.testing.assert_array_equal(nfr.zonal_sum(values, zones), [[3.0, 3.0], [7.0, 7.0]])
+
+
+def test_zonal_sum_boolean_zones():
+    """The outflow is the zonal sum over the outlets, the cells outside of them form zone 0."""
+    values  = np.arange(16, dtype=np.float64).reshape(4, 4)
+    outlets = LDD == 5
+    np.testing.assert_array_equal(nfr.zonal_sum(values, outlets), np.where(outlets, 15.0, 120.0 - 15.0))
+
+
+def test_focal_sum_counts_neighbours():
+    """Cells outside of the array count as 0: 2 neighbours in the corners, 3 at the edges, 4 inside."""
+    expected = [[2, 3, 3, 2],
+                [3, 4, 4, 3],
+                [3, 4, 4, 3],
+                [2, 3, 3, 2]]
+    np.testing.assert_array_equal(nfr.focal_sum(np.ones((4, 4)), NEIGHBOURS), expected)
+    np.testing.assert_array_equal(nfr.focal_sum(np.ones((3, 3)), np.ones((3, 3))), [[4, 6, 4], [6, 9, 6], [4, 6, 4]])
+
+
+def test_focal_sum_orientation():
+    """The upper row of the kernel is the row above a cell."""
+    rows = np.repeat(np.arange(1.0, 5.0)[:, None], 4, axis=1)
+    np.testing.assert_array_equal(nfr.focal_sum(rows, NORTH)[:, 0], [0, 1, 2, 3])
+
+
+def test_where_keeps_precision():
+    array = np.ones(4, dtype=np.float32)
+    assert nfr.where(array > 0, array, 0.0).dtype == np.float32
+
+
+# Flow direction ---------------------------------------------------------------------
+def test_d8_flow_direction_single_pit():
+    """Every cell drains to the lowest cell in the centre, which is a pit. Corners go diagonally, because
+    the drop over the diagonal distance (4 / sqrt(2)) is larger than the drop to the direct neighbour (1)."""
+    dem = np.array([[5.0, 4.0, 5.0],
+                    [4.0, 1.0, 4.0],
+                    [5.0, 4.0, 5.0]])
+    np.testing.assert_array_equal(nfr.d8_flow_direction(dem), [[3, 2, 1],
+                                                                [6, 5, 4],
+                                                                [9, 8, 7]])
+
+
+def test_d8_flow_direction_plane():
+    """On a plane sloping to the east every cell drains east, the cells at the lower edge have no lower neighbour."""
+    dem = np.repeat(np.arange(4.0, 0.0, -1.0)[None, :], 3, axis=0)
+    np.testing.assert_array_equal(nfr.d8_flow_direction(dem), [[6, 6, 6, 5]] * 3)
+
+
+# Flow network -----------------------------------------------------------------------
+def test_flow_network_downstream():
+    network = nfr.FlowNetwork(LDD)
+    np.testing.assert_array_equal(network.downstream, LDD_DOWNSTREAM)
+
+
+def test_flow_network_levels():
+    """Every level only depends on the levels before it, the pit is solved last."""
+    network = nfr.FlowNetwork(LDD)
+    levels  = [sorted(cells.tolist()) for cells, _, _ in network.levels]
+    assert levels == [[0, 1, 2, 3, 4, 7, 8, 11, 12], [5, 6, 9, 13], [10, 14], [15]]
+    assert sorted(network.order.tolist()) == list(range(16))
+
+
+def test_flow_network_leaving_the_array():
+    """Flow out of the array ends the path, like a pit."""
+    network = nfr.FlowNetwork(np.array([[4, 6]], dtype=np.uint8))
+    np.testing.assert_array_equal(network.downstream, [-1, -1])
+
+
+def test_flow_network_cycle():
+    with pytest.raises(Exception, match="cycles"):
+        nfr.FlowNetwork(np.array([[6, 4]], dtype=np.uint8))
+
+
+def test_upstream_and_downstream():
+    values = np.arange(16, dtype=np.float64).reshape(4, 4)
+    upstream = nfr.upstream(LDD, np.ones((4, 4)))
+    np.testing.assert_array_equal(upstream, [[0, 0, 0, 0],
+                                             [0, 3, 2, 0],
+                                             [0, 1, 4, 0],
+                                             [0, 1, 1, 3]])
+    downstream = nfr.downstream(LDD, values).ravel()
+    np.testing.assert_array_equal(downstream, [values.ravel()[cell] if cell >= 0 else values.ravel()[i]
+                                               for i, cell in enumerate(LDD_DOWNSTREAM)])
+
+
+# Kinematic wave ---------------------------------------------------------------------
+def test_kinematic_wave_linear_channel():
+    """With alpha = beta = 1 and dt = dx the kinematic wave is linear: Q = (Q upstream + Q old + dt * inflow) / 2."""
+    ldd       = np.array([[6, 6, 5]], dtype=np.uint8)
+    discharge = np.array([[1.0, 2.0, 3.0]])
+    inflow    = np.array([[0.5, 0.0, 0.0]])
+    result    = nfr.kinematic_wave(ldd, discharge, inflow, 1.0, 1.0, 1.0, 1.0)
+    q0 = (0.0 + 1.0 + 0.5) / 2
+    q1 = (q0 + 2.0) / 2
+    q2 = (q1 + 3.0) / 2
+    np.testing.assert_allclose(result, [[q0, q1, q2]], rtol=1e-12)
+
+
+def test_kinematic_wave_no_water():
+    ldd = np.array([[6, 6, 5]], dtype=np.uint8)
+    np.testing.assert_array_equal(nfr.kinematic_wave(ldd, np.zeros((1, 3)), 0.0, 1.5, 0.6, 1.0, 5.0), [[0, 0, 0]])
+
+
+@pytest.mark.parametrize("jit", [False, True])
+def test_kinematic_wave_solves_the_cell_equations(jit):
+    """Every cell satisfies dt/dx Q + alpha Q^beta = dt/dx Q upstream + alpha Q old^beta + dt inflow."""
+    if jit and nfr.numba is None:
+        pytest.skip("numba is not installed")
+    nfr.use_jit(jit)
+    try:
+        rng       = np.random.default_rng(0)
+        discharge = rng.random((4, 4))
+        inflow    = rng.random((4, 4)) * 1E-3
+        alpha, beta, dt, dx = 1.7, 0.6, 1.0, 5.0
+        result    = nfr.kinematic_wave(LDD, discharge, inflow, alpha, beta, dt, dx)
+    finally:
+        nfr.use_jit(False)
+
+    upstream = nfr.upstream(LDD, result)
+    np.testing.assert_allclose(dt / dx * result + alpha * result ** beta,
+                               dt / dx * upstream + alpha * discharge ** beta + dt * inflow, rtol=1e-9)
+
+
+def test_kinematic_wave_out():
+    ldd = np.array([[6, 6, 5]], dtype=np.uint8)
+    out = np.zeros((1, 3))
+    result = nfr.kinematic_wave(ldd, np.ones((1, 3)), 0.0, 1.0, 1.0, 1.0, 1.0, out=out)
+    assert result is out
+    np.testing.assert_allclose(out, [[0.5, 0.75, 0.875]])
+
+
+# Parity with the LUE backend ----------------------------------------------------------
+PARTITION_SHAPE = (4, 4)
+HPX_CONFIGURATION = ["hpx.run_hpx_main!=1",
+                     "hpx.commandline.allow_unknown!=1",
+                     "hpx.commandline.aliasing!=0",
+                     "hpx.diagnostics_on_terminate!=1"]
+
+
+@pytest.fixture(scope="module")
+def lfr():
+    lfr = pytest.importorskip("lue.framework")
+    lfr.start_hpx_runtime(HPX_CONFIGURATION)
+    return lfr
+
+
+@pytest.fixture(scope="module")
+def dem():
+    rng = np.random.default_rng(1)
+    return (rng.permutation(64).reshape(8, 8) + rng.random((8, 8)) * 0.5).astype(np.float64)
+
+
+def lue_result(lfr, operation, *arrays):
+    """Run a LUE operation on arrays created from NumPy and return the result as a NumPy array."""
+    @lfr.runtime_scope
+    def run():
+        return np.array(lfr.to_numpy(operation(*[lfr.from_numpy(array, PARTITION_SHAPE) if isinstance(array, np.ndarray)
+                                                 else array for array in arrays])))
+    return run()
+
+
+def test_parity_focal_sum(lfr, dem):
+    for kernel in (NEIGHBOURS, NORTH, np.ones((3, 3), dtype=np.uint8)):
+        np.testing.assert_allclose(lue_result(lfr, lambda array: lfr.focal_sum(array, kernel), dem),
+                                   nfr.focal_sum(dem, kernel), rtol=1e-12)
+
+
+def test_parity_zonal_sum(lfr, dem):
+    zones = (np.arange(64).reshape(8, 8) % 3).astype(np.uint8)
+    np.testing.assert_allclose(lue_result(lfr, lfr.zonal_sum, dem, zones), nfr.zonal_sum(dem, zones), rtol=1e-12)
+
+
+def test_parity_d8_flow_direction(lfr, dem):
+    np.testing.assert_array_equal(lue_result(lfr, lfr.d8_flow_direction, dem), nfr.d8_flow_direction(dem))
+
+
+def test_parity_upstream_downstream(lfr, dem):
+    ldd = nfr.d8_flow_direction(dem)
+    np.testing.assert_allclose(lue_result(lfr, lfr.upstream, ldd, dem), nfr.upstream(ldd, dem), rtol=1e-12)
+    np.testing.assert_allclose(lue_result(lfr, lfr.downstream, ldd, dem), nfr.downstream(ldd, dem), rtol=1e-12)
+
+
+def test_parity_kinematic_wave(lfr, dem):
+    ldd       = nfr.d8_flow_direction(dem)
+    discharge = dem / 64
+    inflow    = np.full(dem.shape, 1E-4)
+    channel   = np.full(dem.shape, 5.0)
+    np.testing.assert_allclose(lue_result(lfr, lambda *arrays: lfr.kinematic_wave(*arrays[:3], 1.7, 0.6, 1.0, arrays[3]),
+                                          ldd, discharge, inflow, channel),
+                               nfr.kinematic_wave(ldd, discharge, inflow, 1.7, 0.6, 1.0, channel), rtol=1e-6)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Tests of the preparation of the input rasters and their cache. Skipped if GDAL is not installed.
+
+@author: steven.hosper
+"""
+
+import os
+import types
+import numpy as np
+import pytest
+
+gdal = pytest.importorskip("osgeo.gdal")
+
+from PrepareInputs import PrepareInputs
+
+
+def configuration(input_dir, cache_dir, **settings):
+    return types.SimpleNamespace(generalSettings = {"inputDir": input_dir, "scenario": "", "cacheDir": cache_dir,
+                                                    **settings},
+                                 modelSettings   = {"partitionExtent": "16"})
+
+
+def write_raster(file_name, array):
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    dataset = gdal.GetDriverByName("GTiff").Create(file_name, array.shape[1], array.shape[0], 1, gdal.GDT_Float32)
+    dataset.SetGeoTransform([0, 1, 0, 0, 0, -1])
+    dataset.GetRasterBand(1).WriteArray(array)
+    dataset = None
+
+
+def read_raster(file_name):
+    return gdal.Open(file_name).GetRasterBand(1).ReadAsArray()
+
+
+def test_shared_cache_separates_inputs_with_the_same_name(tmp_path):
+    """Two scenarios with their own /ldd.tiff and /soil.tiff share the cache directory, neither reuses the other's cache."""
+    cache_dir = str(tmp_path / "cache")
+    arrays    = {"a": np.full((16, 16), 5.0), "b": np.full((16, 16), 2.0)}
+    classes   = {"a": np.full((16, 16), 1.0), "b": np.full((16, 16), 300.0)}
+    for scenario in arrays:
+        write_raster(str(tmp_path / scenario / "ldd.tiff"), arrays[scenario])
+        write_raster(str(tmp_path / scenario / "soil.tiff"), classes[scenario])
+
+    for scenario in arrays:
+        prepare_inputs = PrepareInputs(configuration(str(tmp_path / scenario), cache_dir))
+        ldd            = prepare_inputs.ldd("/ldd.tiff")
+        soil, ids      = prepare_inputs.classes("/soil.tiff")
+        np.testing.assert_array_equal(read_raster(ldd), arrays[scenario])
+        np.testing.assert_array_equal(read_raster(soil), classes[scenario])
+        assert ids == [int(classes[scenario][0, 0])]
+        # A second preparation uses the cache
+        assert prepare_inputs.ldd("/ldd.tiff") == ldd
+        assert prepare_inputs.classes("/soil.tiff") == (soil, ids)
+    assert len([name for name in os.listdir(cache_dir) if name.startswith("ldd_")]) == 2
+
+
+
+def test_overview_levels_separated_by_commas(tmp_path):
+    prepare_inputs = PrepareInputs(configuration(str(tmp_path), str(tmp_path / "cache"), overviewLevels = "2,4, 8"))
+    assert prepare_inputs.overview_levels == [2, 4, 8]
+    assert PrepareInputs(configuration(str(tmp_path), str(tmp_path / "cache"), overviewLevels = "")).overview_levels == []
+
+
+def test_source_of_configured_and_saved_rasters(tmp_path):
+    """Configured paths start with '/' and are relative to the scenario, saved states are existing absolute paths."""
+    prepare_inputs = PrepareInputs(configuration(str(tmp_path / "input"), str(tmp_path / "cache")))
+    saved          = str(tmp_path / "states" / "gw_s.tiff")
+    write_raster(saved, np.zeros((16, 16)))
+    assert prepare_inputs.source("/ini_gw.tiff") == str(tmp_path / "input") + "/ini_gw.tiff"
+    assert prepare_inputs.source(saved) == saved
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Tests of the choice of the partition extent from the drainage network. Skipped if GDAL is not installed.
+
+@author: steven.hosper
+"""
+
+import os
+import types
+import numpy as np
+import pytest
+
+gdal = pytest.importorskip("osgeo.gdal")
+
+from Subcatchments import resolve_partition_extent
+
+
+def configuration(input_dir, partition_extent):
+    return types.SimpleNamespace(generalSettings = {"inputDir": input_dir, "scenario": "", "cacheDir": ""},
+                                 modelSettings   = {"partitionExtent": partition_extent, "arrayExtent": "128"},
+                                 dataSettings    = {"ldd": "/ldd.tiff"})
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    """An LDD of 128 x 128 cells that drains east, to the pits in the last column."""
+    ldd = np.full((128, 128), 6, dtype=np.uint8)
+    ldd[:, -1] = 5
+    dataset = gdal.GetDriverByName("GTiff").Create(str(tmp_path / "ldd.tiff"), 128, 128, 1, gdal.GDT_Byte)
+    dataset.SetGeoTransform([0, 1, 0, 0, 0, -1])
+    dataset.GetRasterBand(1).WriteArray(ldd)
+    dataset = None
+    return str(tmp_path)
+
+
+def test_fixed_extent(input_dir):
+    assert resolve_partition_extent(configuration(input_dir, "32"), 4, 2) == 32
+
+
+def test_auto_extent_is_chosen_once(input_dir):
+    config = configuration(input_dir, "auto")
+    extent = resolve_partition_extent(config, 4)
+    assert config.modelSettings["partitionExtent"] == str(extent)
+    assert any(name.startswith("partition_extent_") for name in os.listdir(os.path.join(input_dir, "cache")))
+    # Every locality of a distributed run uses the cached choice
+    assert resolve_partition_extent(configuration(input_dir, "auto"), 4, 2) == extent
+
+
+def test_auto_extent_on_localities_needs_the_cached_choice(input_dir):
+    with pytest.raises(Exception, match="chosen beforehand"):
+        resolve_partition_extent(configuration(input_dir, "auto"), 8, 2)
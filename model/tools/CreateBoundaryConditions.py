@@ -1,33 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Derive (or refresh) the cached domain and catchment edge masks of the DEM of a configuration, outside of a model run.
+Replaces the PCRaster windowtotal on a fixed map, the masks are created with LUE focal operations by Boundary.
+
+@author: steven.hosper
+"""
+
 import lue.framework as lfr
-import pcraster as pcr
-import configuration as config
 import numpy as np
 import os
 import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configuration_v2 import Configuration
+from Boundary import Boundary
+from PrepareInputs import PrepareInputs
+from Subcatchments import resolve_partition_extent
 
 usage = """\
-Run the main model of the hydrologic base model.
+Derive the domain and catchment edge masks of the DEM of a configuration.
 
 Usage:
-    {command}
+    {command} --config=path [--rebuild]
 
 Options:
     {command} : --hpx:thread = integer;
-                The integer is the amount of cores used during the model run.
+                The integer is the amount of cores used to derive the masks.
 """.format(
     command=os.path.basename(sys.argv[0])
 )
 
+
+def option(name, default = None):
+    for argument in sys.argv[1:]:
+        if argument.startswith(f"--{name}="):
+            return argument.split("=", 1)[1]
+    return default
+
+
 @lfr.runtime_scope
-def main():
-    # Load raster
-    dem = pcr.readmap("C:/Users/steven.hosper/Desktop/Mapje Stage/data/De Hupsel5/v2/demPCR.map")
-    
-    # Set all values to 1
-    dem = (dem * 0) + 1
-    demSum = pcr.windowtotal(dem, 9)
-    pcr.report(dem, "C:/Users/steven.hosper/Desktop/Mapje Stage/data/De Hupsel5/v2/test.tiff")
-    pcr.report(demSum, "C:/Users/steven.hosper/Desktop/Mapje Stage/data/De Hupsel5/v2/test2.tiff")
+def main(configuration, rebuild):
+    start_time      = time.time()
+    # Only the root locality runs main, partitionExtent = auto is resolved there
+    threads         = option("hpx:threads", "")
+    resolve_partition_extent(configuration, int(threads) if threads.isdigit() else os.cpu_count() or 1)
+    boundary        = Boundary(configuration)
+    partition_shape = 2 * (int(configuration.modelSettings['partitionExtent']),)
+
+    dem = lfr.from_gdal(PrepareInputs(configuration).tiled(configuration.dataSettings['dem']), partition_shape)
+    boundary.initialize(dem >= 0.1, rebuild)
+
+    for name, mask in (("domain edge", boundary.domain_edge), ("catchment edge", boundary.catchment_edge)):
+        print(f"{name} cells: {int(lfr.sum(lfr.cast(mask, np.float64)).get())}")
+    print(f"seconds: {time.time() - start_time}")
+    for file_name in boundary.cache_files().values():
+        print(f"mask: {file_name}")
+
 
 cfg = [
     # Make sure hpx_main is always executed
@@ -44,5 +75,8 @@ cfg = [
 
 lfr.start_hpx_runtime(cfg)
 
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+if lfr.on_root_locality():
+    if option("config") is None:
+        sys.exit(usage)
+
+    main(Configuration(option("config")), "--rebuild" in sys.argv)
@@ -9,28 +9,35 @@ import osgeo.gdal as gdal
 import os.path
 import sys
 import datetime
+from Scheduler import Scheduler
 
 class makeGIF:
     def __init__(self):
         pass
     
-    def slice_pathname(pathname, idx, date):
-        date = date + datetime.timedelta(minutes=idx)
+    def slice_pathname(pathname, idx, date, interval = 60):
+        date = date + datetime.timedelta(seconds=idx * interval)
         date_time = date.strftime("%Y-%m-%d-%H%M")
         return "{}_{}.tiff".format(pathname, date_time)
 
 
-    def read_raster(raster_pathname, idx, dateTime):
-        dataset = gdal.Open(makeGIF.slice_pathname(raster_pathname, idx, dateTime))
-        return np.array(dataset.GetRasterBand(1).ReadAsArray())
+    def read_raster(raster_pathname, idx, dateTime, interval = 60, overview_level = 1):
+        dataset = gdal.Open(makeGIF.slice_pathname(raster_pathname, idx, dateTime, interval))
+        band = dataset.GetRasterBand(1)
+        # Read the overview of the level (for example 4: a quarter of the resolution) if the raster has it
+        for i in range(band.GetOverviewCount() if overview_level > 1 else 0):
+            if round(band.XSize / band.GetOverview(i).XSize) == overview_level:
+                band = band.GetOverview(i)
+                break
+        return np.array(band.ReadAsArray())
 
 
-    def create_animation(raster_pathname, nr_rasters, animation_pathname, vmin, vmax, date, FPS):
+    def create_animation(raster_pathname, nr_rasters, animation_pathname, vmin, vmax, date, FPS, interval = 60, overview_level = 1):
         with iio.get_writer(animation_pathname, mode="i", fps = FPS) as writer:
             for i in range(nr_rasters + 1):
                 figure, axis = plt.subplots(figsize=(10, 10))
                 axis.set_axis_off()
-                data = makeGIF.read_raster(raster_pathname, i, date)
+                data = makeGIF.read_raster(raster_pathname, i, date, interval, overview_level)
                 image = rasterio.plot.show(
                     data,
                     ax=axis,
@@ -82,6 +89,8 @@ def run(configuration):
     nr_rasters  = int(configuration.gifSettings['nrRasters'])
     timestep    = int(configuration.modelSettings['timestep'])
     fps         = int(configuration.gifSettings['fps'])
+    interval    = Scheduler(configuration).intervals["report"]
+    overview_level = int(configuration.gifSettings.get('overviewLevel', '1'))
     assert nr_rasters >= 0
     
     # Create animations
@@ -93,4 +102,4 @@ def run(configuration):
         vmin = vmin_dict[var]
         vmax = vmax_dict[var]
         
-        makeGIF.create_animation(raster_pathname, nr_rasters, animation_pathname, vmin, vmax, start_date, fps)
\ No newline at end of file
+        makeGIF.create_animation(raster_pathname, nr_rasters, animation_pathname, vmin, vmax, start_date, fps, interval, overview_level)
\ No newline at end of file
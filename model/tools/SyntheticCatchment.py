@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Generate a synthetic catchment (DEM, LDD, soil and land-use maps with their conversion tables)
+that can be used for benchmarks without the data of De Hupsel.
+
+@author: steven.hosper
+"""
+
+import os
+import sys
+import numpy as np
+from osgeo import gdal
+
+usage = """\
+Generate a synthetic catchment.
+
+Usage:
+    {command} directory extent [resolution]
+""".format(
+    command=os.path.basename(sys.argv[0])
+)
+
+# Conversion tables, in the same layout as soil_conversion.csv and landuse_conversion_v2.csv
+SOIL_TABLE = "ID,Ks\n1,0.5\n2,0.05\n3,0.01\n"
+LAND_USE_TABLE = "Code,Friction,Permeability,Interception,LAI,f,Crop_type\n" \
+                 "1,0.035,0.9,0.0005,1.0,0.95,1\n" \
+                 "2,0.100,0.7,0.0020,4.0,0.70,1\n" \
+                 "3,0.015,0.1,0.0001,0.0,1.00,1\n"
+
+
+def dem(extent, resolution):
+    """A V-shaped valley that slopes towards the outlet at the bottom center of the array."""
+    rows, cols = np.indices((extent, extent), dtype=np.float64)
+    center = extent // 2
+    return 30.0 + 0.002 * resolution * (extent - 1 - rows) + 0.01 * resolution * np.abs(cols - center)
+
+
+def ldd(extent):
+    """The LDD matching the valley: cells drain towards the center column, which drains south to a single pit."""
+    cols = np.indices((extent, extent))[1]
+    center = extent // 2
+    ldd = np.full((extent, extent), 2, dtype=np.uint8)
+    ldd[cols < center] = 6
+    ldd[cols > center] = 4
+    ldd[-1, center] = 5
+    return ldd
+
+
+def soil(extent):
+    """Three soil types in bands along the valley."""
+    rows = np.indices((extent, extent))[0]
+    return (1 + (3 * rows) // extent).astype(np.uint8)
+
+
+def land_use(extent):
+    """Land use alternating in blocks, with paved cells along the valley bottom."""
+    rows, cols = np.indices((extent, extent))
+    block = max(extent // 10, 1)
+    land_use = (1 + ((rows // block + cols // block) % 2)).astype(np.uint8)
+    land_use[:, extent // 2] = 3
+    return land_use
+
+
+def write_tiff(file_name, array, resolution):
+    data_type = gdal.GDT_Byte if array.dtype == np.uint8 else gdal.GDT_Float64
+    driver = gdal.GetDriverByName("GTiff")
+    dataset = driver.Create(file_name, array.shape[1], array.shape[0], 1, data_type)
+    dataset.SetGeoTransform((0.0, resolution, 0.0, array.shape[0] * resolution, 0.0, -resolution))
+    dataset.GetRasterBand(1).WriteArray(array)
+    dataset.FlushCache()
+    dataset = None
+
+
+def generate(directory, extent, resolution = 5.0, partition_extent = None):
+    """Write a synthetic catchment to directory.
+
+    Args:
+        directory (path):       directory that is used as inputDir, the rasters are written to directory/synthetic
+        extent (int):           amount of cells along both axes
+        resolution (float):     cell size in meters
+        partition_extent (int): partition extent of the run, defaults to the array extent
+
+    Returns:
+        overrides (dict): configuration overrides {(section, option): value} to run the model on the catchment
+    """
+    scenario = "synthetic"
+    os.makedirs(os.path.join(directory, scenario), exist_ok=True)
+
+    write_tiff(os.path.join(directory, scenario, "dem.tiff"), dem(extent, resolution), resolution)
+    write_tiff(os.path.join(directory, scenario, "ldd.tiff"), ldd(extent), resolution)
+    write_tiff(os.path.join(directory, scenario, "soil.tiff"), soil(extent), resolution)
+    write_tiff(os.path.join(directory, scenario, "landuse.tiff"), land_use(extent), resolution)
+
+    with open(os.path.join(directory, "soil_conversion.csv"), "w") as f:
+        f.write(SOIL_TABLE)
+    with open(os.path.join(directory, "landuse_conversion.csv"), "w") as f:
+        f.write(LAND_USE_TABLE)
+
+    return {("generalSettings", "inputDir"):        directory.rstrip("/") + "/",
+            ("generalSettings", "scenario"):        scenario,
+            ("modelSettings", "arrayExtent"):       extent,
+            ("modelSettings", "partitionExtent"):   partition_extent or extent,
+            ("modelSettings", "resolution"):        resolution,
+            ("modelSettings", "groundWaterBase"):   29.0,
+            ("modelSettings", "validCellsPercentage"): 100,
+            ("dataSettings", "dem"):                "/dem.tiff",
+            ("dataSettings", "ldd"):                "/ldd.tiff",
+            ("dataSettings", "soilMap"):            "/soil.tiff",
+            ("dataSettings", "landUseMap"):         "/landuse.tiff",
+            ("dataSettings", "soilData"):           "/soil_conversion.csv",
+            ("dataSettings", "landUseData"):        "/landuse_conversion.csv",
+            }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit(usage)
+
+    overrides = generate(sys.argv[1], int(sys.argv[2]), float(sys.argv[3]) if len(sys.argv) > 3 else 5.0)
+    for (section, option), value in overrides.items():
+        print(f"[{section}] {option} = {value}")
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Run the model for many scenarios (catchments) or configurations at once. The runs are scheduled over a pool
+of workers, every worker runs HBM.py in its own process with a bounded amount of HPX threads. The largest runs
+(estimated by cells times routing steps) are started first, so the pool stays busy until the end of the batch.
+The timing and a summary of the outflow of every run are collected in one table.
+
+@author: steven.hosper
+"""
+
+import argparse
+import concurrent.futures
+import configparser
+import csv
+import datetime
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from benchmark import MODEL_DIR, DEFAULT_CONFIG, write_config, run_model
+import OutflowLog
+
+usage = """\
+Run a batch of scenarios.
+
+Usage:
+    {command} --scenarios "De Hupsel5" "Other catchment" [--config=path] [--threads=2] [--workers=4]
+    {command} --batch=runs.ini [--threads=2] [--workers=4]
+
+runs.ini has a section per run, with an optional base config and the options to override as section.option:
+    [Hupsel wet]
+    config                   = ../config/config.ini
+    generalSettings.scenario = De Hupsel5
+    modelSettings.endDate    = 2023, 4, 8, 12, 30, 0
+
+Relative paths in runs.ini are relative to runs.ini, relative directories of a base config are relative to the
+model directory, where the model runs.
+""".format(
+    command=os.path.basename(sys.argv[0])
+)
+
+# Directories of a configuration, they are made absolute before the configuration of a run is written
+PATH_OPTIONS = [("generalSettings", "inputDir"), ("generalSettings", "outputDir"), ("generalSettings", "cacheDir"),
+                ("generalSettings", "sharedStatics"), ("generalSettings", "stateDir")]
+
+COLUMNS = ["run", "scenario", "cells", "steps", "wall_time", "peak_rss", "return_code",
+           "peak_outflow", "peak_time", "outflow_volume"]
+
+
+def read_batch(file_name, default_config):
+    """The runs of a batch file as {label: (config, {(section, option): value})}."""
+    batch = configparser.ConfigParser()
+    batch.optionxform = str
+    batch.read(file_name)
+    runs = {}
+    for label in batch.sections():
+        options = dict(batch.items(label))
+        config  = options.pop("config", default_config)
+        if not os.path.isabs(config):
+            config = os.path.join(os.path.dirname(os.path.abspath(file_name)), config)
+        overrides = {}
+        for option, value in options.items():
+            section, _, name = option.partition(".")
+            if not section or not name:
+                raise Exception(f"Error: Invalid option '{option}' of run '{label}' in {file_name}, use section.option")
+            overrides[(section, name)] = value
+        runs[label] = (config, absolute_paths(overrides, os.path.dirname(os.path.abspath(file_name))))
+    return runs
+
+
+def absolute_path(path, directory):
+    """The path relative to directory as an absolute path, with the trailing separator of a directory kept because
+    the scenario is appended to inputDir and outputDir. Empty paths stay empty (the option is off)."""
+    if not path.strip():
+        return path
+    absolute = os.path.abspath(os.path.join(directory, path))
+    return absolute + "/" if path.endswith(("/", "\\")) else absolute
+
+
+def absolute_paths(overrides, directory):
+    """The overrides with the directories of PATH_OPTIONS made absolute against directory."""
+    return {key: absolute_path(str(value), directory) if key in PATH_OPTIONS else value for key, value in overrides.items()}
+
+
+def settings(config_file, overrides):
+    """The configuration of a run, with the overrides applied."""
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    config.read(config_file)
+    for (section, option), value in overrides.items():
+        if not config.has_section(section):
+            config.add_section(section)
+        config.set(section, option, str(value))
+    return config
+
+
+def estimated_cost(config):
+    """Cells of the DEM (from the header of the raster, or arrayExtent) and the amount of routing steps of a run."""
+    dem = config.get("generalSettings", "inputDir") + config.get("generalSettings", "scenario") + config.get("dataSettings", "dem")
+    try:
+        from osgeo import gdal
+        dataset = gdal.Open(dem)
+        cells = dataset.RasterXSize * dataset.RasterYSize
+    except Exception:
+        cells = int(config.get("modelSettings", "arrayExtent")) ** 2
+
+    start_date = datetime.datetime(*map(int, config.get("modelSettings", "startDate").split(", ")))
+    end_date   = datetime.datetime(*map(int, config.get("modelSettings", "endDate").split(", ")))
+    steps = int((end_date - start_date).total_seconds() / float(config.get("modelSettings", "timestep")))
+    return cells, steps
+
+
+def outflow_summary(output_dir):
+    """Peak outflow, the time of the peak (s) and the total outflow volume, from the summary of the outflow log."""
+    try:
+        outflow = OutflowLog.read_summary(output_dir)
+    except (OSError, ValueError):
+        return {"peak_outflow": float("nan"), "peak_time": float("nan"), "outflow_volume": float("nan")}
+    return {"peak_outflow": outflow["maximum"], "peak_time": outflow["maximum_time"], "outflow_volume": outflow["volume"]}
+
+
+def output_dir(config):
+    return config.get("generalSettings", "outputDir") + config.get("generalSettings", "scenario")
+
+
+def run(label, config_file, overrides, threads, run_config):
+    """Run a single scenario and return its row of the summary table."""
+    config = settings(config_file, overrides)
+    cells, steps = estimated_cost(config)
+    os.makedirs(output_dir(config), exist_ok=True)
+
+    write_config(config_file, {**overrides, ("generalSettings", "makeGIF"): False}, run_config)
+    result = run_model(run_config, threads)
+    return {"run": label, "scenario": config.get("generalSettings", "scenario"), "cells": cells, "steps": steps,
+            **{key: result[key] for key in ("wall_time", "peak_rss", "return_code")},
+            **outflow_summary(output_dir(config))}
+
+
+def run_batch(runs, threads, workers, work_dir):
+    """Run all runs {label: (config, overrides)} over the workers, the largest runs first (longest processing time first).
+
+    Returns:
+        rows (list):    the summary of every run, in the order of the batch
+    """
+    # The model runs in the model directory, every directory of a run is passed to it as an absolute path
+    work_dir = os.path.abspath(work_dir)
+    resolved = {}
+    for label, (config_file, overrides) in runs.items():
+        config      = settings(config_file, overrides)
+        directories = {key: config.get(*key) for key in PATH_OPTIONS if config.has_option(*key)}
+        resolved[label] = (config_file, {**overrides, **absolute_paths(directories, MODEL_DIR)})
+    runs = resolved
+
+    costs, output_dirs = {}, {}
+    for label, (config_file, overrides) in runs.items():
+        config = settings(config_file, overrides)
+        cells, steps = estimated_cost(config)
+        costs[label] = cells * steps
+        if output_dir(config) in output_dirs.values():
+            raise Exception(f"Error: Run '{label}' writes to the same output directory as another run, set generalSettings.outputDir")
+        output_dirs[label] = output_dir(config)
+
+    order = sorted(runs, key=lambda label: costs[label], reverse=True)
+    print(f"Running {len(runs)} runs on {workers} workers with {threads} threads each")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {label: pool.submit(run, label, *runs[label], threads, os.path.join(work_dir, f"run_{count}.ini"))
+                   for count, label in enumerate(order)}
+        for future in concurrent.futures.as_completed(futures.values()):
+            row = future.result()
+            print(f"Done: {row['run']} in {row['wall_time']:.1f} s (exit {row['return_code']})")
+    return [futures[label].result() for label in runs]
+
+
+def print_table(rows):
+    print(f"\n{'run':<30}{'cells':>12}{'steps':>9}{'wall time (s)':>15}{'peak RSS (MB)':>15}{'exit':>6}"
+          f"{'peak outflow':>15}{'peak time (s)':>15}{'volume (m3)':>15}")
+    for row in rows:
+        print(f"{row['run']:<30}{row['cells']:>12}{row['steps']:>9}{row['wall_time']:>15.2f}{row['peak_rss']:>15.1f}"
+              f"{row['return_code']:>6}{row['peak_outflow']:>15.4g}{row['peak_time']:>15.0f}{row['outflow_volume']:>15.4g}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the model for a batch of scenarios over a pool of workers.",
+                                     epilog=usage, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="base configuration of the runs")
+    parser.add_argument("--scenarios", nargs="+", default=[], help="scenarios (catchment directories) to run")
+    parser.add_argument("--batch", default=None, help="ini file with a section per run")
+    parser.add_argument("--threads", type=int, default=2, help="HPX threads of every run")
+    parser.add_argument("--workers", type=int, default=None, help="runs at the same time, defaults to cores / threads")
+    parser.add_argument("--summary", default=None, help="write the summary table to this csv file")
+    parser.add_argument("--work-dir", default=None, help="directory for the configurations of the runs")
+    parser.add_argument("--shared-statics", default=None,
+                        help="runs with the same inputs share their static arrays through this directory (sharedStatics)")
+    arguments = parser.parse_args()
+
+    runs = {scenario: (arguments.config, {("generalSettings", "scenario"): scenario}) for scenario in arguments.scenarios}
+    if arguments.batch:
+        runs.update(read_batch(arguments.batch, arguments.config))
+    if not runs:
+        sys.exit(usage)
+    if arguments.shared_statics:
+        runs = {label: (config, {**overrides, ("generalSettings", "sharedStatics"): os.path.abspath(arguments.shared_statics)})
+                for label, (config, overrides) in runs.items()}
+
+    workers  = arguments.workers or max(1, (os.cpu_count() or 1) // arguments.threads)
+    work_dir = os.path.abspath(arguments.work_dir or tempfile.mkdtemp(prefix="hbm_batch_"))
+    os.makedirs(work_dir, exist_ok=True)
+    rows = run_batch(runs, arguments.threads, workers, work_dir)
+    print_table(rows)
+
+    if arguments.summary:
+        with open(arguments.summary, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\nSummary: {arguments.summary}")
+
+
+if __name__ == "__main__":
+    main()
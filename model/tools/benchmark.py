@@ -0,0 +1,453 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Benchmarks of the HydrologicBaseModel. Every run starts HBM.py in its own process with a
+temporary copy of the configuration, so the wall time and peak memory are measured per run.
+
+@author: steven.hosper
+"""
+
+import argparse
+import configparser
+import datetime
+import math
+import os
+import sys
+import subprocess
+import tempfile
+import time
+
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, MODEL_DIR)
+sys.path.insert(0, os.path.join(MODEL_DIR, "tools"))
+
+import compareOutputs
+import SyntheticCatchment
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(MODEL_DIR), "config", "config.ini")
+
+
+def write_config(base_config, overrides, file_name):
+    """Write a copy of base_config in which the overrides {(section, option): value} are set."""
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    config.read(base_config)
+    for (section, option), value in overrides.items():
+        if not config.has_section(section):
+            config.add_section(section)
+        config.set(section, option, str(value))
+    with open(file_name, "w") as f:
+        config.write(f)
+    return file_name
+
+
+def run_script(script, arguments, capture = False):
+    """Run a script of the model in its own process and return the wall time (s) and peak resident memory (MB).
+    If capture is set, the standard output is returned as well."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(MODEL_DIR, script), *arguments], cwd=MODEL_DIR,
+                               stdout=subprocess.PIPE if capture else subprocess.DEVNULL, text=True)
+    output = process.stdout.read() if capture else ""
+    if hasattr(os, "wait4"):
+        # wait4 gives the resource usage of this single child, ru_maxrss is in kB on Linux and bytes on macOS
+        _, status, usage = os.wait4(process.pid, 0)
+        return_code = os.waitstatus_to_exitcode(status)
+        peak_rss = usage.ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+    else:
+        return_code = process.wait()
+        peak_rss = float("nan")
+    return {"wall_time": time.perf_counter() - start, "peak_rss": peak_rss, "return_code": return_code, "output": output}
+
+
+def run_model(config_file, threads, extra_args = ()):
+    """Run HBM.py with config_file and return the wall time (s) and peak resident memory (MB) of the run."""
+    return run_script("HBM.py", [f"--config={config_file}", f"--hpx:threads={threads}", *extra_args])
+
+
+def output_value(output, name):
+    """The value of a 'name: value' line printed by a script."""
+    for line in output.splitlines():
+        if line.startswith(f"{name}: "):
+            return line.split(": ", 1)[1]
+    return None
+
+
+def prepare_run(work_dir, label, base_config, overrides):
+    """Write the configuration of a single run, with its own output directory."""
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    config.read(base_config)
+    scenario = overrides.get(("generalSettings", "scenario"), config.get("generalSettings", "scenario"))
+
+    output_dir = os.path.join(work_dir, label, "output") + "/"
+    os.makedirs(output_dir + scenario, exist_ok=True)
+    overrides = {**overrides, ("generalSettings", "outputDir"): output_dir, ("generalSettings", "makeGIF"): False}
+    config_file = write_config(base_config, overrides, os.path.join(work_dir, label, "config.ini"))
+    return config_file, output_dir + scenario
+
+
+def simulation_period(arguments):
+    """Shorten the simulated period of the configuration to the requested amount of minutes."""
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    config.read(arguments.config)
+    start_date = datetime.datetime(*map(int, config.get("modelSettings", "startDate").split(", ")))
+    end_date   = start_date + datetime.timedelta(minutes = arguments.minutes)
+    return {("modelSettings", "endDate"): end_date.strftime("%Y, %m, %d, %H, %M, %S")}
+
+
+def base_overrides(arguments, work_dir):
+    """Use a synthetic catchment if requested, otherwise the input data of the configuration."""
+    overrides = simulation_period(arguments)
+    if arguments.synthetic:
+        overrides.update(SyntheticCatchment.generate(os.path.join(work_dir, "input"), arguments.synthetic,
+                                                     partition_extent = arguments.partition_extent))
+    return overrides
+
+
+def print_runs(runs):
+    print(f"{'run':<45}{'wall time (s)':>15}{'peak RSS (MB)':>15}{'exit':>6}")
+    for label, result in runs.items():
+        print(f"{label:<45}{result['wall_time']:>15.2f}{result['peak_rss']:>15.1f}{result['return_code']:>6}")
+
+
+def precision(arguments, work_dir):
+    """Compare the speed, memory and results of the float32 and float64 precision modes."""
+    overrides = base_overrides(arguments, work_dir)
+    modes = {"float64 parameters/state": ("float64", "float64"),
+             "float32 parameters":       ("float32", "float64"),
+             "float32 parameters/state": ("float32", "float32"),
+             }
+
+    runs, output_dirs = {}, {}
+    for count, (label, (parameter_precision, state_precision)) in enumerate(modes.items()):
+        config_file, output_dirs[label] = prepare_run(work_dir, f"precision_{count}", arguments.config,
+                                                      {**overrides,
+                                                       ("modelSettings", "parameterPrecision"): parameter_precision,
+                                                       ("modelSettings", "statePrecision"):     state_precision})
+        runs[label] = run_model(config_file, arguments.threads)
+    print_runs(runs)
+
+    # Validation, the float64 run is the reference
+    reference = next(iter(output_dirs.values()))
+    for label, output_dir in list(output_dirs.items())[1:]:
+        print(f"\nChange in results of '{label}' compared to the float64 run:")
+        print(compareOutputs.summarise(compareOutputs.compare_directories(reference, output_dir)).to_string(index=False))
+    return runs
+
+
+def ldd(arguments, work_dir):
+    """Compare the parallel LUE LDD pipeline (D8 with pit filling) with PCRaster lddcreate on the same DEM."""
+    import numpy as np
+    from osgeo import gdal
+
+    overrides = base_overrides(arguments, work_dir)
+    runs, ldd_files = {}, {}
+    for method in ("lue", "pcraster"):
+        config_file, _ = prepare_run(work_dir, f"ldd_{method}", arguments.config,
+                                     {**overrides, ("generalSettings", "lddMethod"): method})
+        runs[method] = run_script(os.path.join("tools", "createLDD.py"),
+                                  [f"--config={config_file}", f"--method={method}", "--rebuild",
+                                   f"--hpx:threads={arguments.threads}"], capture=True)
+        ldd_files[method] = output_value(runs[method]["output"], "LDD")
+    print_runs(runs)
+
+    if None in ldd_files.values():
+        print("\nNot all LDDs were created, see the output of the runs.")
+        return runs
+    lue_ldd, pcraster_ldd = (gdal.Open(ldd_files[method]).GetRasterBand(1).ReadAsArray() for method in ("lue", "pcraster"))
+    print(f"\nCells with the same direction:  {100 * np.mean(lue_ldd == pcraster_ldd):.2f}%")
+    print(f"Pits lue / pcraster:            {np.count_nonzero(lue_ldd == 5)} / {np.count_nonzero(pcraster_ldd == 5)}")
+    return runs
+
+
+def scaling(arguments, work_dir):
+    """Strong and weak scaling over localities on synthetic catchments.
+
+    Strong scaling runs the same catchment on more localities, weak scaling grows the catchment with the
+    localities so every locality keeps the same amount of cells. Localities are started on this machine,
+    the peak RSS reported for these runs is that of the launcher only.
+    """
+    extent           = arguments.synthetic or 1000
+    partition_extent = arguments.partition_extent or extent // 4
+    runs = {}
+    for mode in ("strong", "weak"):
+        for localities in arguments.localities:
+            if mode == "strong":
+                mode_extent = extent
+            else:
+                mode_extent = partition_extent * max(1, round(extent * math.sqrt(localities) / partition_extent))
+            overrides = {**simulation_period(arguments),
+                         **SyntheticCatchment.generate(os.path.join(work_dir, f"input_{mode_extent}"), mode_extent,
+                                                       partition_extent = partition_extent)}
+            label = f"{mode} {localities} localities ({mode_extent}x{mode_extent})"
+            config_file, _ = prepare_run(work_dir, f"scaling_{mode}_{localities}", arguments.config, overrides)
+            runs[label] = run_script(os.path.join("tools", "launchLocalities.py"),
+                                     [f"--localities={localities}", f"--threads={arguments.threads}", "--",
+                                      f"--config={config_file}"])
+            runs[label].update(mode = mode, localities = localities)
+    print_runs(runs)
+
+    print(f"\n{'run':<45}{'speedup':>10}{'efficiency':>12}")
+    for mode in ("strong", "weak"):
+        mode_runs = [run for run in runs.items() if run[1]["mode"] == mode]
+        reference = mode_runs[0][1]
+        for label, result in mode_runs:
+            speedup = reference["wall_time"] / result["wall_time"]
+            if mode == "strong":
+                efficiency = speedup * reference["localities"] / result["localities"]
+            else:
+                efficiency = speedup
+            print(f"{label:<45}{speedup:>10.2f}{efficiency:>12.2f}")
+    return runs
+
+
+def groundwater(arguments, work_dir):
+    """Speedup of the implicit groundwater solver at several intervals against the explicit solver, and its accuracy
+    against an implicit run at a small interval. The explicit solver flows along the steepest gradient (D8), a
+    different discretization, so the differences with it are not errors of the implicit step."""
+    overrides = base_overrides(arguments, work_dir)
+    reference = f"implicit {arguments.groundwater_reference} s (reference)"
+    solvers = {"explicit": {("modelSettings", "groundWaterSolver"): "explicit"},
+               reference:  {("modelSettings", "groundWaterSolver"): "implicit",
+                            ("modelSettings", "groundWaterInterval"): arguments.groundwater_reference}}
+    for interval in arguments.groundwater_intervals:
+        solvers[f"implicit {interval} s"] = {("modelSettings", "groundWaterSolver"): "implicit",
+                                             ("modelSettings", "groundWaterInterval"): interval}
+
+    runs, output_dirs = {}, {}
+    for count, (label, solver) in enumerate(solvers.items()):
+        config_file, output_dirs[label] = prepare_run(work_dir, f"groundwater_{count}", arguments.config,
+                                                      {**overrides, **solver})
+        runs[label] = run_model(config_file, arguments.threads)
+    print_runs(runs)
+
+    explicit = runs["explicit"]["wall_time"]
+    for label, output_dir in list(output_dirs.items())[2:]:
+        print(f"\n'{label}': speedup {explicit / runs[label]['wall_time']:.2f} compared to the explicit solver, "
+              f"change compared to '{reference}':")
+        print(compareOutputs.summarise(compareOutputs.compare_directories(output_dirs[reference], output_dir)).to_string(index=False))
+    return runs
+
+
+def backend_overrides(arguments):
+    """The backends that are compared, the numpy backend with and without compiled kernels if requested."""
+    backends = {"lue":   {("generalSettings", "backend"): "lue"},
+                "numpy": {("generalSettings", "backend"): "numpy", ("generalSettings", "jitKernels"): False}}
+    if arguments.jit:
+        backends["numpy jit"] = {("generalSettings", "backend"): "numpy", ("generalSettings", "jitKernels"): True}
+    return backends
+
+
+def backends(arguments, work_dir):
+    """Parity of the numpy backend with the LUE backend: the same run on both, the change in results is reported."""
+    overrides = base_overrides(arguments, work_dir)
+    runs, output_dirs = {}, {}
+    for count, (label, backend) in enumerate(backend_overrides(arguments).items()):
+        config_file, output_dirs[label] = prepare_run(work_dir, f"backends_{count}", arguments.config,
+                                                      {**overrides, **backend})
+        runs[label] = run_model(config_file, arguments.threads)
+    print_runs(runs)
+
+    for label, output_dir in list(output_dirs.items())[1:]:
+        print(f"\nChange in results of '{label}' compared to the lue backend:")
+        print(compareOutputs.summarise(compareOutputs.compare_directories(output_dirs["lue"], output_dir)).to_string(index=False))
+    return runs
+
+
+def crossover(arguments, work_dir):
+    """Wall time of the backends on synthetic catchments of increasing extent, to find where each backend wins."""
+    runs, times = {}, {}
+    for extent in arguments.extents:
+        overrides = {**simulation_period(arguments),
+                     **SyntheticCatchment.generate(os.path.join(work_dir, f"input_{extent}"), extent,
+                                                   partition_extent = arguments.partition_extent)}
+        for label, backend in backend_overrides(arguments).items():
+            config_file, _ = prepare_run(work_dir, f"crossover_{extent}_{label.replace(' ', '_')}", arguments.config,
+                                         {**overrides, **backend})
+            runs[f"{label} ({extent}x{extent})"] = run_model(config_file, arguments.threads)
+            times[(extent, label)] = runs[f"{label} ({extent}x{extent})"]["wall_time"]
+    print_runs(runs)
+
+    labels = list(backend_overrides(arguments))
+    print(f"\n{'extent':<10}" + "".join(f"{label + ' (s)':>15}" for label in labels) + f"{'fastest':>15}")
+    for extent in arguments.extents:
+        fastest = min(labels, key=lambda label: times[(extent, label)])
+        print(f"{extent:<10}" + "".join(f"{times[(extent, label)]:>15.2f}" for label in labels) + f"{fastest:>15}")
+    return runs
+
+
+def routing_allocations(update_type, extent, steps):
+    """Run time and transient memory of routing steps with the numpy backend, measured in this process with tracemalloc.
+
+    Returns:
+        seconds (float):        run time of a routing step
+        temporaries (float):    peak memory allocated during a step on top of the state, in full-size arrays
+    """
+    import tracemalloc
+    import types
+    import numpy as np
+    from Backend import lfr
+    from Routing import Routing
+
+    lfr.select("numpy")
+    configuration = types.SimpleNamespace(modelSettings={"timestep": "1", "routingUpdate": update_type})
+    ones = np.ones((extent, extent))
+    routing = Routing(configuration)
+    routing.prepare(SyntheticCatchment.ldd(extent), ones * 1E-20, ones * 0.3, ones * 5, ones * 5, ones * 0.35, 10.0)
+    gw_s, height = np.linspace(8, 11, extent * extent).reshape(extent, extent), ones * 1E-3
+    gw_flux, sw_flux = ones * 1E-3, ones * 1E-4
+
+    # The first step allocates the buffers and the flow network
+    gw_s, height, discharge = routing.update(gw_s, height, gw_flux, sw_flux)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for _ in range(steps):
+        gw_s, height, discharge = routing.update(gw_s, height, gw_flux, sw_flux)
+    seconds = (time.perf_counter() - start) / steps
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, (peak - baseline) / ones.nbytes
+
+
+def routing(arguments, work_dir):
+    """Wall time and peak memory of the reference and fused routing update, on both backends, and the temporary
+    arrays created by a routing step (numpy backend)."""
+    from Routing import ROUTING_UPDATES
+
+    overrides = base_overrides(arguments, work_dir)
+    runs = {}
+    for backend in ("lue", "numpy"):
+        for update_type in ROUTING_UPDATES:
+            config_file, _ = prepare_run(work_dir, f"routing_{backend}_{update_type}", arguments.config,
+                                         {**overrides, ("generalSettings", "backend"): backend,
+                                          ("modelSettings", "routingUpdate"): update_type})
+            runs[f"{backend} {update_type}"] = run_model(config_file, arguments.threads)
+    print_runs(runs)
+
+    extent = arguments.synthetic or 500
+    print(f"\n{'routing update':<20}{'s per step':>12}{'temporaries':>14}   (numpy backend, {extent}x{extent})")
+    for update_type in ROUTING_UPDATES:
+        seconds, temporaries = routing_allocations(update_type, extent, 10)
+        print(f"{update_type:<20}{seconds:>12.4f}{temporaries:>14.1f}")
+    return runs
+
+
+def partitions(arguments, work_dir):
+    """Routing throughput of square tilings against the tiling chosen from the drainage network (partitionExtent = auto),
+    with the flow paths each tiling cuts and the chain of partitions the kinematic wave has to follow."""
+    import types
+    from Subcatchments import Subcatchments
+
+    overrides   = base_overrides(arguments, work_dir)
+    config_file = write_config(arguments.config, overrides, os.path.join(work_dir, "partitions.ini"))
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    config.read(config_file)
+    subcatchments = Subcatchments(types.SimpleNamespace(**{section: dict(config.items(section)) for section in config.sections()}))
+    subcatchments.initialize(SyntheticCatchment.ldd(arguments.synthetic) if arguments.synthetic else None)
+
+    labels, downstream = subcatchments.decompose()
+    print(f"{len(downstream)} subcatchments of at most {subcatchments.target_cells} cells, "
+          f"the longest chain of subcatchments draining into each other is {subcatchments.tree_depth(downstream)}\n")
+
+    extents = arguments.partition_extents or subcatchments.candidate_extents()[:6]
+    metrics = {extent: subcatchments.partition_metrics(extent, arguments.threads) for extent in extents}
+    runs = {}
+    for extent in [*extents, "auto"]:
+        config_file, _ = prepare_run(work_dir, f"partitions_{extent}", arguments.config,
+                                     {**overrides, ("modelSettings", "partitionExtent"): extent})
+        runs[f"partitionExtent {extent}"] = run_model(config_file, arguments.threads)
+    print_runs(runs)
+
+    print(f"\n{'partition extent':<20}{'partitions':>12}{'crossings':>12}{'chain':>8}{'est. cost':>12}{'wall time (s)':>15}")
+    for extent, metric in metrics.items():
+        print(f"{extent:<20}{metric['partitions']:>12}{metric['crossings']:>12}{metric['chain']:>8}"
+              f"{metric['cost']:>12.3g}{runs[f'partitionExtent {extent}']['wall_time']:>15.2f}")
+    print(f"{'auto':<20}{'':>44}{runs['partitionExtent auto']['wall_time']:>15.2f}")
+    return runs
+
+
+def startup_phases(output):
+    """The phases and seconds of the startup profile printed by HBM.py --profile-startup."""
+    phases, in_profile = {}, False
+    for line in output.splitlines():
+        if line.startswith("startup phase"):
+            in_profile = True
+        elif in_profile and line.strip():
+            phase, seconds = line.rsplit(None, 1)
+            phases[phase.strip()] = float(seconds)
+        elif in_profile:
+            break
+    return phases
+
+
+def startup(arguments, work_dir):
+    """Startup time of loading the static inputs one after the other and concurrently (concurrentInputs), every run
+    prepares the inputs in its own empty cache directory."""
+    overrides = base_overrides(arguments, work_dir)
+    modes = {"sequential inputs": False, "concurrent inputs": True}
+
+    runs, phases = {}, {}
+    for count, (label, concurrent) in enumerate(modes.items()):
+        config_file, _ = prepare_run(work_dir, f"startup_{count}", arguments.config,
+                                     {**overrides,
+                                      ("generalSettings", "concurrentInputs"): concurrent,
+                                      ("generalSettings", "cacheDir"): os.path.join(work_dir, f"startup_{count}", "cache") + "/"})
+        runs[label] = run_script("HBM.py", [f"--config={config_file}", f"--hpx:threads={arguments.threads}",
+                                            "--profile-startup"], capture = True)
+        phases[label] = startup_phases(runs[label]["output"])
+    print_runs(runs)
+
+    names = ["prepare and load static inputs", "parameters and LDD", "initial conditions", "total"]
+    print(f"\n{'startup phase (s)':<35}" + "".join(f"{label:>20}" for label in modes))
+    for name in names:
+        print(f"{name:<35}" + "".join(f"{phases[label].get(name, math.nan):>20.3f}" for label in modes))
+    sequential, concurrent = (sum(phases[label].get(name, 0.0) for name in names[:3]) for label in modes)
+    if concurrent > 0:
+        print(f"\nLoading the static inputs concurrently: speedup {sequential / concurrent:.2f}")
+    return runs
+
+
+CASES = {"precision": precision,
+         "ldd": ldd,
+         "scaling": scaling,
+         "groundwater": groundwater,
+         "backends": backends,
+         "crossover": crossover,
+         "routing": routing,
+         "partitions": partitions,
+         "startup": startup,
+         }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the HydrologicBaseModel.")
+    parser.add_argument("case", choices=CASES.keys())
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="configuration used as base for every run")
+    parser.add_argument("--threads", type=int, default=4, help="amount of HPX threads per run")
+    parser.add_argument("--synthetic", type=int, default=0, help="run on a synthetic catchment of this extent")
+    parser.add_argument("--partition-extent", type=int, default=None, help="partition extent of the synthetic catchment")
+    parser.add_argument("--work-dir", default=None, help="directory for the inputs and outputs of the runs")
+    parser.add_argument("--minutes", type=int, default=10, help="simulated minutes of every run")
+    parser.add_argument("--localities", type=int, nargs="+", default=[1, 2, 4], help="localities of the scaling runs")
+    parser.add_argument("--groundwater-intervals", type=int, nargs="+", default=[60, 900, 3600],
+                        help="intervals (s) of the implicit groundwater runs")
+    parser.add_argument("--groundwater-reference", type=int, default=60,
+                        help="interval (s) of the implicit run the accuracy of the groundwater runs is measured against")
+    parser.add_argument("--extents", type=int, nargs="+", default=[250, 500, 1000, 2000],
+                        help="extents of the synthetic catchments of the crossover runs")
+    parser.add_argument("--partition-extents", type=int, nargs="+", default=None,
+                        help="square tilings of the partitions runs, by default the largest candidate extents")
+    parser.add_argument("--jit", action="store_true", help="also run the numpy backend with compiled kernels (numba)")
+    arguments = parser.parse_args()
+
+    work_dir = arguments.work_dir or tempfile.mkdtemp(prefix="hbm_benchmark_")
+    print(f"Benchmark '{arguments.case}', runs are stored in: {work_dir}\n")
+    CASES[arguments.case](arguments, work_dir)
+
+
+if __name__ == "__main__":
+    main()
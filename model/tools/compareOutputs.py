@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Compare the output rasters and the outflow of two model runs, to validate that a change of
+the model (for example a different precision) does not change the results beyond a tolerance.
+
+@author: steven.hosper
+"""
+
+import os
+import sys
+import glob
+import numpy as np
+import pandas as pd
+from osgeo import gdal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import OutflowLog
+
+usage = """\
+Compare the outputs of two model runs.
+
+Usage:
+    {command} reference_directory candidate_directory
+""".format(
+    command=os.path.basename(sys.argv[0])
+)
+
+
+def read_raster(file_name):
+    dataset = gdal.Open(file_name)
+    return dataset.GetRasterBand(1).ReadAsArray().astype(np.float64)
+
+
+def statistics(reference, candidate):
+    """Differences between two arrays, all accumulated in float64.
+
+    Returns:
+        max_abs_error (float):  largest absolute difference of a single value
+        rmse (float):           root mean squared difference
+        sum_delta (float):      difference of the totals, for rasters in storage units this is the mass balance delta
+    """
+    reference = np.asarray(reference, dtype=np.float64)
+    candidate = np.asarray(candidate, dtype=np.float64)
+    difference = candidate - reference
+    return {"max_abs_error": float(np.nanmax(np.abs(difference))) if difference.size else 0.0,
+            "rmse":          float(np.sqrt(np.nanmean(difference ** 2))) if difference.size else 0.0,
+            "sum_delta":     float(np.nansum(candidate) - np.nansum(reference)),
+            }
+
+
+def has_outflow(output_dir):
+    return any(os.path.isfile(os.path.join(output_dir, name)) for name in (OutflowLog.LOG_FILE, OutflowLog.LEGACY_FILE))
+
+
+def compare_directories(reference_dir, candidate_dir):
+    """Compare every raster and the outflow of the reference run with the candidate run.
+
+    Returns:
+        table (pandas DataFrame): one row per output file with the statistics of the difference
+    """
+    rows = []
+    for reference_file in sorted(glob.glob(os.path.join(reference_dir, "*.tiff"))):
+        name = os.path.basename(reference_file)
+        candidate_file = os.path.join(candidate_dir, name)
+        if not os.path.isfile(candidate_file):
+            rows.append({"file": name, "missing": True})
+            continue
+        rows.append({"file": name, "missing": False,
+                     **statistics(read_raster(reference_file), read_raster(candidate_file))})
+
+    # The outflow log (or the maximumDischarge.csv of older runs)
+    if has_outflow(reference_dir):
+        if has_outflow(candidate_dir):
+            reference = OutflowLog.read_series(reference_dir)[1]
+            candidate = OutflowLog.read_series(candidate_dir)[1]
+            length = min(len(reference), len(candidate))
+            rows.append({"file": "outflow", "missing": len(reference) != len(candidate),
+                         **statistics(reference[:length], candidate[:length])})
+        else:
+            rows.append({"file": "outflow", "missing": True})
+
+    return pd.DataFrame(rows, columns=["file", "missing", "max_abs_error", "rmse", "sum_delta"])
+
+
+def summarise(table):
+    """Reduce the table of compare_directories to one row per variable, the files of a run are named {timestep}_{variable}_{datetime}.tiff"""
+    table = table.copy()
+    table["variable"] = [name.split("_", 1)[1].rsplit("_", 1)[0] if name.endswith(".tiff") else name
+                         for name in table["file"]]
+    return table.groupby("variable").agg(files         = ("file", "count"),
+                                         missing       = ("missing", "sum"),
+                                         max_abs_error = ("max_abs_error", "max"),
+                                         rmse          = ("rmse", "max"),
+                                         sum_delta     = ("sum_delta", lambda delta: delta.abs().max()),
+                                         ).reset_index()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit(usage)
+
+    table = compare_directories(sys.argv[1], sys.argv[2])
+    print(summarise(table).to_string(index=False))
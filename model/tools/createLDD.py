@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Create (or refresh) the cached LDD of the DEM of a configuration, outside of a model run.
+Replaces pcrLDD.py, the PCRaster path is still available with --method=pcraster.
+
+@author: steven.hosper
+"""
+
+import lue.framework as lfr
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configuration_v2 import Configuration
+from GenerateLDD import GenerateLDD
+from PrepareInputs import PrepareInputs
+from Subcatchments import resolve_partition_extent
+from StandardArraysLUE import StandardArraysLUE
+
+usage = """\
+Create the LDD of the DEM of a configuration.
+
+Usage:
+    {command} --config=path [--method=lue|pcraster] [--rebuild]
+
+Options:
+    {command} : --hpx:thread = integer;
+                The integer is the amount of cores used to create the LDD.
+""".format(
+    command=os.path.basename(sys.argv[0])
+)
+
+
+def option(name, default = None):
+    for argument in sys.argv[1:]:
+        if argument.startswith(f"--{name}="):
+            return argument.split("=", 1)[1]
+    return default
+
+
+@lfr.runtime_scope
+def main(configuration, rebuild):
+    start_time      = time.time()
+    # Only the root locality runs main, partitionExtent = auto is resolved there
+    threads         = option("hpx:threads", "")
+    resolve_partition_extent(configuration, int(threads) if threads.isdigit() else os.cpu_count() or 1)
+    generate_ldd    = GenerateLDD(configuration)
+    partition_shape = 2 * (int(configuration.modelSettings['partitionExtent']),)
+
+    dem = lfr.from_gdal(PrepareInputs(configuration).tiled(configuration.dataSettings['dem']), partition_shape)
+    dem = lfr.cast(dem, StandardArraysLUE(configuration).state_dtype)
+    dem = lfr.where(dem < 0.1, 35, dem)
+
+    ldd = generate_ldd.ldd(configuration.dataSettings['dem'], dem, rebuild)
+    pits = lfr.sum(lfr.cast(ldd == 5, StandardArraysLUE(configuration).accumulation_dtype)).get()
+    print(f"pits: {int(pits)}")
+    print(f"seconds: {time.time() - start_time}")
+    print(f"LDD: {generate_ldd.cache_file(generate_ldd.prepare_inputs.input_dir + configuration.dataSettings['dem'])}")
+
+
+cfg = [
+    # Make sure hpx_main is always executed
+    "hpx.run_hpx_main!=1",
+    # Allow for unknown command line options
+    "hpx.commandline.allow_unknown!=1",
+    # Disable HPX' short options
+    "hpx.commandline.aliasing!=0",
+    # Don't print diagnostics during forced terminate
+    "hpx.diagnostics_on_terminate!=1",
+    # Make AGAS clean up resources faster than by default
+    "hpx.agas.max_pending_refcnt_requests!=50",
+]
+
+lfr.start_hpx_runtime(cfg)
+
+if lfr.on_root_locality():
+    if option("config") is None:
+        sys.exit(usage)
+
+    configuration = Configuration(option("config"))
+    if option("method"):
+        configuration.generalSettings['lddMethod'] = option("method")
+    main(configuration, "--rebuild" in sys.argv)
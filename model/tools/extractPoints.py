@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Extract the time series of the reported rasters at points (gauges, wells) from the outputs of a run.
+The output files are indexed once by variable and date, for every file only the blocks that contain a
+point are read, and the files are read by a pool of threads (GDAL releases the GIL while reading).
+The result is a tidy table with one row per point, variable and date.
+
+@author: steven.hosper
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import glob
+import os
+import sys
+import numpy as np
+import pandas as pd
+from osgeo import gdal
+
+usage = """\
+Extract time series at points from the reported rasters of a run.
+
+Usage:
+    {command} output_directory points.csv [--variables discharge gw_s] [--pixel] [--threads=8] [--output=series.csv] [--wide]
+
+points.csv has a header and a row per point with a name and the map coordinates (or with --pixel the column and row):
+    name,x,y
+    outlet,247390.0,456120.0
+""".format(
+    command=os.path.basename(sys.argv[0])
+)
+
+INDEX_FILE = "output_index.csv"
+
+
+def parse_name(file_name):
+    """Variable and date of a reported raster, the rasters are named {timestep}_{variable}_{%Y-%m-%d-%H%M}.tiff"""
+    name = os.path.basename(file_name)[:-len(".tiff")]
+    variable, date = name.split("_", 1)[1].rsplit("_", 1)
+    return variable, datetime.datetime.strptime(date, "%Y-%m-%d-%H%M")
+
+
+def index_outputs(output_dir):
+    """Table of the reported rasters (variable, date, file), stored in the output directory and only
+    rebuilt when rasters are added or removed after the index was written."""
+    index_file = os.path.join(output_dir, INDEX_FILE)
+    if os.path.isfile(index_file) and os.path.getmtime(index_file) >= os.path.getmtime(output_dir):
+        return pd.read_csv(index_file, parse_dates=["date"])
+
+    rows = []
+    for file_name in glob.glob(os.path.join(output_dir, "*.tiff")):
+        try:
+            variable, date = parse_name(file_name)
+        except ValueError:
+            continue
+        rows.append({"variable": variable, "date": date, "file": os.path.basename(file_name)})
+    index = pd.DataFrame(rows, columns=["variable", "date", "file"]).sort_values(["variable", "date"], ignore_index=True)
+    index.to_csv(index_file, index=False)
+    return index
+
+
+def read_points(file_name, pixel = False):
+    """Points of a csv file with the columns name, x and y."""
+    points = pd.read_csv(file_name, skipinitialspace=True)
+    missing = {"name", "x", "y"} - set(points.columns)
+    if missing:
+        raise Exception(f"Error: {file_name} misses the columns: {', '.join(sorted(missing))}")
+    points["name"] = points["name"].astype(str)
+    if pixel:
+        points["x"] = points["x"].astype(int)
+        points["y"] = points["y"].astype(int)
+    return points
+
+
+def pixel_locations(file_name, points, pixel = False):
+    """Column and row of every point in the grid of the raster, points outside the grid are dropped."""
+    dataset = gdal.Open(file_name)
+    if pixel:
+        columns, rows = points["x"].to_numpy(), points["y"].to_numpy()
+    else:
+        origin_x, width, _, origin_y, _, height = dataset.GetGeoTransform()
+        columns = np.floor((points["x"].to_numpy() - origin_x) / width).astype(int)
+        rows    = np.floor((points["y"].to_numpy() - origin_y) / height).astype(int)
+
+    inside = (columns >= 0) & (columns < dataset.RasterXSize) & (rows >= 0) & (rows < dataset.RasterYSize)
+    for name in points["name"][~inside]:
+        print(f"Point {name} is outside of the grid and skipped")
+    return points["name"][inside].tolist(), columns[inside], rows[inside]
+
+
+def block_groups(file_name, columns, rows):
+    """Indices of the points per block of the raster {(block column, block row): [point indices]}."""
+    block_x, block_y = gdal.Open(file_name).GetRasterBand(1).GetBlockSize()
+    groups = {}
+    for i, (column, row) in enumerate(zip(columns, rows)):
+        groups.setdefault((column // block_x, row // block_y), []).append(i)
+    return (block_x, block_y), groups
+
+
+def read_values(file_name, columns, rows, block_size, groups):
+    """Values of the points in one raster, every block that contains a point is read once."""
+    band = gdal.Open(file_name).GetRasterBand(1)
+    no_data = band.GetNoDataValue()
+    values = np.full(len(columns), np.nan)
+    for (block_column, block_row), indices in groups.items():
+        x_offset, y_offset = block_column * block_size[0], block_row * block_size[1]
+        x_size = min(block_size[0], band.XSize - x_offset)
+        y_size = min(block_size[1], band.YSize - y_offset)
+        block = band.ReadAsArray(int(x_offset), int(y_offset), int(x_size), int(y_size))
+        values[indices] = block[rows[indices] - y_offset, columns[indices] - x_offset]
+    if no_data is not None:
+        values[values == no_data] = np.nan
+    return values
+
+
+def extract(output_dir, points, variables = None, pixel = False, threads = 8):
+    """Time series of the variables at the points.
+
+    Args:
+        output_dir (str):           output directory of a run (outputDir + scenario)
+        points (pandas DataFrame):  name, x and y of every point
+        variables (list):           variables to extract, all reported variables by default
+        pixel (bool):               x and y of the points are the column and row instead of map coordinates
+        threads (int):              rasters that are read at the same time
+
+    Returns:
+        series (pandas DataFrame):  one row per point, variable and date with the value
+    """
+    index = index_outputs(output_dir)
+    if variables:
+        index = index[index["variable"].isin(variables)]
+    if index.empty:
+        raise Exception(f"Error: No reported rasters of {', '.join(variables or ['any variable'])} in {output_dir}")
+
+    # All reported rasters share the grid and tiling of the model
+    files = [os.path.join(output_dir, file_name) for file_name in index["file"]]
+    names, columns, rows = pixel_locations(files[0], points, pixel)
+    block_size, groups = block_groups(files[0], columns, rows)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        values = list(executor.map(lambda file_name: read_values(file_name, columns, rows, block_size, groups), files))
+
+    return pd.DataFrame({"point":    np.tile(names, len(files)),
+                         "variable": np.repeat(index["variable"].to_numpy(), len(names)),
+                         "date":     np.repeat(index["date"].to_numpy(), len(names)),
+                         "value":    np.concatenate(values) if values else []})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract time series at points from the reported rasters of a run.",
+                                     epilog=usage, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output_dir", help="output directory of the run (outputDir + scenario)")
+    parser.add_argument("points", help="csv file with the name, x and y of every point")
+    parser.add_argument("--variables", nargs="+", default=None, help="variables to extract, all by default")
+    parser.add_argument("--pixel", action="store_true", help="x and y of the points are the column and row")
+    parser.add_argument("--threads", type=int, default=8, help="rasters that are read at the same time")
+    parser.add_argument("--output", default=None, help="write the series to this csv file")
+    parser.add_argument("--wide", action="store_true", help="one column per point and variable instead of a tidy table")
+    arguments = parser.parse_args()
+
+    series = extract(arguments.output_dir, read_points(arguments.points, arguments.pixel),
+                     arguments.variables, arguments.pixel, arguments.threads)
+    if arguments.wide:
+        series = series.pivot_table(index="date", columns=["point", "variable"], values="value")
+
+    if arguments.output:
+        series.to_csv(arguments.output, index=arguments.wide)
+        print(f"{len(series)} rows written to {arguments.output}")
+    else:
+        print(series.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Run a cycle of a rolling forecast. Every member starts from its latest saved state at or before the issue time
+(a hot start), simulates the forcing up to the issue time and the forecast period after it, and saves its state
+at the issue time for the next cycle. A cycle therefore only simulates the time since the previous cycle plus the
+forecast period. The members run in parallel over a pool of workers and share their static arrays.
+
+@author: steven.hosper
+"""
+
+import argparse
+import configparser
+import datetime
+import os
+import sys
+import tempfile
+import types
+
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, MODEL_DIR)
+sys.path.insert(0, os.path.join(MODEL_DIR, "tools"))
+
+from benchmark import DEFAULT_CONFIG
+from batchRun import read_batch, run_batch, print_table
+from StateStore import StateStore, CONFIG_DATE
+
+usage = """\
+Run a forecast cycle.
+
+Usage:
+    {command} [--config=path] [--issue="2023, 4, 7, 12, 0, 0"] [--lead-hours=48] [--members=members.ini]
+
+members.ini has a section per member with the options to override as section.option, for example its forcing:
+    [member 1]
+    dataSettings.precipitationData = De Hupsel5/forecast/precipitation_member1.csv
+
+Without --members a single member (control) runs with the configuration itself. Members without a saved state
+start cold at the startDate of the configuration.
+""".format(
+    command=os.path.basename(sys.argv[0])
+)
+
+
+def parse_date(date_string):
+    return datetime.datetime(*map(int, date_string.split(",")))
+
+
+def settings(config_file):
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    config.read(config_file)
+    return config
+
+
+def member_run(label, config_file, overrides, issue, lead_hours, state_dir, output_dir):
+    """The configuration overrides of a member for the cycle: its start state, the simulated period, the state
+    to save and its output directory.
+
+    Returns:
+        overrides (dict):   {(section, option): value}
+        start (datetime):   valid time the member starts from
+        hot (bool):         True if the member starts from a saved state
+    """
+    config   = settings(config_file)
+    for (section, option), value in overrides.items():
+        if not config.has_section(section):
+            config.add_section(section)
+        config.set(section, option, str(value))
+    store_dir = os.path.join(state_dir, label)
+    config.set("generalSettings", "stateDir", store_dir)
+    store     = StateStore(types.SimpleNamespace(**{section: dict(config.items(section)) for section in config.sections()}))
+
+    start = store.nearest(issue)
+    hot   = start is not None
+    if not hot:
+        start = parse_date(config.get("modelSettings", "startDate"))
+        if start > issue:
+            raise Exception(f"Error: Member '{label}' has no saved state and its startDate is after the issue time {issue}")
+
+    overrides = {**overrides,
+                 ("generalSettings", "stateDir"):      store_dir,
+                 ("generalSettings", "sharedStatics"): os.path.join(state_dir, "statics"),
+                 ("generalSettings", "outputDir"):     os.path.join(output_dir, label) + "/",
+                 ("modelSettings", "startDate"):       start.strftime(CONFIG_DATE),
+                 ("modelSettings", "endDate"):         (issue + datetime.timedelta(hours = lead_hours)).strftime(CONFIG_DATE),
+                 ("modelSettings", "saveStates"):      issue.strftime(CONFIG_DATE),
+                 }
+    if hot:
+        overrides.update({("dataSettings", option): file_name for option, file_name in store.ini_settings(start).items()})
+    return overrides, start, hot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a cycle of a rolling forecast.",
+                                     epilog=usage, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="base configuration of the members")
+    parser.add_argument("--issue", default=None,
+                        help="issue time of the cycle, 'Y, m, d, H, M, S', defaults to now rounded down to the cycle")
+    parser.add_argument("--cycle-hours", type=int, default=6, help="hours between the cycles, used for the default issue time")
+    parser.add_argument("--lead-hours", type=float, default=48, help="hours simulated after the issue time")
+    parser.add_argument("--members", default=None, help="ini file with a section of overrides per member")
+    parser.add_argument("--state-dir", default=None, help="store of the states, defaults to forecast_states in the outputDir")
+    parser.add_argument("--threads", type=int, default=2, help="HPX threads of every member")
+    parser.add_argument("--workers", type=int, default=None, help="members at the same time, defaults to cores / threads")
+    parser.add_argument("--work-dir", default=None, help="directory for the configurations of the members")
+    arguments = parser.parse_args()
+
+    if arguments.issue:
+        issue = parse_date(arguments.issue)
+    else:
+        now   = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+        issue = now.replace(hour=now.hour - now.hour % arguments.cycle_hours)
+
+    # The model runs in the model directory, the directories of the configuration are relative to it
+    base       = settings(arguments.config)
+    base_dir   = os.path.join(MODEL_DIR, base.get("generalSettings", "outputDir") + base.get("generalSettings", "scenario"))
+    state_dir  = os.path.abspath(arguments.state_dir) if arguments.state_dir else os.path.join(base_dir, "forecast_states")
+    output_dir = os.path.join(base_dir, f"forecast_{issue.strftime('%Y%m%dT%H%M')}")
+    members    = read_batch(arguments.members, arguments.config) if arguments.members else {"control": (arguments.config, {})}
+
+    runs = {}
+    print(f"Forecast cycle issued at {issue}, {arguments.lead_hours} hours ahead")
+    for label, (config_file, overrides) in members.items():
+        overrides, start, hot = member_run(label, config_file, overrides, issue, arguments.lead_hours, state_dir, output_dir)
+        runs[label] = (config_file, overrides)
+        simulated = (issue - start).total_seconds() / 3600 + arguments.lead_hours
+        print(f"{label}: {'hot start from the state of' if hot else 'cold start at'} {start}, {simulated:.1f} hours simulated")
+
+    workers  = arguments.workers or max(1, (os.cpu_count() or 1) // arguments.threads)
+    work_dir = os.path.abspath(arguments.work_dir or tempfile.mkdtemp(prefix="hbm_forecast_"))
+    os.makedirs(work_dir, exist_ok=True)
+    print_table(run_batch(runs, arguments.threads, workers, work_dir))
+    print(f"\nOutputs: {output_dir}\nStates:  {state_dir}")
+
+
+if __name__ == "__main__":
+    main()
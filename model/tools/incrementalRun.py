@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Incremental re-simulation of a scenario in which the rasters of a small area changed (land use, soil, ...).
+The changed cells are found by comparing the raster inputs with those of a previous run, the affected region
+is everything downstream of them through the LDD plus a buffer for the lateral groundwater flow. Only a square
+window around that region is simulated, with the discharge entering the window from upstream taken from the
+reported discharge of the previous run as boundary inflow.
+
+The window is simulated twice, with the previous and with the changed inputs, and only the difference between
+both runs is added to the outputs of the previous run. The effects of the edges of the window (closed groundwater,
+flow leaving the window) are the same in both runs and cancel, so the merged outputs only change where the
+change has an effect. The boundary inflow is only known per report interval, which is the main approximation.
+
+@author: steven.hosper
+"""
+
+import argparse
+import glob
+import hashlib
+import math
+import os
+import re
+import shutil
+import sys
+import tempfile
+import numpy as np
+from osgeo import gdal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from benchmark import write_config, run_model
+from extractPoints import index_outputs
+from configuration_v2 import Configuration
+from NumpyBackend import FlowNetwork
+import OutflowLog
+
+usage = """\
+Re-simulate only the region affected by changed inputs.
+
+Usage:
+    {command} --config=changed.ini --previous=previous.ini [--buffer=10] [--threads=4] [--output=dir] [--work-dir=path]
+
+previous.ini is the configuration of the run whose outputs are reused, changed.ini differs from it only in
+raster inputs (dataSettings) or in the contents of those rasters.
+""".format(
+    command=os.path.basename(sys.argv[0])
+)
+
+# Settings that may differ between the previous and the changed configuration
+LOCATIONS = {("generalSettings", "inputDir"), ("generalSettings", "outputDir"), ("generalSettings", "scenario"),
+             ("generalSettings", "cacheDir"), ("generalSettings", "makeGIF")}
+BOUNDARY_INFLOW = "/boundary/inflow_%Y-%m-%d-%H%M.tiff"
+
+
+def scenario_dir(configuration):
+    return configuration.generalSettings['inputDir'] + configuration.generalSettings['scenario']
+
+
+def output_dir(configuration):
+    return configuration.generalSettings['outputDir'] + configuration.generalSettings['scenario']
+
+
+def input_files(configuration, option):
+    """Files of a dataSettings option, relative to the scenario (rasters) or to the input directory (tables).
+    Options with date placeholders give all files of the pattern."""
+    value = configuration.dataSettings.get(option, '')
+    if not value:
+        return {}
+    for base in (scenario_dir(configuration), configuration.generalSettings['inputDir']):
+        pattern = re.sub(r"%[a-zA-Z]", "*", base + value)
+        files = sorted(glob.glob(pattern)) if "%" in value else [base + value] if os.path.isfile(base + value) else []
+        if files:
+            return {file_name[len(base):]: (base, file_name) for file_name in files}
+    return {}
+
+
+def read_raster(file_name, extent):
+    """The array of a raster with the grid of the model, or None for other files."""
+    dataset = gdal.Open(file_name)
+    if dataset is None or (dataset.RasterXSize, dataset.RasterYSize) != (extent, extent):
+        return None
+    return dataset.GetRasterBand(1).ReadAsArray()
+
+
+def file_hash(file_name):
+    sha = hashlib.sha256()
+    with open(file_name, "rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def changed_cells(changed, previous):
+    """Cells in which a raster input differs between the configurations.
+
+    Only raster inputs may differ, other changes (settings, tables, forcing) affect the whole domain.
+    """
+    for section in ("generalSettings", "modelSettings", "dataSettings"):
+        for option in set(getattr(changed, section)) | set(getattr(previous, section)):
+            if (section, option) in LOCATIONS or section == "dataSettings":
+                continue
+            if getattr(changed, section).get(option) != getattr(previous, section).get(option):
+                raise Exception(f"Error: [{section}] {option} differs, the whole domain has to be run again")
+
+    extent = int(changed.modelSettings['arrayExtent'])
+    cells  = np.zeros((extent, extent), dtype=bool)
+    for option in set(changed.dataSettings) | set(previous.dataSettings):
+        changed_files, previous_files = input_files(changed, option), input_files(previous, option)
+        if len(changed_files) == len(previous_files) == 1:
+            # A single file may be replaced by an edited copy with another name
+            pairs = [(next(iter(changed_files.values()))[1], next(iter(previous_files.values()))[1])]
+        elif changed_files.keys() == previous_files.keys():
+            pairs = [(changed_files[name][1], previous_files[name][1]) for name in changed_files]
+        else:
+            raise Exception(f"Error: The files of {option} differ, the whole domain has to be run again")
+        for changed_file, previous_file in pairs:
+            if file_hash(changed_file) == file_hash(previous_file):
+                continue
+            changed_array, previous_array = read_raster(changed_file, extent), read_raster(previous_file, extent)
+            if changed_array is None or previous_array is None:
+                raise Exception(f"Error: {changed_file} is not a raster of the model grid and differs, the whole domain has to be run again")
+            cells |= ~((changed_array == previous_array) | (np.isnan(changed_array) & np.isnan(previous_array))
+                       if np.issubdtype(changed_array.dtype, np.floating) else changed_array == previous_array)
+    return cells
+
+
+def affected_region(network, changed, buffer):
+    """The changed cells, every cell downstream of them and a buffer of cells around those."""
+    affected = changed.ravel().copy()
+    for cells, has_downstream, downstream_cells in network.levels:
+        affected[downstream_cells] |= affected[cells][has_downstream]
+    affected = affected.reshape(changed.shape)
+
+    padded = affected
+    for _ in range(buffer):
+        padded = np.pad(padded, 1)
+        padded = np.max([padded[i:i + affected.shape[0], j:j + affected.shape[1]] for i in range(3) for j in range(3)], axis=0)
+    return padded
+
+
+def window(affected, extent):
+    """Square window (row, column, size) around the affected region. The region already includes the buffer of
+    affected_region, so no further margin is added."""
+    rows, cols = np.nonzero(affected)
+    return bounding_window(rows, cols, 0, extent)
+
+
+def bounding_window(rows, cols, buffer, extent):
+    """Square window (row, column, size) around the cells, with a margin of buffer cells and a size that is a multiple of 16."""
+    first_row, last_row = max(rows.min() - buffer, 0), min(rows.max() + buffer + 1, extent)
+    first_col, last_col = max(cols.min() - buffer, 0), min(cols.max() + buffer + 1, extent)
+    size = min(16 * math.ceil(max(last_row - first_row, last_col - first_col) / 16), extent)
+    return min(first_row, extent - size), min(first_col, extent - size), size
+
+
+def crop(source, destination, offset, extent):
+    """Crop a raster of the model grid to the window, copy any other file."""
+    row, col, size = offset
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    dataset = gdal.Open(source)
+    if dataset is not None and (dataset.RasterXSize, dataset.RasterYSize) == (extent, extent):
+        gdal.Translate(destination, dataset, srcWin=[int(col), int(row), int(size), int(size)])
+    else:
+        shutil.copyfile(source, destination)
+
+
+def window_ldd(file_name):
+    """Cells of the cropped LDD that flow out of the window become pits, so every direction stays inside the array."""
+    dataset = gdal.Open(file_name, gdal.GA_Update)
+    band = dataset.GetRasterBand(1)
+    ldd = band.ReadAsArray()
+    valid = (ldd >= 1) & (ldd <= 9)
+    network = FlowNetwork(np.where(valid, ldd, 0).astype(np.uint8))
+    leaves = valid.ravel() & (network.downstream < 0) & (ldd.ravel() != 5)
+    band.WriteArray(np.where(leaves.reshape(ldd.shape), 5, ldd).astype(ldd.dtype))
+    dataset = None
+
+
+def inflow_sources(network, offset, extent):
+    """Cells outside of the window that drain into it, and the cells inside the window they drain into."""
+    row, col, size = offset
+    rows, cols = np.indices((extent, extent))
+    inside = ((rows >= row) & (rows < row + size) & (cols >= col) & (cols < col + size)).ravel()
+    sources = np.flatnonzero(~inside & (network.downstream >= 0))
+    sources = sources[inside[network.downstream[sources]]]
+    return sources, network.downstream[sources]
+
+
+def write_inflow(template, discharge, sources, targets, offset, extent, output_file):
+    """Write the discharge of the sources as the inflow of the cells of the window they drain into, georeferenced
+    as the window of template (a raster of the model grid)."""
+    row, col, size = offset
+    inflow = np.zeros((size, size))
+    np.add.at(inflow, (targets // extent - row, targets % extent - col), discharge.ravel()[sources])
+
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    window_dataset = gdal.Translate("/vsimem/window.tiff", template, srcWin=[int(col), int(row), int(size), int(size)],
+                                    outputType=gdal.GDT_Float64)
+    output = gdal.GetDriverByName("GTiff").CreateCopy(output_file, window_dataset)
+    output.GetRasterBand(1).WriteArray(inflow)
+    output = window_dataset = None
+    gdal.Unlink("/vsimem/window.tiff")
+
+
+def write_boundary_inflow(previous, network, offset, extent, directory):
+    """Discharge entering the window from upstream cells outside of it, per reported discharge raster of the previous run."""
+    sources, targets = inflow_sources(network, offset, extent)
+    index = index_outputs(output_dir(previous))
+    for date, file_name in index[index["variable"] == "discharge"][["date", "file"]].itertuples(index=False):
+        dataset = gdal.Open(os.path.join(output_dir(previous), file_name))
+        discharge = dataset.GetRasterBand(1).ReadAsArray().astype(np.float64)
+        write_inflow(dataset, discharge, sources, targets, offset, extent, directory + date.strftime(BOUNDARY_INFLOW))
+    return len(sources)
+
+
+def prepare_window_run(configuration, config_file, offset, work_dir, label, boundary_dir):
+    """Crop the inputs of a configuration to the window and write the configuration of the window run."""
+    row, col, size = offset
+    extent = int(configuration.modelSettings['arrayExtent'])
+    input_dir = os.path.join(work_dir, label, "input") + "/"
+    scenario  = configuration.generalSettings['scenario']
+    for option in configuration.dataSettings:
+        for name, (base, source) in input_files(configuration, option).items():
+            destination = (input_dir + scenario if base == scenario_dir(configuration) else input_dir.rstrip("/")) + name
+            crop(source, destination, offset, extent)
+    window_ldd(input_dir + scenario + configuration.dataSettings['ldd'])
+    shutil.copytree(boundary_dir, input_dir + scenario + os.path.dirname(BOUNDARY_INFLOW), dirs_exist_ok=True)
+
+    output = os.path.join(work_dir, label, "output") + "/"
+    os.makedirs(output + scenario, exist_ok=True)
+    partition_extent = configuration.modelSettings['partitionExtent']
+    overrides = {("generalSettings", "inputDir"):           input_dir,
+                 ("generalSettings", "outputDir"):          output,
+                 ("generalSettings", "cacheDir"):           os.path.join(work_dir, label, "cache"),
+                 ("generalSettings", "makeGIF"):            False,
+                 ("modelSettings", "arrayExtent"):          size,
+                 ("modelSettings", "partitionExtent"):      partition_extent if partition_extent == "auto" else min(int(partition_extent), size),
+                 # % is the interpolation character of the configuration files
+                 ("dataSettings", "boundaryInflow"):        BOUNDARY_INFLOW.replace("%", "%%")}
+    return write_config(config_file, overrides, os.path.join(work_dir, label, "config.ini")), output + scenario
+
+
+def merge(previous, changed_dir, reference_dir, offset, merged_dir, configuration):
+    """Add the difference between the changed and the reference window run to the outputs of the previous run."""
+    row, col, size = offset
+    os.makedirs(merged_dir, exist_ok=True)
+    for changed_file in sorted(glob.glob(os.path.join(changed_dir, "*.tiff"))):
+        name = os.path.basename(changed_file)
+        previous_file, reference_file = os.path.join(output_dir(previous), name), os.path.join(reference_dir, name)
+        if not (os.path.isfile(previous_file) and os.path.isfile(reference_file)):
+            continue
+        difference = (gdal.Open(changed_file).GetRasterBand(1).ReadAsArray().astype(np.float64) -
+                      gdal.Open(reference_file).GetRasterBand(1).ReadAsArray().astype(np.float64))
+        output = gdal.GetDriverByName("GTiff").CreateCopy(os.path.join(merged_dir, name), gdal.Open(previous_file))
+        band = output.GetRasterBand(1)
+        band.WriteArray(band.ReadAsArray(int(col), int(row), int(size), int(size)) + difference, int(col), int(row))
+        output = None
+
+    outflow = (np.asarray(OutflowLog.read_series(output_dir(previous))[1]) +
+               OutflowLog.read_series(changed_dir)[1] - OutflowLog.read_series(reference_dir)[1])
+    configuration.generalSettings['outputDir'] = os.path.dirname(merged_dir.rstrip("/")) + "/"
+    configuration.generalSettings['scenario']  = os.path.basename(merged_dir.rstrip("/"))
+    with OutflowLog.OutflowLog(configuration) as outflow_log:
+        outflow_log.extend(outflow)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-simulate only the region affected by changed raster inputs.",
+                                     epilog=usage, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", required=True, help="configuration with the changed inputs")
+    parser.add_argument("--previous", required=True, help="configuration of the previous run, whose outputs are reused")
+    parser.add_argument("--buffer", type=int, default=10, help="cells around the affected region for the lateral groundwater flow")
+    parser.add_argument("--threads", type=int, default=4, help="HPX threads of the window runs")
+    parser.add_argument("--output", default=None, help="directory of the merged outputs, the output directory of --config by default")
+    parser.add_argument("--work-dir", default=None, help="directory for the window runs")
+    arguments = parser.parse_args()
+
+    changed, previous = Configuration(arguments.config), Configuration(arguments.previous)
+    if changed.generalSettings.get('generateLDD', 'False') == 'True' or not changed.dataSettings.get('ldd'):
+        sys.exit("An incremental run needs the LDD as an input raster (dataSettings ldd), not generateLDD.")
+    extent = int(changed.modelSettings['arrayExtent'])
+
+    cells = changed_cells(changed, previous)
+    if not cells.any():
+        sys.exit("The inputs did not change, the outputs of the previous run are valid.")
+    ldd = read_raster(scenario_dir(changed) + changed.dataSettings['ldd'], extent)
+    network  = FlowNetwork(np.where((ldd >= 1) & (ldd <= 9), ldd, 0).astype(np.uint8))
+    affected = affected_region(network, cells, arguments.buffer)
+    offset   = window(affected, extent)
+    print(f"{int(cells.sum())} changed cells, {int(affected.sum())} affected cells, "
+          f"window of {offset[2]}x{offset[2]} cells at row {offset[0]}, column {offset[1]} "
+          f"({100 * offset[2] ** 2 / extent ** 2:.1f}% of the domain)")
+
+    work_dir = arguments.work_dir or tempfile.mkdtemp(prefix="hbm_incremental_")
+    boundary_dir = os.path.join(work_dir, "boundary")
+    print(f"Boundary inflow over {write_boundary_inflow(previous, network, offset, extent, boundary_dir)} flow paths")
+
+    results = {}
+    for label, configuration, config_file in (("reference", previous, arguments.previous), ("changed", changed, arguments.config)):
+        window_config, results[label] = prepare_window_run(configuration, config_file, offset, work_dir, label,
+                                                           boundary_dir + os.path.dirname(BOUNDARY_INFLOW))
+        result = run_model(window_config, arguments.threads)
+        print(f"Window run with the {label} inputs finished in {result['wall_time']:.1f} s with exit code {result['return_code']}")
+        if result["return_code"] != 0:
+            sys.exit(1)
+
+    merged_dir = arguments.output or output_dir(changed)
+    if os.path.abspath(merged_dir) == os.path.abspath(output_dir(previous)):
+        sys.exit("The merged outputs can not replace the outputs of the previous run, set another --output or outputDir.")
+    merge(previous, results["changed"], results["reference"], offset, merged_dir, changed)
+    print(f"Merged outputs: {merged_dir}")
+
+
+if __name__ == "__main__":
+    main()
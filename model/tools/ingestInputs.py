@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Prepare the inputs of a configuration (partition-aligned tiles with overviews, compact LDD and
+class rasters) ahead of a run, so the ingestion of a large domain is not part of the model run.
+
+@author: steven.hosper
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configuration_v2 import Configuration
+from PrepareInputs import PrepareInputs
+from Subcatchments import resolve_partition_extent
+
+usage = """\
+Prepare the input rasters of a configuration.
+
+Usage:
+    {command} config_file [--workers=integer]
+
+With partitionExtent = auto the partition extent is chosen from the LDD for the workers (HPX threads times
+localities of the model run, the cores of this machine by default) and cached, a run on more than one
+locality needs this choice beforehand.
+""".format(
+    command=os.path.basename(sys.argv[0])
+)
+
+
+def run(configuration, workers = None):
+    resolve_partition_extent(configuration, workers or os.cpu_count() or 1)
+    prepare_inputs = PrepareInputs(configuration)
+    data_settings  = configuration.dataSettings
+
+    prepared = {"dem": prepare_inputs.tiled(data_settings['dem']),
+                "ldd": prepare_inputs.ldd(data_settings['ldd']),
+                "landUseMap": prepare_inputs.classes(data_settings['landUseMap'])[0],
+                "soilMap": prepare_inputs.classes(data_settings['soilMap'])[0],
+                }
+    for name in ['iniGroundWaterStorage', 'iniWaterHeight', 'iniInterceptionStorage']:
+        if data_settings.get(name, ''):
+            prepared[name] = prepare_inputs.tiled(data_settings[name])
+    return prepared
+
+
+if __name__ == "__main__":
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith("--workers=")]
+    workers   = [argument.split("=", 1)[1] for argument in sys.argv[1:] if argument.startswith("--workers=")]
+    if len(arguments) != 1 or not all(worker.isdigit() for worker in workers):
+        sys.exit(usage)
+
+    start_time = time.time()
+    for name, file_name in run(Configuration(arguments[0]), int(workers[0]) if workers else None).items():
+        print(f"{name:<25}{file_name}")
+    print("--- %s seconds ---" % (time.time() - start_time))
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Start a script of the model (HBM.py by default) on several HPX localities on this machine, one process
+per locality connected over TCP. The root locality distributes the partitions over all localities,
+which makes it possible to test a multi-locality run without a cluster.
+
+On a cluster the localities are started by the scheduler instead, for example with
+srun / mpirun and the same --hpx:localities and --hpx:node options.
+
+@author: steven.hosper
+"""
+
+import argparse
+import os
+import sys
+import subprocess
+
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def commands(script, script_arguments, localities, threads, host = "127.0.0.1", port = 7910):
+    """The command of every locality, locality 0 is the root and hosts AGAS."""
+    return [[sys.executable, os.path.join(MODEL_DIR, script), *script_arguments,
+             f"--hpx:localities={localities}",
+             f"--hpx:node={node}",
+             f"--hpx:threads={threads}",
+             f"--hpx:agas={host}:{port}",
+             f"--hpx:hpx={host}:{port + node}"]
+            for node in range(localities)]
+
+
+def launch(script, script_arguments, localities, threads, port = 7910, quiet = False):
+    """Start all localities and wait for them, returns the largest exit code."""
+    processes = []
+    for node, command in enumerate(commands(script, script_arguments, localities, threads, port = port)):
+        # Only the root locality prints the progress of the model
+        output = subprocess.DEVNULL if node > 0 or quiet else None
+        processes.append(subprocess.Popen(command, cwd=MODEL_DIR, stdout=output))
+    return max(process.wait() for process in processes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a script of the model on several localities of this machine.")
+    parser.add_argument("--localities", type=int, default=2, help="amount of processes (localities)")
+    parser.add_argument("--threads", type=int, default=1, help="HPX threads per locality")
+    parser.add_argument("--port", type=int, default=7910, help="first TCP port, locality i uses port + i")
+    parser.add_argument("--script", default="HBM.py", help="script relative to the model directory")
+    parser.add_argument("arguments", nargs=argparse.REMAINDER, help="arguments passed to the script, e.g. --config=path")
+    arguments = parser.parse_args()
+
+    script_arguments = [argument for argument in arguments.arguments if argument != "--"]
+    sys.exit(launch(arguments.script, script_arguments, arguments.localities, arguments.threads, arguments.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Coarse-to-fine simulation of a scenario. The model first runs on a grid that is coarser by an integer factor:
+the DEM and continuous rasters are averaged, the class rasters take the most common class, storages (m3 per cell)
+are summed so the volumes are conserved and the LDD is upscaled along the main flow path of every block of cells.
+The reported discharge and groundwater storage of the coarse run flag the regions that need the fine resolution
+(the highest discharges and saturated cells that seep). Only square windows around those regions are run at the
+fine resolution, with the discharge that enters a window taken from the coarse run as boundary inflow.
+
+With --compare the full fine-resolution run is made as well, and the cost (wall time, simulated cells) and the
+accuracy (outflow and the discharge in the windows) of the coarse-to-fine run are reported against it.
+
+@author: steven.hosper
+"""
+
+import argparse
+import math
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+from osgeo import gdal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from benchmark import write_config, run_model
+from extractPoints import index_outputs
+from incrementalRun import (BOUNDARY_INFLOW, scenario_dir, input_files, read_raster, bounding_window,
+                            inflow_sources, write_inflow, prepare_window_run)
+from configuration_v2 import Configuration
+from NumpyBackend import FlowNetwork, LDD_OFFSETS
+from PrepareInputs import LDD_NO_DATA
+import OutflowLog
+
+usage = """\
+Run a scenario on a coarse grid and at the fine resolution only where the coarse run asks for it.
+
+Usage:
+    {command} --config=path [--factor=4] [--quantile=0.98] [--saturation=0.95] [--buffer=10] [--compare]
+
+The arrayExtent of the configuration has to be a multiple of the factor, and the LDD has to be an input raster.
+""".format(
+    command=os.path.basename(sys.argv[0])
+)
+
+# Aggregation of the rasters of the model grid to the coarse grid, other rasters are averaged
+AGGREGATION = {"dem":                    "average",
+               "landUseMap":             "mode",
+               "soilMap":                "mode",
+               "ldd":                    "ldd",
+               "iniGroundWaterStorage":  "sum",        # m3 per cell
+               "iniWaterHeight":         "average",    # m
+               "iniInterceptionStorage": "average",
+               }
+# Settings of the fine run that do not apply to the coarse run
+COARSE_SKIP = ("boundaryInflow",)
+DIRECTIONS = {offset: direction for direction, offset in LDD_OFFSETS.items()}
+
+
+def blocks(array, factor):
+    """The cells of every block of factor x factor cells, as an array of (rows, columns, factor * factor)."""
+    n = array.shape[0] // factor
+    return array.reshape(n, factor, n, factor).transpose(0, 2, 1, 3).reshape(n, n, factor * factor)
+
+
+def no_data_mask(array, no_data):
+    mask = ~np.isfinite(array) if np.issubdtype(array.dtype, np.floating) else np.zeros(array.shape, dtype=bool)
+    if no_data is not None:
+        mask |= array == no_data
+    return mask
+
+
+def aggregate(array, factor, method, no_data):
+    """Aggregate a raster of the fine grid to the coarse grid, blocks without valid cells become no-data."""
+    cells = blocks(array, factor)
+    valid = ~no_data_mask(cells, no_data)
+    count = valid.sum(axis=-1)
+    if method == "mode":
+        ids    = np.unique(cells[valid])
+        counts = np.stack([((cells == ID) & valid).sum(axis=-1) for ID in ids]) if ids.size else np.zeros((1, *count.shape))
+        result = ids[counts.argmax(axis=0)] if ids.size else np.zeros(count.shape, dtype=array.dtype)
+    else:
+        total  = np.where(valid, cells, 0).astype(np.float64).sum(axis=-1)
+        result = total if method == "sum" else total / np.maximum(count, 1)
+    fill = no_data if no_data is not None else (np.nan if np.issubdtype(result.dtype, np.floating) else 0)
+    return np.where(count > 0, result, fill).astype(array.dtype if method == "mode" else np.float64)
+
+
+def accumulation(network, valid):
+    """Upstream cells (including the cell itself) of every cell of the fine LDD."""
+    accumulated = valid.ravel().astype(np.float64)
+    for cells, has_downstream, downstream_cells in network.levels:
+        np.add.at(accumulated, downstream_cells, accumulated[cells][has_downstream])
+    return accumulated
+
+
+def block_outlets(ldd, factor):
+    """The cell of every block with the largest upstream area, through which the block drains (as flat index of the
+    fine grid), and the fine flow network."""
+    valid    = (ldd >= 1) & (ldd <= 9)
+    network  = FlowNetwork(np.where(valid, ldd, 0).astype(np.uint8))
+    upstream = np.where(valid.ravel(), accumulation(network, valid), -1).reshape(ldd.shape)
+    index    = blocks(upstream, factor).argmax(axis=-1)
+    n        = ldd.shape[0] // factor
+    rows, cols = np.indices((n, n))
+    outlets  = (rows * factor + index // factor) * ldd.shape[1] + cols * factor + index % factor
+    return outlets, network, blocks(valid, factor).any(axis=-1)
+
+
+def upscale_ldd(ldd, factor):
+    """Coarse LDD: every block drains to the block into which the flow path of its outlet cell continues.
+    Blocks whose outlet is a pit or leaves the domain become pits, cycles of blocks are broken with a pit."""
+    outlets, network, valid = block_outlets(ldd, factor)
+    n          = valid.shape[0]
+    extent     = ldd.shape[1]
+    downstream = network.downstream[outlets]
+    coarse     = np.full((n, n), LDD_NO_DATA, dtype=np.uint8)
+    for row, col in zip(*np.nonzero(valid)):
+        cell = downstream[row, col]
+        to_row, to_col = (cell // extent) // factor, (cell % extent) // factor
+        offset = (int(np.clip(to_row - row, -1, 1)), int(np.clip(to_col - col, -1, 1)))
+        inside = 0 <= row + offset[0] < n and 0 <= col + offset[1] < n and valid[row + offset[0], col + offset[1]]
+        coarse[row, col] = DIRECTIONS[offset] if cell >= 0 and offset != (0, 0) and inside else 5
+
+    # Break cycles: follow every path, a cell that is met again on the same path becomes a pit
+    state = np.zeros((n, n), dtype=np.int64)
+    for start in zip(*np.nonzero(valid)):
+        path, cell = [], start
+        while state[cell] == 0 and coarse[cell] != 5:
+            state[cell] = -1
+            path.append(cell)
+            offset = LDD_OFFSETS[int(coarse[cell])]
+            cell = (cell[0] + offset[0], cell[1] + offset[1])
+        if state[cell] == -1:
+            coarse[cell] = 5
+        for visited in path:
+            state[visited] = 1
+    return coarse
+
+
+def write_raster(file_name, array, template, factor, no_data):
+    """Write a coarse raster with the georeference of the fine template, with cells factor times larger."""
+    gdal_type = {np.dtype(np.uint8): gdal.GDT_Byte, np.dtype(np.float64): gdal.GDT_Float64}.get(array.dtype, gdal.GDT_Int32)
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    output = gdal.GetDriverByName("GTiff").Create(file_name, array.shape[1], array.shape[0], 1, gdal_type)
+    x, width, x_rotation, y, y_rotation, height = template.GetGeoTransform()
+    output.SetGeoTransform((x, width * factor, x_rotation, y, y_rotation, height * factor))
+    output.SetProjection(template.GetProjection())
+    if no_data is not None and np.isfinite(no_data):
+        output.GetRasterBand(1).SetNoDataValue(float(no_data))
+    output.GetRasterBand(1).WriteArray(array)
+    output = None
+
+
+def prepare_coarse_run(configuration, config_file, factor, work_dir):
+    """Aggregate the inputs of the configuration and write the configuration of the coarse run."""
+    extent    = int(configuration.modelSettings['arrayExtent'])
+    input_dir = os.path.join(work_dir, "coarse", "input") + "/"
+    scenario  = configuration.generalSettings['scenario']
+    for option in configuration.dataSettings:
+        if option in COARSE_SKIP:
+            continue
+        method = AGGREGATION.get(option, "average")
+        for name, (base, source) in input_files(configuration, option).items():
+            destination = (input_dir + scenario if base == scenario_dir(configuration) else input_dir.rstrip("/")) + name
+            dataset = gdal.Open(source)
+            array   = read_raster(source, extent)
+            if array is None:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                shutil.copyfile(source, destination)
+            elif method == "ldd":
+                write_raster(destination, upscale_ldd(array, factor), dataset, factor, LDD_NO_DATA)
+            else:
+                no_data = dataset.GetRasterBand(1).GetNoDataValue()
+                write_raster(destination, aggregate(array, factor, method, no_data), dataset, factor, no_data)
+
+    output = os.path.join(work_dir, "coarse", "output") + "/"
+    os.makedirs(output + scenario, exist_ok=True)
+    coarse_extent    = extent // factor
+    partition_extent = configuration.modelSettings['partitionExtent']
+    overrides = {("generalSettings", "inputDir"):      input_dir,
+                 ("generalSettings", "outputDir"):     output,
+                 ("generalSettings", "cacheDir"):      os.path.join(work_dir, "coarse", "cache"),
+                 ("generalSettings", "makeGIF"):       False,
+                 ("modelSettings", "arrayExtent"):     coarse_extent,
+                 ("modelSettings", "resolution"):      int(configuration.modelSettings['resolution']) * factor,
+                 ("modelSettings", "partitionExtent"): partition_extent if partition_extent == "auto" else min(int(partition_extent), coarse_extent),
+                 ("dataSettings", "boundaryInflow"):   ""}
+    return write_config(config_file, overrides, os.path.join(work_dir, "coarse", "config.ini")), output + scenario
+
+
+def reported_maximum(directory, variable):
+    """Maximum over the reported rasters of a variable, per cell, or None if the variable is not reported."""
+    index = index_outputs(directory)
+    files = index[index["variable"] == variable]["file"]
+    maximum = None
+    for file_name in files:
+        array = gdal.Open(os.path.join(directory, file_name)).GetRasterBand(1).ReadAsArray().astype(np.float64)
+        maximum = array if maximum is None else np.fmax(maximum, array)
+    return maximum
+
+
+def flag_cells(coarse_dir, configuration, factor, quantile, saturation):
+    """Coarse cells that need the fine resolution: the highest discharges (above the quantile) and the cells in which
+    the groundwater storage reaches the saturation fraction of the full storage, where water seeps."""
+    discharge = reported_maximum(coarse_dir, "discharge")
+    if discharge is None:
+        raise Exception("Error: The coarse run did not report the discharge")
+    valid   = np.isfinite(discharge) & (discharge > 0)
+    flagged = valid & (discharge >= np.quantile(discharge[valid], quantile)) if valid.any() else valid
+
+    gw_s = reported_maximum(coarse_dir, "gw_s")
+    if gw_s is not None:
+        cell_area = (float(configuration.modelSettings['resolution']) * factor) ** 2
+        full      = float(configuration.modelSettings['impermeableLayerBelowDEM']) * cell_area
+        flagged  |= np.isfinite(gw_s) & (gw_s >= saturation * full)
+    return flagged
+
+
+def regions(flagged):
+    """Labels of the connected (8 neighbours) regions of flagged cells, 0 is not flagged."""
+    labels = np.zeros(flagged.shape, dtype=np.int64)
+    count  = 0
+    for start in zip(*np.nonzero(flagged)):
+        if labels[start]:
+            continue
+        count += 1
+        labels[start] = count
+        stack = [start]
+        while stack:
+            row, col = stack.pop()
+            for d_row, d_col in LDD_OFFSETS.values():
+                neighbour = (row + d_row, col + d_col)
+                if (0 <= neighbour[0] < flagged.shape[0] and 0 <= neighbour[1] < flagged.shape[1] and
+                        flagged[neighbour] and not labels[neighbour]):
+                    labels[neighbour] = count
+                    stack.append(neighbour)
+    return labels, count
+
+
+def block_window(offset, factor, extent):
+    """The window extended to whole blocks of the coarse grid, with a size that is a multiple of 16 and of the factor,
+    so every block is either inside or outside of it."""
+    row, col, size = offset
+    step = math.lcm(16, factor)
+    last_row, last_col = row + size, col + size
+    row, col = row - row % factor, col - col % factor
+    size = min(step * math.ceil(max(last_row - row, last_col - col) / step), extent)
+    return min(row, extent - size), min(col, extent - size), size
+
+
+def fine_windows(flagged, factor, buffer, extent):
+    """Windows (row, column, size) of the fine grid around the flagged regions, overlapping windows are merged.
+    The windows cover whole coarse blocks (block_window)."""
+    labels, count = regions(flagged)
+    # The fine cells of a region only matter through its bounding box, the first and last fine row and column
+    boxes = []
+    for label in range(1, count + 1):
+        rows, cols = np.nonzero(labels == label)
+        boxes.append((rows.min() * factor, (rows.max() + 1) * factor - 1, cols.min() * factor, (cols.max() + 1) * factor - 1))
+    merged = True
+    while merged:
+        merged = False
+        windows = [block_window(bounding_window(np.array(box[:2]), np.array(box[2:]), buffer, extent), factor, extent)
+                   for box in boxes]
+        for i in range(len(windows)):
+            for j in range(i + 1, len(windows)):
+                (row_i, col_i, size_i), (row_j, col_j, size_j) = windows[i], windows[j]
+                if row_i < row_j + size_j and row_j < row_i + size_i and col_i < col_j + size_j and col_j < col_i + size_i:
+                    box_j = boxes.pop(j)
+                    boxes[i] = (min(boxes[i][0], box_j[0]), max(boxes[i][1], box_j[1]),
+                                min(boxes[i][2], box_j[2]), max(boxes[i][3], box_j[3]))
+                    merged = True
+                    break
+            if merged:
+                break
+    return windows
+
+
+def write_coarse_inflow(coarse_dir, outlets, network, offset, factor, extent, template, directory):
+    """Boundary inflow of a fine window from the coarse run: the discharge of a coarse cell leaves its block through
+    the outlet cell, the outlets upstream of the window that drain into it give their discharge to the window.
+
+    The discharge of a block that overlaps the window includes the runoff of its cells inside the window, which the
+    fine run simulates itself, so its outlet is not a source. The windows of fine_windows cover whole blocks, then
+    no block overlaps a window partly and no inflow is left out."""
+    sources, targets = inflow_sources(network, offset, extent)
+    row, col, size = offset
+    block_rows, block_cols = sources // extent // factor * factor, sources % extent // factor * factor
+    outside = ((block_rows + factor <= row) | (block_rows >= row + size) |
+               (block_cols + factor <= col) | (block_cols >= col + size))
+    sources, targets = sources[outside], targets[outside]
+    index = index_outputs(coarse_dir)
+    for date, file_name in index[index["variable"] == "discharge"][["date", "file"]].itertuples(index=False):
+        coarse = gdal.Open(os.path.join(coarse_dir, file_name)).GetRasterBand(1).ReadAsArray().astype(np.float64)
+        discharge = np.zeros(extent * extent)
+        discharge[outlets.ravel()] = np.nan_to_num(coarse.ravel())
+        write_inflow(template, discharge, sources, targets, offset, extent, directory + date.strftime(BOUNDARY_INFLOW))
+    return len(sources)
+
+
+def compare(full_dir, coarse_dir, window_dirs, offsets):
+    """Accuracy of the coarse outflow and of the discharge of the fine windows against the full fine run."""
+    full, coarse = OutflowLog.read_summary(full_dir), OutflowLog.read_summary(coarse_dir)
+    print(f"\n{'outflow':<20}{'full fine':>15}{'coarse':>15}{'difference (%)':>16}")
+    for name in ("maximum", "mean", "volume"):
+        difference = 100 * (coarse[name] - full[name]) / full[name] if full[name] else float("nan")
+        print(f"{name:<20}{full[name]:>15.4g}{coarse[name]:>15.4g}{difference:>16.2f}")
+
+    print(f"\n{'window':<25}{'rasters':>9}{'RMSE discharge':>16}{'peak error (%)':>16}")
+    for (row, col, size), window_dir in zip(offsets, window_dirs):
+        squared, count, peaks = 0.0, 0, []
+        index = index_outputs(window_dir)
+        for file_name in index[index["variable"] == "discharge"]["file"]:
+            full_file = os.path.join(full_dir, file_name)
+            if not os.path.isfile(full_file):
+                continue
+            fine      = gdal.Open(os.path.join(window_dir, file_name)).GetRasterBand(1).ReadAsArray().astype(np.float64)
+            reference = gdal.Open(full_file).GetRasterBand(1).ReadAsArray(int(col), int(row), int(size), int(size)).astype(np.float64)
+            valid     = np.isfinite(fine) & np.isfinite(reference)
+            squared  += float(np.sum((fine[valid] - reference[valid]) ** 2))
+            count    += int(valid.sum())
+            if reference[valid].size and reference[valid].max() > 0:
+                peaks.append(100 * (fine[valid].max() - reference[valid].max()) / reference[valid].max())
+        rmse = np.sqrt(squared / count) if count else float("nan")
+        peak = float(np.mean(np.abs(peaks))) if peaks else float("nan")
+        print(f"{f'{size}x{size} at {row}, {col}':<25}{len(index[index['variable'] == 'discharge']):>9}{rmse:>16.4g}{peak:>16.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a scenario on a coarse grid and at the fine resolution only where needed.",
+                                     epilog=usage, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", required=True, help="configuration of the fine-resolution run")
+    parser.add_argument("--factor", type=int, default=4, help="cells of the fine grid per coarse cell, per side")
+    parser.add_argument("--quantile", type=float, default=0.98, help="coarse cells with a higher peak discharge are run fine")
+    parser.add_argument("--saturation", type=float, default=0.95,
+                        help="coarse cells whose groundwater storage reaches this fraction of the full storage are run fine")
+    parser.add_argument("--buffer", type=int, default=10, help="fine cells around the flagged regions")
+    parser.add_argument("--threads", type=int, default=4, help="HPX threads of the runs")
+    parser.add_argument("--compare", action="store_true", help="also run the full fine-resolution model and compare")
+    parser.add_argument("--work-dir", default=None, help="directory for the runs")
+    arguments = parser.parse_args()
+
+    configuration = Configuration(arguments.config)
+    if configuration.generalSettings.get('generateLDD', 'False') == 'True' or not configuration.dataSettings.get('ldd'):
+        sys.exit("A coarse-to-fine run needs the LDD as an input raster (dataSettings ldd), not generateLDD.")
+    extent = int(configuration.modelSettings['arrayExtent'])
+    if extent % arguments.factor:
+        sys.exit(f"The arrayExtent ({extent}) is not a multiple of the factor ({arguments.factor}).")
+    work_dir = arguments.work_dir or tempfile.mkdtemp(prefix="hbm_multiresolution_")
+    print(f"Runs are stored in: {work_dir}")
+
+    coarse_config, coarse_dir = prepare_coarse_run(configuration, arguments.config, arguments.factor, work_dir)
+    runs = {"coarse": run_model(coarse_config, arguments.threads)}
+    print(f"Coarse run ({extent // arguments.factor}x{extent // arguments.factor} cells) finished in "
+          f"{runs['coarse']['wall_time']:.1f} s with exit code {runs['coarse']['return_code']}")
+    if runs["coarse"]["return_code"] != 0:
+        sys.exit(1)
+
+    flagged = flag_cells(coarse_dir, configuration, arguments.factor, arguments.quantile, arguments.saturation)
+    offsets = fine_windows(flagged, arguments.factor, arguments.buffer, extent)
+    print(f"{int(flagged.sum())} coarse cells flagged, {len(offsets)} fine windows covering "
+          f"{100 * sum(size ** 2 for _, _, size in offsets) / extent ** 2:.1f}% of the domain")
+
+    ldd = read_raster(scenario_dir(configuration) + configuration.dataSettings['ldd'], extent)
+    outlets, network, _ = block_outlets(ldd, arguments.factor)
+    template = gdal.Open(scenario_dir(configuration) + configuration.dataSettings['dem'])
+    window_dirs = []
+    for count, offset in enumerate(offsets):
+        label        = f"window_{count}"
+        boundary_dir = os.path.join(work_dir, label, "boundary")
+        sources      = write_coarse_inflow(coarse_dir, outlets, network, offset, arguments.factor, extent, template,
+                                           boundary_dir)
+        window_config, result_dir = prepare_window_run(configuration, arguments.config, offset, work_dir, label,
+                                                       boundary_dir + os.path.dirname(BOUNDARY_INFLOW))
+        runs[label] = run_model(window_config, arguments.threads)
+        window_dirs.append(result_dir)
+        print(f"Fine window {offset[2]}x{offset[2]} at row {offset[0]}, column {offset[1]} ({sources} inflow paths) "
+              f"finished in {runs[label]['wall_time']:.1f} s with exit code {runs[label]['return_code']}")
+        if runs[label]["return_code"] != 0:
+            sys.exit(1)
+
+    coarse_to_fine = sum(run["wall_time"] for run in runs.values())
+    cells = (extent // arguments.factor) ** 2 + sum(size ** 2 for _, _, size in offsets)
+    print(f"\nCoarse-to-fine: {coarse_to_fine:.1f} s, {cells} cells simulated ({100 * cells / extent ** 2:.1f}% of the fine grid)")
+    print(f"Outputs: coarse {coarse_dir}" + "".join(f"\n         fine {directory}" for directory in window_dirs))
+
+    if arguments.compare:
+        full_dir = os.path.join(work_dir, "full", "output") + "/"
+        os.makedirs(full_dir + configuration.generalSettings['scenario'], exist_ok=True)
+        full_config = write_config(arguments.config, {("generalSettings", "outputDir"): full_dir,
+                                                      ("generalSettings", "makeGIF"): False},
+                                   os.path.join(work_dir, "full", "config.ini"))
+        full = run_model(full_config, arguments.threads)
+        print(f"Full fine run: {full['wall_time']:.1f} s, {extent ** 2} cells, exit code {full['return_code']}; "
+              f"speedup of coarse-to-fine {full['wall_time'] / coarse_to_fine:.2f}")
+        compare(full_dir + configuration.generalSettings['scenario'], coarse_dir, window_dirs, offsets)
+
+
+if __name__ == "__main__":
+    main()
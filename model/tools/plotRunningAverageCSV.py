@@ -8,15 +8,21 @@ Create a moving average plot of a csv data file for x amount of timesteps
 """
 
 # Importing Libraries
+import os
+import sys
 import configuration as config
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
-# Import time-series data
-discharge = pd.read_csv(config.path + f'/output/{config.scenario}/maximumDischarge.csv',
-                        sep=';',
-                        names=["Time", "Discharge"])
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import OutflowLog
+
+# Import time-series data, the outflow log is memory mapped instead of parsed
+output_dir = config.path + f'/output/{config.scenario}'
+time, outflow = OutflowLog.read_series(output_dir)
+discharge = pd.DataFrame({"Time": time, "Discharge": outflow})
+print(OutflowLog.read_summary(output_dir))
 
 discharge.head()
 
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 19 Oct 2026
+
+Regression test of the model outputs. The model is run for a fixed period on the small synthetic catchment
+in regression/input and every reported raster and the outflow series are compared with the golden outputs
+in regression/golden, with the tolerances per variable of regression/tolerances.ini. The run takes a minute
+or less, so a change of the model (for example a performance refactor) can be validated before it is merged.
+
+The golden outputs are only replaced with --update, on a version of the model that is known to be correct.
+
+@author: steven.hosper
+"""
+
+import argparse
+import configparser
+import csv
+import glob
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from benchmark import MODEL_DIR, write_config, run_model
+import compareOutputs
+import OutflowLog
+
+REGRESSION_DIR = os.path.join(os.path.dirname(MODEL_DIR), "regression")
+GOLDEN_FILE    = os.path.join(REGRESSION_DIR, "golden", "outputs.npz")
+TOLERANCES     = os.path.join(REGRESSION_DIR, "tolerances.ini")
+STATISTICS     = ["max_abs_error", "rmse", "sum_delta"]
+
+usage = """\
+Compare the outputs of the model on the regression catchment with the golden outputs.
+
+Usage:
+    {command} [--threads=2] [--backend=lue|numpy] [--set section.option=value ...] [--work-dir=path]
+    {command} --update
+""".format(
+    command=os.path.basename(sys.argv[0])
+)
+
+
+def write_ascii_grid(file_name, array, resolution, no_data = -9999):
+    """Write an array as an ESRI ASCII grid, which GDAL reads without conversion. Used to (re)create the inputs."""
+    integer = np.issubdtype(array.dtype, np.integer)
+    with open(file_name, "w") as f:
+        f.write(f"ncols {array.shape[1]}\nnrows {array.shape[0]}\nxllcorner 0.0\nyllcorner 0.0\n"
+                f"cellsize {resolution}\nNODATA_value {no_data}\n")
+        for row in array:
+            f.write(" ".join(str(int(value)) if integer else f"{value:.6f}" for value in row) + "\n")
+
+
+def run(work_dir, threads, overrides):
+    """Run the model on the regression catchment, the inputs are used in place and all outputs go to work_dir."""
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    config.read(os.path.join(REGRESSION_DIR, "config.ini"))
+    output_dir = os.path.join(work_dir, "output") + "/"
+    os.makedirs(output_dir + config.get("generalSettings", "scenario"), exist_ok=True)
+
+    overrides = {("generalSettings", "inputDir"):  os.path.join(REGRESSION_DIR, "input") + "/",
+                 ("generalSettings", "outputDir"): output_dir,
+                 ("generalSettings", "cacheDir"):  os.path.join(work_dir, "cache"),
+                 **overrides}
+    config_file = write_config(os.path.join(REGRESSION_DIR, "config.ini"), overrides, os.path.join(work_dir, "config.ini"))
+    return run_model(config_file, threads), output_dir + config.get("generalSettings", "scenario")
+
+
+def read_outputs(output_dir):
+    """The reported rasters {file: array} and the outflow series of a run."""
+    outputs = {os.path.basename(file_name): compareOutputs.read_raster(file_name)
+               for file_name in sorted(glob.glob(os.path.join(output_dir, "*.tiff")))}
+    outputs["outflow"] = np.array(OutflowLog.read_series(output_dir)[1])
+    return outputs
+
+
+def variable(name):
+    """The variable of an output, the rasters are named {timestep}_{variable}_{datetime}.tiff"""
+    return name.split("_", 1)[1].rsplit("_", 1)[0] if name.endswith(".tiff") else name
+
+
+def tolerances():
+    """Absolute tolerance of every statistic and the relative tolerance per variable, variables without a section
+    use [DEFAULT]."""
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    config.read(TOLERANCES)
+    return lambda name, option: float(config.get(name if config.has_section(name) else "DEFAULT", option))
+
+
+def scales(reference):
+    """The size of a golden output that every statistic is relative to: the largest value, the root mean square
+    and the total."""
+    reference = np.asarray(reference, dtype=np.float64)
+    return {"max_abs_error": float(np.nanmax(np.abs(reference))) if reference.size else 0.0,
+            "rmse":          float(np.sqrt(np.nanmean(reference ** 2))) if reference.size else 0.0,
+            "sum_delta":     abs(float(np.nansum(reference))),
+            }
+
+
+def compare(golden, outputs):
+    """Statistics of the difference of every output with its golden output, and whether they are within tolerance.
+
+    Returns:
+        rows (list):    one row per golden output, outputs that are not in the golden outputs are added as new
+    """
+    tolerance = tolerances()
+    rows = []
+    for name, reference in golden.items():
+        row = {"file": name, "variable": variable(name), "status": "missing"}
+        if name in outputs and outputs[name].shape == reference.shape:
+            row.update(compareOutputs.statistics(reference, outputs[name]))
+            # A statistic is within tolerance if it is below the absolute tolerance plus the relative tolerance
+            # times the size of the golden output, so large values are not held to the absolute tolerance only
+            relative = tolerance(row["variable"], "relative")
+            size     = scales(reference)
+            within   = all(abs(row[statistic]) <= tolerance(row["variable"], statistic) + relative * size[statistic]
+                           for statistic in STATISTICS)
+            row["status"] = "ok" if within else "FAILED"
+        rows.append(row)
+    rows.extend({"file": name, "variable": variable(name), "status": "new"} for name in outputs if name not in golden)
+    return rows
+
+
+def print_report(rows):
+    """Worst statistics per variable, followed by the files that are not within tolerance."""
+    print(f"\n{'variable':<25}{'files':>7}{'failed':>8}{'max abs error':>16}{'rmse':>12}{'mass delta':>14}")
+    for name in dict.fromkeys(row["variable"] for row in rows):
+        group = [row for row in rows if row["variable"] == name]
+        compared = [row for row in group if "rmse" in row]
+        failed = sum(row["status"] != "ok" for row in group)
+        worst = {statistic: max((abs(row[statistic]) for row in compared), default=float("nan")) for statistic in STATISTICS}
+        print(f"{name:<25}{len(group):>7}{failed:>8}{worst['max_abs_error']:>16.3e}{worst['rmse']:>12.3e}{worst['sum_delta']:>14.3e}")
+
+    for row in rows:
+        if row["status"] != "ok":
+            print(f"{row['status']:<8} {row['file']}")
+
+
+def write_report(rows, file_name):
+    with open(file_name, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["file", "variable", "status", *STATISTICS])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the model outputs on the regression catchment with the golden outputs.")
+    parser.add_argument("--update", action="store_true", help="replace the golden outputs with the outputs of this run")
+    parser.add_argument("--threads", type=int, default=2, help="HPX threads of the run")
+    parser.add_argument("--backend", default=None, help="array backend of the run (lue or numpy)")
+    parser.add_argument("--set", nargs="+", default=[], metavar="SECTION.OPTION=VALUE",
+                        help="change the configuration of the run, e.g. modelSettings.routingUpdate=reference")
+    parser.add_argument("--work-dir", default=None, help="directory for the outputs and the diff report")
+    arguments = parser.parse_args()
+
+    overrides = {tuple(option.split(".", 1)): value for option, value in (setting.split("=", 1) for setting in arguments.set)}
+    if arguments.backend:
+        overrides[("generalSettings", "backend")] = arguments.backend
+
+    work_dir = arguments.work_dir or tempfile.mkdtemp(prefix="hbm_regression_")
+    result, output_dir = run(work_dir, arguments.threads, overrides)
+    print(f"Run finished in {result['wall_time']:.1f} s with exit code {result['return_code']}, outputs in: {output_dir}")
+    if result["return_code"] != 0:
+        sys.exit(1)
+    outputs = read_outputs(output_dir)
+
+    if arguments.update:
+        os.makedirs(os.path.dirname(GOLDEN_FILE), exist_ok=True)
+        np.savez_compressed(GOLDEN_FILE, **outputs)
+        print(f"Golden outputs updated: {len(outputs)} outputs written to {GOLDEN_FILE}")
+        return
+
+    if not os.path.isfile(GOLDEN_FILE):
+        sys.exit(f"No golden outputs at {GOLDEN_FILE}, create them with --update on a version of the model that is known to be correct.")
+    with np.load(GOLDEN_FILE) as golden:
+        rows = compare(dict(golden), outputs)
+    print_report(rows)
+    write_report(rows, os.path.join(work_dir, "regression_report.csv"))
+    print(f"\nDiff report: {os.path.join(work_dir, 'regression_report.csv')}")
+
+    failed = sum(row["status"] in ("missing", "FAILED") for row in rows)
+    print("Regression test " + (f"FAILED for {failed} outputs" if failed else "passed"))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
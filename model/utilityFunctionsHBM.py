@@ -5,7 +5,8 @@ Created on 8 May 2023
 @author: steven.hosper
 """
 
-import lue.framework as lfr
+from Backend import lfr
+import datetime
 
 class utilityFunctions:
     def calculate_sqrd_slope(slope, max: float, min: float):
@@ -13,4 +14,8 @@ class utilityFunctions:
         slope_sqrd  = lfr.where(slope_sqrd < min, min, slope_sqrd)
         slope_sqrd  = lfr.where(slope_sqrd > max, max, slope_sqrd)
         
-        return slope_sqrd
\ No newline at end of file
+        return slope_sqrd
+    
+    def string_to_datetime(date_string: str, seperator: str):
+        date_int_list = list(map(int, date_string.split(seperator)))
+        return datetime.datetime(*date_int_list[:6])